@@ -1,7 +1,10 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 
+# Корень проекта (каталог над backend): пути по умолчанию не зависят от рабочего каталога процесса
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 class Settings(BaseSettings):
     # Основные настройки
     APP_NAME: str = "YouTube Video Downloader"
@@ -10,6 +13,19 @@ class Settings(BaseSettings):
     
     # База данных
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./youtube_downloader.db")
+    DATABASE_REPLICA_URL: Optional[str] = None  # Реплика для истории, глобальной ленты и статусов
+    DB_REPLICA_MAX_LAG_SECONDS: int = 10  # Столько после изменения сессия читает под ETag с основной базы
+    DB_POOL_SIZE: int = 5  # Постоянных соединений на процесс
+    DB_MAX_OVERFLOW: int = 10  # Дополнительных соединений при пиковой нагрузке
+    DB_POOL_TIMEOUT_SECONDS: int = 30  # Ожидание свободного соединения
+    DB_POOL_RECYCLE_SECONDS: int = 30 * 60  # Пересоздание соединений раньше таймаутов сервера и балансировщиков
+    DB_POOL_PRE_PING: bool = True  # Проверка соединения перед выдачей из пула
+    DB_PGBOUNCER: bool = False  # Подключение через PgBouncer (transaction pooling): без пула на стороне приложения
+    # SQLite на одном узле (API, воркер и beat на одном диске; не для сетевых ФС)
+    SQLITE_WAL_MODE: bool = True  # WAL, synchronous=NORMAL, mmap и busy_timeout
+    SQLITE_BUSY_TIMEOUT_MS: int = 15000  # Сколько запись ждет блокировку
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_SINGLE_WRITER: bool = True  # Записи процесса по очереди через одну блокировку
     
     # Redis и Celery
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -23,16 +39,110 @@ class Settings(BaseSettings):
     USER_FILE_RETENTION_HOURS: int = 1  # Время жизни пользовательских файлов
     EXPIRED_RECORD_DELETE_MINUTES: int = 1  # Время удаления записей EXPIRED в минутах
     
+    # Хранение записей downloads (в том числе FAILED и зависших PENDING/PROCESSING)
+    DOWNLOADS_RETENTION_DAYS: int = 30  # Записи старше удаляются задачей хранения
+    DOWNLOADS_PARTITIONING: bool = True  # Postgres: секции по дням created_at, удаление целыми секциями
+    DOWNLOADS_PARTITIONS_AHEAD_DAYS: int = 7  # Секции, создаваемые заранее
+    DOWNLOADS_ARCHIVE_DIR: Optional[str] = None  # Архив удаляемых записей (gzip), None - без архива
+    DOWNLOADS_PURGE_BATCH_SIZE: int = 1000  # Записей за транзакцию при построчном удалении
+    
+    # Потоковая отдача файла во время загрузки (форматы без постобработки)
+    PROGRESSIVE_DELIVERY_ENABLED: bool = False
+    PROGRESSIVE_CHUNK_SIZE_KB: int = 256
+    PROGRESSIVE_POLL_INTERVAL_SECONDS: float = 0.25
+    PROGRESSIVE_STALL_TIMEOUT_SECONDS: int = 60  # Обрыв потока, если воркер не пишет файл
+    
     # Rate limiting
     RATE_LIMIT_DOWNLOADS_PER_HOUR: int = 50
     RATE_LIMIT_DOWNLOADS_PER_DAY: int = 200
     
+    # Дедупликация POST /api/download
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 24 * 60 * 60  # Время жизни Idempotency-Key
+    INFLIGHT_DEDUP_TTL_SECONDS: int = 30 * 60  # Окно автоматической дедупликации (task_time_limit)
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # Сколько повторный запрос ждет, пока первый создаст загрузку
+    IDEMPOTENCY_POLL_INTERVAL_SECONDS: float = 0.25
+    
+    # Контроль допуска в очередь (admission control)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_QUEUE_NAME: str = "celery"  # Имя списка очереди в Redis брокере
+    ADMISSION_MAX_QUEUE_DEPTH: int = 200  # Максимум задач в очереди
+    ADMISSION_MAX_WAIT_SECONDS: int = 15 * 60  # Максимальное ожидаемое время до старта
+    ADMISSION_WORKER_CONCURRENCY: int = 4  # Суммарное число параллельных загрузок воркеров
+    ADMISSION_DEFAULT_SERVICE_SECONDS: float = 60.0  # Оценка длительности задачи без статистики
+    ADMISSION_SERVICE_SAMPLES: int = 100  # Сколько последних длительностей учитывать
+    
+    # Celery воркеры и автомасштабирование (python -m app.tasks.worker передает --autoscale=max,min)
+    WORKER_AUTOSCALE_MIN: int = 1  # Процессов пула без нагрузки
+    WORKER_AUTOSCALE_MAX: int = 8  # Предел процессов пула
+    WORKER_AUTOSCALE_MAX_CPU_LOAD: float = 0.85  # Load average на ядро, выше которого не растем
+    WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS: float = 0  # Предел входящего канала, 0 - без ограничения
+    WORKER_MAX_TASKS_PER_CHILD: int = 50
+    WORKER_MAX_MEMORY_PER_CHILD_MB: int = 512  # Перезапуск процесса при превышении RSS
+    
+    # Метрики Prometheus
+    WORKER_METRICS_PORT: int = 9100  # Порт экспортера метрик воркера, 0 - отключен
+    
+    # Переиспользование экземпляров yt-dlp в процессе и общий кеш данных плеера
+    YTDLP_POOL_ENABLED: bool = True
+    YTDLP_POOL_MAX_USES: int = 100  # После стольких задач экземпляр пересоздается
+    YTDLP_CACHE_DIR: Optional[str] = os.path.join(PROJECT_DIR, "cache", "yt-dlp")  # None - кеш yt-dlp по умолчанию
+    
+    # Извлечение информации о видео на отдельной очереди воркеров вместо процесса API
+    EXTRACT_QUEUE_ENABLED: bool = False
+    EXTRACT_QUEUE_NAME: str = "extract"
+    EXTRACT_TIMEOUT_SECONDS: float = 20.0  # Сколько API ждет результат извлечения
+    
+    # Негативный кеш отказов по video_id (время жизни по классу причины)
+    NEGATIVE_CACHE_ENABLED: bool = True
+    NEGATIVE_CACHE_UNAVAILABLE_TTL_SECONDS: int = 12 * 60 * 60  # Удалено или недоступно
+    NEGATIVE_CACHE_PRIVATE_TTL_SECONDS: int = 60 * 60  # Владелец может открыть доступ
+    NEGATIVE_CACHE_AGE_RESTRICTED_TTL_SECONDS: int = 24 * 60 * 60
+    NEGATIVE_CACHE_TOO_LONG_TTL_SECONDS: int = 7 * 24 * 60 * 60  # Длительность не меняется
+    
+    # Спекулятивная загрузка формата по умолчанию после /api/video/info
+    PREFETCH_ENABLED: bool = False
+    PREFETCH_QUEUE_NAME: str = "prefetch"
+    PREFETCH_STAGING_DIR: str = os.path.join(PROJECT_DIR, "staging")  # Вне DOWNLOAD_DIR: не отдается по /downloads
+    PREFETCH_TTL_SECONDS: int = 10 * 60  # Сколько хранится невостребованный результат
+    PREFETCH_MAX_CONCURRENT: int = 2
+    PREFETCH_BANDWIDTH_SHARE: float = 0.2  # Доля WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS на спекуляцию
+    PREFETCH_ADOPT_WAIT_SECONDS: int = 120  # Сколько загрузка ждет незавершенную спекуляцию
+    
+    # Популярность видео (затухающие счетчики) и прогрев staging в непиковые часы
+    POPULARITY_ENABLED: bool = True
+    POPULARITY_HALF_LIFE_HOURS: float = 6.0
+    POPULARITY_WARM_ENABLED: bool = False
+    POPULARITY_WARM_HOURS: str = "2-6"  # Часы UTC в формате crontab
+    POPULARITY_WARM_TOP_N: int = 20
+    POPULARITY_WARM_MIN_SCORE: float = 3.0  # Единичные запросы не прогреваем
+    POPULARITY_PIN_TTL_SECONDS: int = 26 * 60 * 60  # Закрепление держится до следующего прогрева
+
+    # Условные GET (ETag) для истории и статусов
+    SESSION_VERSION_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    HTTP_MICROCACHE_SECONDS: int = 1  # Сколько nginx держит ответ до перепроверки (X-Accel-Expires)
+
     # YouTube настройки
     YOUTUBE_DL_FORMAT: str = "best[height<=1080]"
     ALLOWED_VIDEO_FORMATS: List[str] = ["mp4", "webm", "mkv"]
     ALLOWED_AUDIO_FORMATS: List[str] = ["mp3", "aac", "wav"]
     MAX_VIDEO_DURATION_MINUTES: int = 60
     
+    # Пакетные загрузки и плейлисты
+    BATCH_MAX_ITEMS: int = 50  # Максимум видео в одном пакете (после разворота плейлистов)
+    BATCH_VALIDATION_CONCURRENCY: int = 4  # Параллельных проверок видео на пакет
+    STATUS_BULK_MAX_IDS: int = 100  # Максимум загрузок в одном запросе статусов
+    STATUS_LONG_POLL_MAX_SECONDS: float = 30.0  # Предел wait в GET /api/download/{id}/status
+    
+    # Уведомления о завершении на callback_url (очередь доставки с повторами)
+    WEBHOOK_QUEUE_NAME: str = "webhooks"
+    WEBHOOK_SECRET: Optional[str] = None  # Ключ подписи HMAC-SHA256, по умолчанию SECRET_KEY
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    WEBHOOK_BACKOFF_BASE_SECONDS: float = 10.0  # Пауза перед повтором удваивается с каждой попыткой
+    WEBHOOK_BACKOFF_MAX_SECONDS: float = 30 * 60  # Меньше visibility_timeout брокера Redis (1 час)
+    WEBHOOK_DEAD_LETTER_MAX: int = 1000  # Сколько недоставленных уведомлений хранится
+    WEBHOOK_ALLOW_PRIVATE_HOSTS: bool = False  # Разрешить callback_url на локальные и внутренние адреса
+    
     # CORS
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -43,9 +153,11 @@ class Settings(BaseSettings):
     
     # Безопасность
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+    ADMIN_TOKEN: Optional[str] = None  # Токен для /api/admin (заголовок X-Admin-Token), без него доступ закрыт
     
     # Домен для продакшна
     DOMAIN: str = os.getenv("DOMAIN", "localhost")
+    PUBLIC_BASE_URL: Optional[str] = None  # Внешний адрес для абсолютных ссылок в уведомлениях, по умолчанию https://DOMAIN
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy.orm import Session
+from typing import Optional
+import hmac
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.models.database import get_db
+from app.services.download_service import DownloadService
+from app.services.webhook_service import WebhookService
+from app.schemas.download_schemas import StageStatistics
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    """Проверяет токен администратора"""
+    if not settings.ADMIN_TOKEN or not x_admin_token or \
+            not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+@router.get("/admin/stats/stages", response_model=StageStatistics, dependencies=[Depends(require_admin)])
+async def get_stage_statistics(hours: int = 24, db: Session = Depends(get_db)):
+    """Перцентили длительности этапов задач загрузки за окно в hours часов"""
+    
+    if not 1 <= hours <= 24 * 30:
+        raise HTTPException(status_code=400, detail="hours должен быть от 1 до 720")
+    
+    download_service = DownloadService(db)
+    return download_service.get_stage_statistics(hours=hours)
+
+@router.get("/admin/webhooks/dead", dependencies=[Depends(require_admin)])
+async def get_dead_webhooks(limit: int = 100):
+    """Недоставленные уведомления на callback_url (новые первыми)"""
+    
+    try:
+        return {'deliveries': WebhookService().dead_letters(limit=min(max(limit, 1), 1000))}
+    except redis.RedisError as e:
+        logger.error("Dead letter уведомлений недоступен", error=str(e))
+        raise HTTPException(status_code=503, detail="Хранилище уведомлений недоступно")
+
+@router.post("/admin/webhooks/dead/redeliver", dependencies=[Depends(require_admin)])
+async def redeliver_dead_webhooks(limit: int = 100):
+    """Возвращает недоставленные уведомления в очередь доставки"""
+    
+    try:
+        count = WebhookService().redeliver_dead(limit=min(max(limit, 1), 1000))
+    except redis.RedisError as e:
+        logger.error("Dead letter уведомлений недоступен", error=str(e))
+        raise HTTPException(status_code=503, detail="Хранилище уведомлений недоступно")
+    logger.info("Недоставленные уведомления возвращены в очередь", count=count)
+    return {'requeued': count}
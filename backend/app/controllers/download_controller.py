@@ -1,21 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Response, Header
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from celery import group
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import structlog
 import os
 import urllib.parse
 import uuid
 import hashlib
+import asyncio
+import time
+from contextlib import contextmanager
 
-from app.models.database import get_db
+from app.models.database import get_db, get_read_db, reads_from_replica, session_scope, SessionLocal
 from app.services.download_service import DownloadService
-from app.services.youtube_service import YouTubeService
-from app.tasks.download_tasks import download_video_task
+from app.services.youtube_service import YouTubeService, ExtractionTimeoutError
+from app.services.admission_service import AdmissionService
+from app.services.idempotency_service import IdempotencyService
+from app.services.popularity_service import PopularityService
+from app.services.live_status_service import LiveStatusService, get_live_status_watcher
+from app.services.session_version_service import SessionVersionService
+from app.services.progressive_service import (
+    ProgressiveDeliveryService,
+    supports_progressive,
+    STATE_DOWNLOADING,
+    STATE_FINISHED
+)
+from app.config.settings import settings
+from app.utils.zip_stream import ZipStream, build_zip_entries
+from app.utils.http_cache import make_etag, etag_matches, cache_headers, not_modified
+from app.utils.json_response import fast_json_response
+from app.tasks.celery_app import celery_app, DOWNLOAD_VIDEO_TASK
 from app.schemas.download_schemas import (
     DownloadRequest, 
     DownloadResponse, 
+    BatchDownloadRequest,
+    BatchDownloadItem,
+    BatchDownloadSummary,
     DownloadStatus as DownloadStatusSchema,
+    BulkStatusRequest,
+    BulkStatusItem,
+    BulkStatusResponse,
     DownloadHistory,
     ErrorResponse
 )
@@ -63,11 +88,82 @@ def get_user_identifier(request: Request, response: Response = None) -> str:
     """Получает уникальный идентификатор пользователя"""
     return get_or_create_session_id(request, response)
 
+def parse_range_header(range_header: str, size: int) -> Optional[tuple[int, int]]:
+    """Разбирает заголовок Range с одним диапазоном байт.
+    
+    Возвращает (start, end) включительно или None, если диапазон невыполним.
+    """
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, _, end_str = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # bytes=-N - последние N байт
+            start = size - int(end_str)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start < 0 or start > end:
+        return None
+    return start, end
+
+def download_response_fields(download) -> dict:
+    """Поля DownloadResponse из записи загрузки (готовы к сериализации без модели)"""
+    video_info = None
+    if download.video_title:
+        video_info = {
+            'video_id': download.video_id,
+            'title': download.video_title,
+            'description': download.video_description,
+            'duration': download.video_duration,
+            'thumbnail': download.video_thumbnail,
+            'channel_name': download.channel_name,
+            'view_count': download.view_count,
+            'available_formats': []
+        }
+    
+    download_url = None
+    if download.status == DownloadStatus.COMPLETED and download.file_name:
+        download_url = f"/api/download/{download.id}/file"
+    
+    return {
+        'id': download.id,
+        'status': download.status,
+        'video_info': video_info,
+        'download_url': download_url,
+        'error_message': download.error_message,
+        'created_at': download.created_at,
+        'queue_position': None,
+        'estimated_start': None
+    }
+
+def build_download_response(download) -> DownloadResponse:
+    """Собирает DownloadResponse из записи загрузки"""
+    return DownloadResponse(**download_response_fields(download))
+
+async def wait_for_claim(idempotency: IdempotencyService, dedup_key: str) -> Optional[str]:
+    """Ждет, пока параллельный запрос с тем же ключом (двойной клик) создаст загрузку.
+    
+    Возвращает ID загрузки, None - если ключ освободился и захвачен этим запросом,
+    IN_PROGRESS - если за IDEMPOTENCY_WAIT_SECONDS запись так и не появилась.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        existing_id = idempotency.claim(dedup_key)
+        if existing_id != IdempotencyService.IN_PROGRESS or time.monotonic() >= deadline:
+            return existing_id
+        await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL_SECONDS)
+
 @router.post("/download", response_model=DownloadResponse)
 async def create_download(
     request: DownloadRequest,
     http_request: Request,
     response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """Создает новую загрузку видео"""
@@ -76,6 +172,51 @@ async def create_download(
     session_id = get_user_identifier(http_request, response)
     download_service = DownloadService(db)
     youtube_service = YouTubeService()
+    idempotency = IdempotencyService()
+    dedup_key = None
+    
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key должен быть от 1 до 255 символов")
+    
+    # Ключ дедупликации: явный Idempotency-Key или отпечаток запроса сессии
+    if idempotency_key:
+        dedup_key = idempotency.request_key(session_id, idempotency_key)
+        dedup_ttl = settings.IDEMPOTENCY_KEY_TTL_SECONDS
+    else:
+        try:
+            dedup_key = idempotency.fingerprint_key(
+                session_id,
+                youtube_service.extract_video_id(str(request.url)),
+                request.format,
+                request.quality,
+                request.audio_only
+            )
+            dedup_ttl = settings.INFLIGHT_DEDUP_TTL_SECONDS
+        except ValueError:
+            # Некорректный URL отклонит валидация ниже
+            dedup_key = None
+    
+    if dedup_key:
+        existing_id = await wait_for_claim(idempotency, dedup_key)
+        if existing_id == IdempotencyService.IN_PROGRESS:
+            # Первый запрос еще проверяет видео: клиент повторит и получит ту же загрузку
+            return JSONResponse(
+                status_code=202,
+                content={"detail": "Такой запрос уже обрабатывается"},
+                headers={"Retry-After": "1"}
+            )
+        if existing_id:
+            existing = download_service.get_download(existing_id)
+            # Явный ключ всегда возвращает исходную загрузку, отпечаток - только незавершенную
+            if existing and (idempotency_key or
+                             existing.status in (DownloadStatus.PENDING, DownloadStatus.PROCESSING)):
+                logger.info("Повторный запрос загрузки, возвращаем существующую",
+                           download_id=existing.id,
+                           session_id=session_id)
+                response.headers["Idempotent-Replayed"] = "true"
+                return build_download_response(existing)
+            # Предыдущая загрузка завершена или удалена - ключ переходит к новому запросу
+            idempotency.bind(dedup_key, IdempotencyService.IN_PROGRESS)
     
     try:
         # Проверяем rate limiting
@@ -92,8 +233,28 @@ async def create_download(
                 }
             )
         
+        # Проверяем загрузку очереди до дорогой валидации видео
+        admission = AdmissionService().check_admission()
+        if not admission['allowed']:
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "error": "Сервис перегружен, попробуйте позже",
+                    "queue_depth": admission['queue_depth'],
+                    "retry_after": admission['retry_after']
+                },
+                headers={"Retry-After": str(admission['retry_after'])}
+            )
+        
         # Валидируем видео
         validation = await youtube_service.validate_video(str(request.url))
+        if validation['retry']:
+            retry_after = str(int(settings.EXTRACT_TIMEOUT_SECONDS))
+            raise HTTPException(
+                status_code=503,
+                detail={"error": validation['error'], "retry_after": retry_after},
+                headers={"Retry-After": retry_after}
+            )
         if not validation['valid']:
             raise HTTPException(
                 status_code=400,
@@ -111,14 +272,17 @@ async def create_download(
             quality=request.quality,
             audio_only=request.audio_only,
             client_ip=client_ip,
-            session_id=session_id
+            session_id=session_id,
+            video_info=video_info.model_dump(),
+            callback_url=str(request.callback_url) if request.callback_url else None
         )
+        PopularityService().record(video_id, (request.format.value, request.quality, request.audio_only))
         
-        # Обновляем информацию о видео
-        download_service.update_video_info(download.id, video_info.dict())
+        if dedup_key:
+            idempotency.bind(dedup_key, download.id, dedup_ttl)
         
-        # Запускаем асинхронную задачу загрузки
-        task = download_video_task.delay(download.id)
+        # Запускаем асинхронную задачу загрузки по имени, не импортируя код воркера
+        task = celery_app.send_task(DOWNLOAD_VIDEO_TASK, args=[download.id])
         
         logger.info("Создана новая загрузка",
                    download_id=download.id,
@@ -131,28 +295,212 @@ async def create_download(
             video_info=video_info,
             download_url=None,
             error_message=None,
-            created_at=download.created_at
+            created_at=download.created_at,
+            queue_position=admission['queue_depth'],
+            estimated_start=admission['estimated_start']
         )
         
     except HTTPException:
+        if dedup_key:
+            idempotency.release(dedup_key)
         raise
     except Exception as e:
+        if dedup_key:
+            idempotency.release(dedup_key)
         logger.error("Ошибка создания загрузки", error=str(e), client_ip=client_ip)
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка: {str(e)}")
 
-@router.get("/download/{download_id}/status", response_model=DownloadStatusSchema)
-async def get_download_status(download_id: str, db: Session = Depends(get_db)):
-    """Получает статус загрузки"""
+@router.post("/downloads/batch")
+async def create_batch_download(
+    request: BatchDownloadRequest,
+    http_request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """Создает пакет загрузок из списка URL и плейлистов, результаты отдаются потоком NDJSON"""
     
+    client_ip = get_client_ip(http_request)
+    session_id = get_user_identifier(http_request, response)
     download_service = DownloadService(db)
-    download = download_service.get_download(download_id)
+    youtube_service = YouTubeService()
     
-    if not download:
-        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    # Разворачиваем плейлисты в отдельные видео (плоское извлечение без форматов)
+    urls = []
+    for url in map(str, request.urls):
+        if youtube_service.extract_playlist_id(url):
+            try:
+                urls.extend(await asyncio.to_thread(
+                    youtube_service.expand_playlist, url, settings.BATCH_MAX_ITEMS
+                ))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except ExtractionTimeoutError as e:
+                retry_after = str(int(settings.EXTRACT_TIMEOUT_SECONDS))
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": retry_after})
+        else:
+            urls.append(url)
+    
+    # Отсекаем дубликаты внутри пакета и превышение лимита до дорогой валидации
+    accepted = []
+    skipped = []
+    seen_video_ids = set()
+    for index, url in enumerate(urls):
+        try:
+            video_id = youtube_service.extract_video_id(url)
+        except ValueError:
+            video_id = None
+        if video_id and video_id in seen_video_ids:
+            skipped.append((index, url, "Видео уже есть в этом пакете"))
+        elif len(accepted) >= settings.BATCH_MAX_ITEMS:
+            skipped.append((index, url, f"Превышен лимит пакета: {settings.BATCH_MAX_ITEMS}"))
+        else:
+            seen_video_ids.add(video_id)
+            accepted.append((index, url))
+    
+    rate_limit = download_service.check_rate_limit(client_ip, requested=len(accepted))
+    if not rate_limit['allowed']:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": "Превышен лимит загрузок",
+                "requested": len(accepted),
+                "hourly_limit": rate_limit['hourly_limit'],
+                "daily_limit": rate_limit['daily_limit'],
+                "hourly_count": rate_limit['hourly_count'],
+                "daily_count": rate_limit['daily_count']
+            }
+        )
+    
+    admission = AdmissionService().check_admission()
+    if not admission['allowed']:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "Сервис перегружен, попробуйте позже",
+                "queue_depth": admission['queue_depth'],
+                "retry_after": admission['retry_after']
+            },
+            headers={"Retry-After": str(admission['retry_after'])}
+        )
     
+    async def stream_results():
+        semaphore = asyncio.Semaphore(settings.BATCH_VALIDATION_CONCURRENCY)
+        
+        async def validate(index: int, url: str):
+            async with semaphore:
+                return index, url, await asyncio.to_thread(youtube_service.validate_video_sync, url)
+        
+        for index, url, reason in skipped:
+            yield BatchDownloadItem(
+                index=index, url=url, status="skipped", error=reason
+            ).model_dump_json() + "\n"
+        
+        # Ошибки валидации отдаем сразу по мере готовности
+        valid_items = []
+        failed = 0
+        for future in asyncio.as_completed([validate(index, url) for index, url in accepted]):
+            index, url, validation = await future
+            if not validation['valid']:
+                failed += 1
+                yield BatchDownloadItem(
+                    index=index, url=url, status="failed", error=validation['error']
+                ).model_dump_json() + "\n"
+            else:
+                valid_items.append((index, url, validation['info']))
+        
+        # Сессия зависимости get_db закрывается до начала стриминга - открываем свою
+        downloads = []
+        if valid_items:
+            valid_items.sort(key=lambda item: item[0])
+            stream_db = SessionLocal()
+            try:
+                downloads = DownloadService(stream_db).create_downloads_bulk(
+                    items=[(url, info.model_dump()) for _, url, info in valid_items],
+                    format_type=request.format,
+                    quality=request.quality,
+                    audio_only=request.audio_only,
+                    client_ip=client_ip,
+                    session_id=session_id
+                )
+                PopularityService().record_many(
+                    [info.video_id for _, _, info in valid_items],
+                    (request.format.value, request.quality, request.audio_only)
+                )
+                group(
+                    celery_app.signature(DOWNLOAD_VIDEO_TASK, args=[download.id]) for download in downloads
+                ).apply_async()
+            except Exception as e:
+                logger.error("Ошибка создания пакета загрузок", error=str(e), client_ip=client_ip)
+                downloads = []
+                failed += len(valid_items)
+                for index, url, _ in valid_items:
+                    yield BatchDownloadItem(
+                        index=index, url=url, status="failed", error=f"Внутренняя ошибка: {str(e)}"
+                    ).model_dump_json() + "\n"
+            finally:
+                stream_db.close()
+        
+        for (index, url, info), download in zip(valid_items, downloads):
+            item_response = build_download_response(download)
+            item_response.video_info = info
+            yield BatchDownloadItem(
+                index=index, url=url, status="queued", download=item_response
+            ).model_dump_json() + "\n"
+        
+        yield BatchDownloadSummary(
+            total=len(urls),
+            queued=len(downloads),
+            failed=failed,
+            skipped=len(skipped)
+        ).model_dump_json() + "\n"
+    
+    stream = StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    # Переносим cookie сессии, выставленную на response зависимости
+    stream.raw_headers.extend(
+        (key, value) for key, value in response.raw_headers if key == b"set-cookie"
+    )
+    return stream
+
+async def progressive_download_url(download_id: str) -> Optional[str]:
+    """Ссылка на файл, который еще загружается и может отдаваться потоком"""
+    state = await ProgressiveDeliveryService.get_state(download_id)
+    if state and state.get('state') == STATE_DOWNLOADING:
+        return f"/api/download/{download_id}/file"
+    return None
+
+def live_number(live: dict, field: str, cast=float):
+    """Числовое поле оперативного статуса (в Redis хранится строкой)"""
+    value = live.get(field)
+    return cast(float(value)) if value else None
+
+async def live_download_status(download_id: str, live: dict) -> DownloadStatusSchema:
+    """Статус выполняющейся загрузки из оперативного состояния в Redis"""
     download_url = None
+    if live.get('progressive') == "1":
+        download_url = await progressive_download_url(download_id)
+    return DownloadStatusSchema(
+        id=download_id,
+        status=DownloadStatus.PROCESSING,
+        progress=live_number(live, 'progress'),
+        speed=live_number(live, 'speed'),
+        eta=live_number(live, 'eta', int),
+        error_message=None,
+        file_name=None,
+        file_size=None,
+        download_url=download_url,
+        progressive=download_url is not None
+    )
+
+async def stored_download_status(download) -> DownloadStatusSchema:
+    """Статус загрузки из записи БД"""
+    download_url = None
+    progressive = False
     if download.status == DownloadStatus.COMPLETED and download.file_name:
         download_url = f"/api/download/{download.id}/file"
+    elif (download.status == DownloadStatus.PROCESSING and
+          supports_progressive(download.format, download.audio_only)):
+        download_url = await progressive_download_url(download.id)
+        progressive = download_url is not None
     
     return DownloadStatusSchema(
         id=download.id,
@@ -160,9 +508,155 @@ async def get_download_status(download_id: str, db: Session = Depends(get_db)):
         error_message=download.error_message,
         file_name=download.file_name,
         file_size=download.file_size,
-        download_url=download_url
+        download_url=download_url,
+        progressive=progressive
     )
 
+def status_version(status: DownloadStatusSchema) -> str:
+    """Версия статуса: меняется при любом изменении его полей"""
+    return hashlib.sha1(status.model_dump_json().encode()).hexdigest()[:16]
+
+def find_downloads(db: Session, download_ids: List[str]) -> dict:
+    """Загрузки по ID одним запросом; не найденные на реплике ищутся на основной базе"""
+    downloads = {download.id: download for download in DownloadService(db).get_downloads(download_ids)}
+    lagging = [download_id for download_id in download_ids if download_id not in downloads]
+    if lagging and reads_from_replica(db):
+        with session_scope() as primary:
+            downloads.update(
+                (download.id, download) for download in DownloadService(primary).get_downloads(lagging)
+            )
+    return downloads
+
+@contextmanager
+def versioned_read(db: Session, changed_recently: bool):
+    """Сессия для ответа под ETag версии сессии.
+    
+    Версия меняется сразу после commit на основной базе: пока реплика могла
+    не получить изменение, чтение идет с основной базы, иначе устаревший ответ
+    закешировался бы под новой версией и отдавался бы 304 до следующего изменения.
+    """
+    if changed_recently and reads_from_replica(db):
+        with session_scope() as primary:
+            yield primary
+    else:
+        yield db
+
+async def resolve_download_status(
+    download_id: str,
+    db: Session,
+    session_id: Optional[str],
+    if_none_match: Optional[str],
+    response: Optional[Response]
+):
+    """Текущий статус загрузки или 304, если он совпадает с If-None-Match"""
+    
+    # Выполняющаяся задача публикует статус и прогресс в Redis - БД не читаем
+    live = await LiveStatusService.get(download_id)
+    if live and live.get('status') == DownloadStatus.PROCESSING:
+        # Состояние меняется с каждой публикацией прогресса
+        etag = make_etag("live", download_id, live.get('updated_at'))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        if response is not None:
+            response.headers.update(cache_headers(etag))
+        return await live_download_status(download_id, live)
+    
+    # ETag по версии сессии владельца: любое изменение загрузки меняет версию
+    version = await SessionVersionService.get(session_id) if session_id else None
+    etag = make_etag(session_id, version, download_id) if version else None
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    changed_recently = bool(etag) and await SessionVersionService.changed_recently(session_id)
+    with versioned_read(db, changed_recently) as read_db:
+        download = find_downloads(read_db, [download_id]).get(download_id)
+        
+        if not download:
+            raise HTTPException(status_code=404, detail="Загрузка не найдена")
+        
+        status = await stored_download_status(download)
+    
+    # Чужая загрузка или выполняющаяся без оперативного статуса в Redis - ETag по содержимому
+    if not etag or download.session_id != session_id or download.status == DownloadStatus.PROCESSING:
+        etag = make_etag("status", download_id, status_version(status))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    if response is not None:
+        response.headers.update(cache_headers(etag))
+    
+    return status
+
+@router.get("/download/{download_id}/status", response_model=DownloadStatusSchema)
+async def get_download_status(
+    download_id: str,
+    db: Session = Depends(get_read_db),
+    request: Request = None,
+    response: Response = None,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    wait: float = 0
+):
+    """Получает статус загрузки.
+    
+    С wait и If-None-Match запрос ждет до wait секунд, пока статус не изменится (long polling).
+    """
+    
+    # Сессию здесь не создаем - статус доступен и без cookie
+    session_id = request.cookies.get('session_id') if request else None
+    wait = min(max(wait, 0), settings.STATUS_LONG_POLL_MAX_SECONDS)
+    if not wait or not if_none_match:
+        return await resolve_download_status(download_id, db, session_id, if_none_match, response)
+    
+    deadline = asyncio.get_running_loop().time() + wait
+    # Подписка до чтения статуса, чтобы не пропустить изменение между ними
+    async with get_live_status_watcher().watch(download_id) as changed:
+        while True:
+            result = await resolve_download_status(download_id, db, session_id, if_none_match, response)
+            if not isinstance(result, Response):
+                return result
+            # Пока ждем, соединение с БД возвращается в пул
+            db.close()
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return result
+            changed.clear()
+
+@router.post("/downloads/status", response_model=BulkStatusResponse)
+async def get_downloads_status(request: BulkStatusRequest, db: Session = Depends(get_read_db)):
+    """Статусы нескольких загрузок за один запрос: только изменившиеся с версий since"""
+    
+    download_ids = list(dict.fromkeys(request.ids))
+    statuses = {}
+    
+    # Выполняющиеся загрузки - одним запросом к Redis, остальные - одним IN запросом к БД
+    lives = await LiveStatusService.get_many(download_ids)
+    for download_id, live in zip(download_ids, lives):
+        if live and live.get('status') == DownloadStatus.PROCESSING:
+            statuses[download_id] = await live_download_status(download_id, live)
+    
+    stored_ids = [download_id for download_id in download_ids if download_id not in statuses]
+    for download in find_downloads(db, stored_ids).values():
+        statuses[download.id] = await stored_download_status(download)
+    
+    items = []
+    unchanged = 0
+    missing = []
+    for download_id in download_ids:
+        status = statuses.get(download_id)
+        if status is None:
+            missing.append(download_id)
+            continue
+        version = status_version(status)
+        if request.since.get(download_id) == version:
+            unchanged += 1
+            continue
+        items.append(BulkStatusItem(**status.model_dump(), version=version))
+    
+    return BulkStatusResponse(statuses=items, unchanged=unchanged, missing=missing)
+
 @router.get("/download/{download_id}/file")
 async def download_file(download_id: str, db: Session = Depends(get_db)):
     """Скачивает файл"""
@@ -173,6 +667,12 @@ async def download_file(download_id: str, db: Session = Depends(get_db)):
     if not download:
         raise HTTPException(status_code=404, detail="Загрузка не найдена")
     
+    if (download.status == DownloadStatus.PROCESSING and
+            supports_progressive(download.format, download.audio_only)):
+        stream = await stream_in_progress_file(download)
+        if stream:
+            return stream
+    
     if download.status != DownloadStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Загрузка еще не завершена")
     
@@ -193,6 +693,37 @@ async def download_file(download_id: str, db: Session = Depends(get_db)):
         }
     )
 
+async def stream_in_progress_file(download) -> Optional[StreamingResponse]:
+    """Отдает файл, который воркер еще загружает, chunked потоком.
+    
+    Итоговый размер еще неизвестен, поэтому Range не поддерживается: файл всегда
+    отдается с начала (200, Accept-Ranges: none), докачка - после завершения загрузки.
+    None - потоковая отдача невозможна (нет состояния или файла), ответ как без нее.
+    """
+    state = await ProgressiveDeliveryService.get_state(download.id)
+    if not state or state.get('state') not in (STATE_DOWNLOADING, STATE_FINISHED):
+        return None
+    if not ProgressiveDeliveryService.file_path(state):
+        return None
+    
+    file_name = os.path.basename(state.get('filename') or f"{download.video_id}.mp4")
+    encoded_filename = urllib.parse.quote(file_name.encode('utf-8'))
+    
+    logger.info("Потоковая отдача файла во время загрузки",
+               download_id=download.id,
+               downloaded_bytes=state.get('downloaded_bytes'))
+    
+    return StreamingResponse(
+        ProgressiveDeliveryService.tail_file(download.id, state),
+        media_type='application/octet-stream',
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+            "Access-Control-Expose-Headers": "Content-Disposition",
+            "Accept-Ranges": "none",
+            "Cache-Control": "no-cache"
+        }
+    )
+
 @router.post("/downloads/cleanup")
 async def cleanup_user_downloads(
     request: Request,
@@ -247,7 +778,7 @@ async def cleanup_user_downloads_delete(
 async def get_global_activity(
     page: int = 1,
     per_page: int = 20,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получает глобальную активность всех пользователей (только название и дата)"""
     
@@ -268,12 +799,12 @@ async def get_global_activity(
             'created_at': download.created_at
         })
     
-    return {
+    return fast_json_response({
         'activity': activity_items,
         'total': total,
         'page': page,
         'per_page': per_page
-    }
+    })
 
 @router.get("/downloads/my", response_model=DownloadHistory)
 async def get_my_downloads(
@@ -281,7 +812,8 @@ async def get_my_downloads(
     per_page: int = 20,
     request: Request = None,
     response: Response = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
 ):
     """Получает загрузки текущего пользователя с полной информацией"""
     
@@ -289,48 +821,103 @@ async def get_my_downloads(
         per_page = 100
     
     session_id = get_user_identifier(request, response) if request else None
-    download_service = DownloadService(db)
     
-    downloads, total = download_service.get_user_downloads(
-        session_id=session_id,
-        page=page, 
-        per_page=per_page
-    )
+    # Список не менялся с прошлого запроса - отвечаем 304 без запроса в БД
+    version = await SessionVersionService.get(session_id) if session_id else None
+    if version:
+        etag = make_etag(session_id, version, "my", page, per_page)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        response.headers.update(cache_headers(etag))
     
-    download_responses = []
-    for download in downloads:
-        video_info = None
-        if download.video_title:
-            video_info = {
-                'video_id': download.video_id,
-                'title': download.video_title,
-                'description': download.video_description,
-                'duration': download.video_duration,
-                'thumbnail': download.video_thumbnail,
-                'channel_name': download.channel_name,
-                'view_count': download.view_count,
-                'available_formats': []
-            }
-        
-        download_url = None
-        if download.status == DownloadStatus.COMPLETED and download.file_name:
-            download_url = f"/api/download/{download.id}/file"
+    changed_recently = bool(version) and await SessionVersionService.changed_recently(session_id)
+    with versioned_read(db, changed_recently) as read_db:
+        downloads, total = DownloadService(read_db).get_user_downloads(
+            session_id=session_id,
+            page=page, 
+            per_page=per_page
+        )
         
-        download_responses.append(DownloadResponse(
-            id=download.id,
-            status=download.status,
-            video_info=video_info,
-            download_url=download_url,
-            error_message=download.error_message,
-            created_at=download.created_at
-        ))
-    
-    return DownloadHistory(
-        downloads=download_responses,
-        total=total,
-        page=page,
-        per_page=per_page
+        # Строки сразу в JSON: схема DownloadHistory остается для документации
+        return fast_json_response({
+            'downloads': [download_response_fields(download) for download in downloads],
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        }, response)
+
+@router.get("/downloads/my/archive")
+async def download_my_archive(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """Отдает ZIP архив всех готовых файлов пользователя потоком (с поддержкой докачки)"""
+    
+    session_id = get_user_identifier(request, response)
+    download_service = DownloadService(db)
+    
+    downloads = download_service.get_user_completed_downloads(session_id)
+    files = [
+        (download.file_name or os.path.basename(download.file_path), download.file_path)
+        for download in downloads
+        if os.path.exists(download.file_path)
+    ]
+    if not files:
+        raise HTTPException(status_code=404, detail="Нет готовых файлов")
+    
+    try:
+        archive = ZipStream(build_zip_entries(files))
+    except (OSError, ValueError) as e:
+        logger.error("Ошибка подготовки архива", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=409, detail=f"Не удалось собрать архив: {str(e)}")
+    
+    headers = {
+        "Content-Disposition": "attachment; filename=\"ytubik_downloads.zip\"",
+        "Access-Control-Expose-Headers": "Content-Disposition, Content-Range, ETag",
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{archive.etag}"',
+        "Cache-Control": "no-cache"
+    }
+    
+    # Докачка: Range учитывается, только если архив не изменился (If-Range)
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (not if_range or if_range.strip('"') == archive.etag):
+        byte_range = parse_range_header(range_header, archive.size)
+        if byte_range is None:
+            raise HTTPException(
+                status_code=416,
+                detail="Диапазон недоступен",
+                headers={"Content-Range": f"bytes */{archive.size}"}
+            )
+    
+    status_code = 200
+    start, end = 0, archive.size - 1
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    logger.info("Отдача архива пользователя",
+               session_id=session_id,
+               files=len(files),
+               size=archive.size,
+               start=start,
+               end=end)
+    
+    stream = StreamingResponse(
+        archive.iter_range(start, end),
+        status_code=status_code,
+        media_type="application/zip",
+        headers=headers
     )
+    stream.raw_headers.extend(
+        (key, value) for key, value in response.raw_headers if key == b"set-cookie"
+    )
+    return stream
 
 @router.get("/downloads", response_model=DownloadHistory)
 async def get_downloads_history(
@@ -338,7 +925,8 @@ async def get_downloads_history(
     per_page: int = 20,
     request: Request = None,
     response: Response = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
 ):
     """Получает историю загрузок (deprecated - используйте /downloads/my)"""
-    return await get_my_downloads(page, per_page, request, response, db)
+    return await get_my_downloads(page, per_page, request, response, db, if_none_match)
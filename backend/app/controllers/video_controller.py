@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 import structlog
 
-from app.services.youtube_service import YouTubeService
+from app.config.settings import settings
+from app.services.youtube_service import YouTubeService, ExtractionTimeoutError
+from app.services.prefetch_service import PrefetchService
 from app.schemas.download_schemas import VideoInfoRequest, VideoInfo
 
 logger = structlog.get_logger()
@@ -20,8 +22,19 @@ async def get_video_info(request: VideoInfoRequest):
                    video_id=video_info.video_id,
                    title=video_info.title)
         
+        # Пока пользователь выбирает формат, начинаем загрузку формата по умолчанию
+        if (settings.PREFETCH_ENABLED and video_info.duration and
+                video_info.duration <= settings.MAX_VIDEO_DURATION_MINUTES * 60):
+            PrefetchService().schedule(video_info.video_id, str(request.url))
+        
         return video_info
         
+    except ExtractionTimeoutError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(settings.EXTRACT_TIMEOUT_SECONDS))}
+        )
     except Exception as e:
         logger.error("Ошибка получения информации о видео", 
                     url=str(request.url), 
@@ -1,11 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import structlog
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from app.config.settings import settings
-from app.controllers import download_controller, video_controller
+from app.controllers import download_controller, video_controller, admin_controller
 from app.models.database import engine, Base
+from app.models.partitioning import create_partitioned_downloads
+from app.services.live_status_service import get_live_status_watcher
+from app.utils.metrics import render_metrics
 
 # Настройка логирования
 structlog.configure(
@@ -28,8 +32,10 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Создание таблиц в БД
+# Создание таблиц в БД (downloads на Postgres - секционированной по дням)
+create_partitioned_downloads(engine)
 Base.metadata.create_all(bind=engine)
+# Изменения существующих таблиц - миграциями Alembic: make migrate (alembic upgrade head)
 
 app = FastAPI(
     title="YouTube Video Downloader",
@@ -51,6 +57,7 @@ app.add_middleware(
 # Подключение роутеров
 app.include_router(download_controller.router, prefix="/api", tags=["downloads"])
 app.include_router(video_controller.router, prefix="/api", tags=["video"])
+app.include_router(admin_controller.router, prefix="/api", tags=["admin"])
 
 # Статические файлы для загруженных видео
 app.mount("/downloads", StaticFiles(directory=settings.DOWNLOAD_DIR), name="downloads")
@@ -63,6 +70,7 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await get_live_status_watcher().stop()
     logger.info("YouTube Downloader API остановлен")
 
 @app.get("/")
@@ -76,3 +84,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "youtube-downloader"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики Prometheus"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
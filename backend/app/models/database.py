@@ -1,16 +1,92 @@
-from sqlalchemy import create_engine, MetaData
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, MetaData, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.config.settings import settings
 
+# Каталог backend: alembic.ini и migrations
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def engine_options(database_url: str) -> dict:
+    """Параметры пула соединений из настроек"""
+    if database_url.startswith("sqlite"):
+        # Пул SQLite зависит от вида базы (файл или память) - оставляем по умолчанию
+        return {"connect_args": {"check_same_thread": False}, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer (transaction pooling) сам держит пул: соединение закрывается после каждой сессии
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Операторы, которым нужна блокировка записи SQLite
+_SQLITE_WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "ALTER", "DROP")
+
+def configure_sqlite(bind) -> None:
+    """Режим SQLite для одного узла: WAL, прагмы и единый путь записи в процессе.
+    
+    API, воркер и beat работают с одним файлом. В WAL чтение не блокирует запись,
+    а записи процесса идут по очереди через блокировку вместо опроса busy_timeout;
+    между процессами запись ждет освобождения блокировки SQLite до busy_timeout.
+    """
+    if bind.dialect.name != "sqlite" or not settings.SQLITE_WAL_MODE:
+        return
+    writer_lock = threading.Lock()
+
+    @event.listens_for(bind, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # В WAL безопасно: теряются только последние транзакции при сбое ОС
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    if not settings.SQLITE_SINGLE_WRITER:
+        return
+
+    @event.listens_for(bind, "before_cursor_execute")
+    def acquire_writer(conn, cursor, statement, parameters, context, executemany):
+        # Блокировка держится от первой записи до конца транзакции
+        if conn.info.get('sqlite_writer') or not statement.lstrip().upper().startswith(_SQLITE_WRITE_STATEMENTS):
+            return
+        if not writer_lock.acquire(timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000):
+            raise sqlite3.OperationalError("database is locked")
+        conn.info['sqlite_writer'] = True
+
+    def release_writer(info: dict) -> None:
+        if info.pop('sqlite_writer', False):
+            writer_lock.release()
+
+    event.listen(bind, "commit", lambda conn: release_writer(conn.info))
+    event.listen(bind, "rollback", lambda conn: release_writer(conn.info))
+    # Соединение вернулось в пул без commit/rollback через Connection
+    event.listen(bind, "checkin", lambda dbapi_connection, record: release_writer(record.info))
+
 # Создание движка базы данных
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+configure_sqlite(engine)
+
+# Реплика для запросов только на чтение (история, глобальная лента, статусы)
+replica_engine = (
+    create_engine(settings.DATABASE_REPLICA_URL, **engine_options(settings.DATABASE_REPLICA_URL))
+    if settings.DATABASE_REPLICA_URL else engine
 )
+if replica_engine is not engine:
+    configure_sqlite(replica_engine)
 
 # Создание сессии
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
 
 # Базовый класс для моделей
 Base = declarative_base()
@@ -22,3 +98,38 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Сессия для запросов только на чтение: реплика, если она настроена"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def reads_from_replica(db) -> bool:
+    """Сессия читает с реплики: только что записанные строки могут еще не дойти до нее"""
+    return replica_engine is not engine and db.get_bind() is replica_engine
+
+@contextmanager
+def session_scope():
+    """Короткая сессия на одну операцию: соединение возвращается в пул сразу после нее"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def run_migrations(connection=None) -> None:
+    """Применяет миграции Alembic до последней версии (alembic upgrade head).
+    
+    Запускается один раз командой (make migrate, сервис backend в Docker Compose),
+    а не при импорте приложения: параллельные процессы не изменяют схему одновременно.
+    """
+    from alembic import command
+    from alembic.config import Config
+    
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.attributes['connection'] = connection
+    command.upgrade(config, "head")
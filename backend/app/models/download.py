@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, Float
+from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, Float, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -50,6 +50,9 @@ class Download(Base):
     client_ip = Column(String, nullable=True)
     session_id = Column(String, nullable=True)  # Уникальный идентификатор сессии пользователя
     
+    # Адрес для уведомления о завершении (webhook API клиентов)
+    callback_url = Column(String, nullable=True)
+    
     # Временные метки
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -57,5 +60,8 @@ class Download(Base):
     completed_at = Column(DateTime(timezone=True), nullable=True)
     expires_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Тайминги этапов задачи: смещения в секундах от создания записи, объем и скорость
+    stage_timings = Column(JSON, nullable=True)
+    
     def __repr__(self):
         return f"<Download(id={self.id}, title={self.video_title}, status={self.status})>"
@@ -0,0 +1,132 @@
+"""Секционирование таблицы downloads по дням created_at (Postgres).
+
+Старые записи удаляются целыми секциями (DETACH + DROP) вместо построчного
+DELETE, а запросы по свежим данным читают только последние секции.
+Существующую несекционированную таблицу переводит команда:
+
+    python -m app.models.partitioning
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import structlog
+from sqlalchemy import Column, MetaData, PrimaryKeyConstraint, Table, text
+from sqlalchemy.schema import CreateTable
+
+from app.config.settings import settings
+from app.models.download import Download
+
+logger = structlog.get_logger()
+
+TABLE = Download.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+_PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{8}})$")
+
+def partitioning_enabled(bind) -> bool:
+    return bind.dialect.name == "postgresql" and settings.DOWNLOADS_PARTITIONING
+
+def partitioned_table() -> Table:
+    """Таблица downloads с секционированием: created_at входит в первичный ключ"""
+    columns = [
+        Column(
+            column.name, column.type,
+            nullable=column.nullable and column.name != 'created_at',
+            server_default=column.server_default.arg if column.server_default is not None else None,
+        )
+        for column in Download.__table__.columns
+    ]
+    return Table(
+        TABLE, MetaData(), *columns, PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+
+def partition_name(day: date) -> str:
+    return f"{TABLE}_p{day:%Y%m%d}"
+
+def partition_day(name: str) -> Optional[date]:
+    """День секции по ее имени; None для секции по умолчанию и чужих таблиц"""
+    match = _PARTITION_NAME.match(name)
+    return datetime.strptime(match.group(1), "%Y%m%d").date() if match else None
+
+def partition_ddl(day: date) -> str:
+    """Секция на сутки UTC"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')"
+    )
+
+def is_partitioned(connection) -> bool:
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {'table': TABLE}
+    ).first() is not None
+
+def list_partitions(connection) -> List[str]:
+    return list(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {'table': TABLE}).scalars())
+
+def ensure_partitions(connection, today: Optional[date] = None, first_day: Optional[date] = None) -> List[str]:
+    """Создает секции с first_day (по умолчанию сегодня) на DOWNLOADS_PARTITIONS_AHEAD_DAYS вперед.
+
+    Записи вне созданных секций попадают в секцию по умолчанию, поэтому вставка
+    не ломается, даже если beat долго не работал.
+    """
+    today = today or datetime.utcnow().date()
+    day = first_day or today
+    created = []
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    existing = set(list_partitions(connection))
+    while day <= today + timedelta(days=settings.DOWNLOADS_PARTITIONS_AHEAD_DAYS):
+        if partition_name(day) not in existing:
+            connection.execute(text(partition_ddl(day)))
+            created.append(partition_name(day))
+        day += timedelta(days=1)
+    return created
+
+def create_partitioned_downloads(bind) -> bool:
+    """Создает downloads секционированной, если таблицы еще нет (вызывается до create_all)"""
+    if not partitioning_enabled(bind):
+        return False
+    with bind.begin() as connection:
+        if connection.execute(text("SELECT to_regclass(:table)"), {'table': TABLE}).scalar() is None:
+            connection.execute(CreateTable(partitioned_table(), if_not_exists=True))
+        elif not is_partitioned(connection):
+            logger.warning("Таблица downloads не секционирована, старые записи удаляются построчно",
+                           command="python -m app.models.partitioning")
+            return False
+        ensure_partitions(connection)
+    return True
+
+def convert_to_partitioned(bind) -> int:
+    """Переносит существующую таблицу downloads в секционированную.
+
+    Выполняется одной транзакцией при остановленных API и воркерах. Секции
+    создаются за последние DOWNLOADS_RETENTION_DAYS дней; более старые записи
+    попадают в секцию по умолчанию и удаляются ближайшей задачей хранения.
+    """
+    legacy = f"{TABLE}_unpartitioned"
+    names = ", ".join(column.name for column in Download.__table__.columns)
+    values = names.replace("created_at", "COALESCE(created_at, updated_at, now())")
+    with bind.begin() as connection:
+        if is_partitioned(connection):
+            return 0
+        connection.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        connection.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        # Имя ограничения первичного ключа освобождается для новой таблицы
+        connection.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE}_pkey TO {legacy}_pkey"))
+        connection.execute(CreateTable(partitioned_table()))
+        today = datetime.utcnow().date()
+        ensure_partitions(connection, today, first_day=today - timedelta(days=settings.DOWNLOADS_RETENTION_DAYS))
+        moved = connection.execute(text(f"INSERT INTO {TABLE} ({names}) SELECT {values} FROM {legacy}")).rowcount
+        connection.execute(text(f"DROP TABLE {legacy}"))
+    logger.info("Таблица downloads переведена на секции", rows=moved)
+    return moved
+
+if __name__ == "__main__":
+    from app.models.database import engine
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Секционирование поддерживается только для Postgres")
+    print(f"Перенесено записей: {convert_to_partitioned(engine)}")
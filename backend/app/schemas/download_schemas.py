@@ -1,7 +1,8 @@
 from pydantic import BaseModel, HttpUrl, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from app.models.download import DownloadStatus, DownloadFormat
+from app.config.settings import settings
 
 # Схемы для запросов
 
@@ -10,6 +11,7 @@ class DownloadRequest(BaseModel):
     format: DownloadFormat = Field(DownloadFormat.VIDEO_MP4, description="Формат файла")
     quality: Optional[str] = Field("best", description="Качество видео (720p, 1080p, best)")
     audio_only: bool = Field(False, description="Загрузить только аудио")
+    callback_url: Optional[HttpUrl] = Field(None, description="URL для подписанного POST при завершении или ошибке")
     
     @validator('url')
     def validate_youtube_url(cls, v):
@@ -18,6 +20,35 @@ class DownloadRequest(BaseModel):
             raise ValueError('URL должен быть YouTube ссылкой')
         return v
 
+class BatchDownloadRequest(BaseModel):
+    urls: List[HttpUrl] = Field(..., description="YouTube URL видео или плейлистов")
+    format: DownloadFormat = Field(DownloadFormat.VIDEO_MP4, description="Формат файла")
+    quality: Optional[str] = Field("best", description="Качество видео (720p, 1080p, best)")
+    audio_only: bool = Field(False, description="Загрузить только аудио")
+    
+    @validator('urls')
+    def validate_youtube_urls(cls, v):
+        if not v:
+            raise ValueError('Список URL не должен быть пустым')
+        if len(v) > settings.BATCH_MAX_ITEMS:
+            raise ValueError(f'Не более {settings.BATCH_MAX_ITEMS} URL за запрос')
+        for url in v:
+            if not any(domain in str(url) for domain in ['youtube.com', 'youtu.be']):
+                raise ValueError('Все URL должны быть YouTube ссылками')
+        return v
+
+class BulkStatusRequest(BaseModel):
+    ids: List[str] = Field(..., description="ID загрузок")
+    since: Dict[str, str] = Field(default_factory=dict, description="Версии статусов из прошлого ответа по ID")
+    
+    @validator('ids')
+    def validate_ids(cls, v):
+        if not v:
+            raise ValueError('Список ID не должен быть пустым')
+        if len(v) > settings.STATUS_BULK_MAX_IDS:
+            raise ValueError(f'Не более {settings.STATUS_BULK_MAX_IDS} ID за запрос')
+        return v
+
 class VideoInfoRequest(BaseModel):
     url: HttpUrl = Field(..., description="YouTube URL для получения информации")
     
@@ -47,6 +78,8 @@ class DownloadResponse(BaseModel):
     download_url: Optional[str]
     error_message: Optional[str]
     created_at: datetime
+    queue_position: Optional[int] = Field(None, description="Задач в очереди перед этой загрузкой")
+    estimated_start: Optional[datetime] = Field(None, description="Ожидаемое время начала обработки")
     
     class Config:
         from_attributes = True
@@ -55,20 +88,64 @@ class DownloadStatus(BaseModel):
     id: str
     status: DownloadStatus
     progress: Optional[float] = Field(None, description="Прогресс в процентах")
+    speed: Optional[float] = Field(None, description="Скорость загрузки, байт/с")
+    eta: Optional[int] = Field(None, description="Оставшееся время загрузки, секунд")
     error_message: Optional[str]
     file_name: Optional[str]
     file_size: Optional[float]
     download_url: Optional[str]
+    progressive: bool = Field(False, description="Файл еще загружается и отдается потоком")
     
     class Config:
         from_attributes = True
 
+class BulkStatusItem(DownloadStatus):
+    version: str = Field(..., description="Версия статуса для следующего запроса (since)")
+
+class BulkStatusResponse(BaseModel):
+    statuses: List[BulkStatusItem] = Field(..., description="Статусы, изменившиеся с версий since")
+    unchanged: int = Field(0, description="Сколько статусов не изменилось")
+    missing: List[str] = Field(default_factory=list, description="ID, которые не найдены")
+
 class DownloadHistory(BaseModel):
     downloads: List[DownloadResponse]
     total: int
     page: int
     per_page: int
     
+class BatchDownloadItem(BaseModel):
+    """Строка NDJSON ответа пакетной загрузки"""
+    type: str = "item"
+    index: int
+    url: str
+    status: str = Field(..., description="queued, failed или skipped")
+    download: Optional[DownloadResponse] = None
+    error: Optional[str] = None
+
+class BatchDownloadSummary(BaseModel):
+    """Последняя строка NDJSON ответа пакетной загрузки"""
+    type: str = "summary"
+    total: int
+    queued: int
+    failed: int
+    skipped: int
+    
+class StagePercentiles(BaseModel):
+    count: int
+    p50: Optional[float]
+    p90: Optional[float]
+    p95: Optional[float]
+    p99: Optional[float]
+    max: Optional[float]
+
+class StageStatistics(BaseModel):
+    window_hours: int
+    jobs: int
+    statuses: dict
+    fallback_rate: Optional[float] = Field(None, description="Доля задач с альтернативной стратегией")
+    stages: dict[str, StagePercentiles] = Field(..., description="Длительность этапов в секундах")
+    avg_speed: StagePercentiles = Field(..., description="Средняя скорость загрузки, байт/с")
+    
 class ErrorResponse(BaseModel):
     error: str
     detail: Optional[str]
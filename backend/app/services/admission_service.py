@@ -0,0 +1,80 @@
+import math
+import statistics
+from datetime import datetime, timedelta
+from typing import Optional
+
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+class AdmissionService:
+    """Контроль допуска новых загрузок по глубине очереди Celery"""
+
+    SERVICE_TIMES_KEY = "ytubik:admission:service_times"
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    def get_queue_depth(self) -> int:
+        """Возвращает число задач, ожидающих в очереди брокера"""
+        return int(self.redis.llen(settings.ADMISSION_QUEUE_NAME))
+
+    def get_average_service_time(self) -> float:
+        """Возвращает медиану длительности последних задач в секундах"""
+        samples = self.redis.lrange(self.SERVICE_TIMES_KEY, 0, -1)
+        values = [float(value) for value in samples]
+        if not values:
+            return settings.ADMISSION_DEFAULT_SERVICE_SECONDS
+        return statistics.median(values)
+
+    def record_service_time(self, seconds: float) -> None:
+        """Сохраняет длительность выполненной задачи"""
+        pipe = self.redis.pipeline()
+        pipe.lpush(self.SERVICE_TIMES_KEY, round(seconds, 3))
+        pipe.ltrim(self.SERVICE_TIMES_KEY, 0, settings.ADMISSION_SERVICE_SAMPLES - 1)
+        pipe.execute()
+
+    def check_admission(self) -> dict:
+        """Проверяет, можно ли поставить новую задачу в очередь"""
+        if not settings.ADMISSION_CONTROL_ENABLED:
+            return {'allowed': True, 'queue_depth': None, 'estimated_wait_seconds': None,
+                    'estimated_start': None, 'retry_after': None}
+
+        try:
+            queue_depth = self.get_queue_depth()
+            service_time = self.get_average_service_time()
+        except redis.RedisError as e:
+            # Без Redis не можем оценить очередь - пропускаем запрос
+            logger.warning("Admission control недоступен", error=str(e))
+            return {'allowed': True, 'queue_depth': None, 'estimated_wait_seconds': None,
+                    'estimated_start': None, 'retry_after': None}
+
+        concurrency = max(settings.ADMISSION_WORKER_CONCURRENCY, 1)
+        estimated_wait = queue_depth / concurrency * service_time
+
+        # Допустимая глубина - минимум из жесткого лимита и лимита по времени ожидания
+        wait_limited_depth = math.floor(settings.ADMISSION_MAX_WAIT_SECONDS * concurrency / max(service_time, 0.001))
+        allowed_depth = min(settings.ADMISSION_MAX_QUEUE_DEPTH, wait_limited_depth)
+
+        allowed = queue_depth < allowed_depth
+        retry_after = None
+        if not allowed:
+            excess_jobs = queue_depth - allowed_depth + 1
+            retry_after = max(math.ceil(excess_jobs / concurrency * service_time), 1)
+            logger.warning("Очередь переполнена, загрузка отклонена",
+                          queue_depth=queue_depth,
+                          allowed_depth=allowed_depth,
+                          service_time=service_time,
+                          retry_after=retry_after)
+
+        return {
+            'allowed': allowed,
+            'queue_depth': queue_depth,
+            'estimated_wait_seconds': round(estimated_wait, 1),
+            'estimated_start': datetime.utcnow() + timedelta(seconds=estimated_wait),
+            'retry_after': retry_after
+        }
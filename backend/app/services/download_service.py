@@ -1,21 +1,58 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy import desc, and_, update
 from typing import List, Optional
 from datetime import datetime, timedelta
 import structlog
 import os
+import uuid
 
 from app.models.download import Download, DownloadStatus
 from app.models.database import get_db
+from app.services.session_version_service import SessionVersionService
 from app.config.settings import settings
+from app.utils.helpers import percentile
 
 logger = structlog.get_logger()
 
+# Этапы задачи как пары меток из Download.stage_timings (enqueued = 0)
+STAGE_INTERVALS = {
+    'queue_wait': ('enqueued', 'started'),
+    'extraction': ('started', 'info_extracted'),
+    'fetch': ('fetch_started', 'fetch_finished'),
+    'postprocess': ('fetch_finished', 'postprocess_finished'),
+    'finalize': ('postprocess_finished', 'finalized'),
+    'total': ('enqueued', 'finalized'),
+}
+
+def summarize(values: List[float]) -> dict:
+    """Перцентили для списка значений"""
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None
+    }
+
+def video_info_columns(video_info: dict) -> dict:
+    """Поля Download из информации о видео"""
+    return {
+        'video_title': video_info.get('title'),
+        'video_description': video_info.get('description'),
+        'video_duration': video_info.get('duration'),
+        'video_thumbnail': video_info.get('thumbnail'),
+        'channel_name': video_info.get('channel_name'),
+        'view_count': video_info.get('view_count'),
+    }
+
 class DownloadService:
     """Сервис для управления загрузками"""
     
     def __init__(self, db: Session):
         self.db = db
+        # Изменения загрузок меняют версию сессии (ETag списка и статусов)
+        self.versions = SessionVersionService()
     
     def create_download(self, 
                        youtube_url: str,
@@ -24,8 +61,10 @@ class DownloadService:
                        quality: str,
                        audio_only: bool,
                        client_ip: str,
-                       session_id: str) -> Download:
-        """Создает новую запись загрузки"""
+                       session_id: str,
+                       video_info: Optional[dict] = None,
+                       callback_url: Optional[str] = None) -> Download:
+        """Создает новую запись загрузки (сразу с информацией о видео, если она известна)"""
         
         download = Download(
             youtube_url=youtube_url,
@@ -35,13 +74,16 @@ class DownloadService:
             audio_only=audio_only,
             client_ip=client_ip,
             session_id=session_id,
+            callback_url=callback_url,
             status=DownloadStatus.PENDING,
-            expires_at=datetime.utcnow() + timedelta(hours=settings.FILE_RETENTION_HOURS)
+            expires_at=datetime.utcnow() + timedelta(hours=settings.FILE_RETENTION_HOURS),
+            **(video_info_columns(video_info) if video_info else {})
         )
         
         self.db.add(download)
         self.db.commit()
         self.db.refresh(download)
+        self.versions.bump([session_id])
         
         logger.info("Создана новая загрузка", 
                    download_id=download.id,
@@ -51,79 +93,101 @@ class DownloadService:
         
         return download
     
+    def create_downloads_bulk(self,
+                              items: List[tuple[str, dict]],
+                              format_type: str,
+                              quality: str,
+                              audio_only: bool,
+                              client_ip: str,
+                              session_id: str) -> List[Download]:
+        """Создает записи загрузок пакетом в одной транзакции.
+        
+        items - список пар (youtube_url, video_info), порядок результата совпадает с items.
+        """
+        expires_at = datetime.utcnow() + timedelta(hours=settings.FILE_RETENTION_HOURS)
+        downloads = []
+        for youtube_url, video_info in items:
+            downloads.append(Download(
+                id=str(uuid.uuid4()),
+                youtube_url=youtube_url,
+                video_id=video_info.get('video_id'),
+                format=format_type,
+                quality=quality,
+                audio_only=audio_only,
+                client_ip=client_ip,
+                session_id=session_id,
+                status=DownloadStatus.PENDING,
+                expires_at=expires_at,
+                **video_info_columns(video_info)
+            ))
+        
+        self.db.add_all(downloads)
+        self.db.commit()
+        self.versions.bump([session_id])
+        
+        # Одним запросом перечитываем записи вместо refresh для каждой
+        ids = [download.id for download in downloads]
+        loaded = {d.id: d for d in self.db.query(Download).filter(Download.id.in_(ids)).all()}
+        
+        logger.info("Создан пакет загрузок",
+                   count=len(ids),
+                   client_ip=client_ip,
+                   session_id=session_id)
+        
+        return [loaded[download_id] for download_id in ids]
+    
     def get_download(self, download_id: str) -> Optional[Download]:
         """Получает загрузку по ID"""
         return self.db.query(Download).filter(Download.id == download_id).first()
     
-    def update_download_status(self, 
-                              download_id: str, 
-                              status: DownloadStatus,
-                              error_message: str = None) -> Optional[Download]:
-        """Обновляет статус загрузки"""
-        download = self.get_download(download_id)
-        if not download:
-            return None
-        
-        download.status = status
+    def get_downloads(self, download_ids: List[str]) -> List[Download]:
+        """Получает загрузки по списку ID одним запросом (порядок не гарантирован)"""
+        if not download_ids:
+            return []
+        return self.db.query(Download).filter(Download.id.in_(download_ids)).all()
+    
+    def update_download(self,
+                        download_id: str,
+                        status: Optional[DownloadStatus] = None,
+                        video_info: Optional[dict] = None,
+                        error_message: Optional[str] = None,
+                        stage_timings: Optional[dict] = None,
+                        **columns) -> bool:
+        """Записывает итог этапа задачи одним UPDATE, без чтения и refresh записи.
+        
+        columns - прочие поля Download (file_path, file_name, file_size).
+        """
+        values = dict(columns)
+        if status is not None:
+            values['status'] = status
+            if status == DownloadStatus.PROCESSING:
+                values['started_at'] = datetime.utcnow()
+            elif status == DownloadStatus.COMPLETED:
+                values['completed_at'] = datetime.utcnow()
+        if video_info is not None:
+            values.update(video_info_columns(video_info))
         if error_message:
-            download.error_message = error_message
-        
-        if status == DownloadStatus.PROCESSING:
-            download.started_at = datetime.utcnow()
-        elif status == DownloadStatus.COMPLETED:
-            download.completed_at = datetime.utcnow()
-        
+            values['error_message'] = error_message
+        if stage_timings is not None:
+            values['stage_timings'] = stage_timings
+        
+        # RETURNING отдает сессию для смены версии без отдельного чтения записи
+        session_ids = self.db.execute(
+            update(Download)
+            .where(Download.id == download_id)
+            .values(**values)
+            .returning(Download.session_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
         self.db.commit()
-        self.db.refresh(download)
+        self.versions.bump(session_ids)
         
-        logger.info("Обновлен статус загрузки",
+        logger.info("Обновлена загрузка",
                    download_id=download_id,
                    status=status,
                    error=error_message)
         
-        return download
-    
-    def update_download_file_info(self, 
-                                 download_id: str,
-                                 file_path: str,
-                                 file_name: str,
-                                 file_size: float) -> Optional[Download]:
-        """Обновляет информацию о файле"""
-        download = self.get_download(download_id)
-        if not download:
-            return None
-        
-        download.file_path = file_path
-        download.file_name = file_name
-        download.file_size = file_size
-        
-        self.db.commit()
-        self.db.refresh(download)
-        
-        logger.info("Обновлена информация о файле",
-                   download_id=download_id,
-                   file_name=file_name,
-                   file_size=file_size)
-        
-        return download
-    
-    def update_video_info(self, download_id: str, video_info: dict) -> Optional[Download]:
-        """Обновляет информацию о видео"""
-        download = self.get_download(download_id)
-        if not download:
-            return None
-        
-        download.video_title = video_info.get('title')
-        download.video_description = video_info.get('description')
-        download.video_duration = video_info.get('duration')
-        download.video_thumbnail = video_info.get('thumbnail')
-        download.channel_name = video_info.get('channel_name')
-        download.view_count = video_info.get('view_count')
-        
-        self.db.commit()
-        self.db.refresh(download)
-        
-        return download
+        return bool(session_ids)
     
     def get_downloads_by_ip(self, client_ip: str, hours: int = 1) -> List[Download]:
         """Получает загрузки по IP за определенный период"""
@@ -155,8 +219,8 @@ class DownloadService:
         
         return downloads, total
     
-    def check_rate_limit(self, client_ip: str) -> dict:
-        """Проверяет rate limiting для IP"""
+    def check_rate_limit(self, client_ip: str, requested: int = 1) -> dict:
+        """Проверяет rate limiting для IP (requested - сколько загрузок создается)"""
         # Проверка за час
         hourly_downloads = self.get_downloads_by_ip(client_ip, hours=1)
         # Проверка за день
@@ -166,8 +230,8 @@ class DownloadService:
         daily_count = len(daily_downloads)
         
         return {
-            'allowed': (hourly_count < settings.RATE_LIMIT_DOWNLOADS_PER_HOUR and 
-                       daily_count < settings.RATE_LIMIT_DOWNLOADS_PER_DAY),
+            'allowed': (hourly_count + requested <= settings.RATE_LIMIT_DOWNLOADS_PER_HOUR and 
+                       daily_count + requested <= settings.RATE_LIMIT_DOWNLOADS_PER_DAY),
             'hourly_count': hourly_count,
             'hourly_limit': settings.RATE_LIMIT_DOWNLOADS_PER_HOUR,
             'daily_count': daily_count,
@@ -205,6 +269,46 @@ class DownloadService:
         
         return downloads, total
 
+    def get_stage_statistics(self, hours: int = 24) -> dict:
+        """Агрегирует тайминги этапов задач за последние hours часов"""
+        time_threshold = datetime.utcnow() - timedelta(hours=hours)
+        rows = self.db.query(Download.status, Download.stage_timings).filter(
+            Download.created_at >= time_threshold,
+            Download.stage_timings.isnot(None)
+        ).all()
+        
+        durations = {stage: [] for stage in STAGE_INTERVALS}
+        speeds = []
+        statuses = {}
+        fallbacks = 0
+        for status, timings in rows:
+            statuses[status] = statuses.get(status, 0) + 1
+            timings = dict(timings, enqueued=0)
+            if timings.get('fallback'):
+                fallbacks += 1
+            if timings.get('avg_speed'):
+                speeds.append(timings['avg_speed'])
+            for stage, (start, end) in STAGE_INTERVALS.items():
+                if start in timings and end in timings:
+                    durations[stage].append(timings[end] - timings[start])
+        
+        return {
+            'window_hours': hours,
+            'jobs': len(rows),
+            'statuses': statuses,
+            'fallback_rate': round(fallbacks / len(rows), 4) if rows else None,
+            'stages': {stage: summarize(values) for stage, values in durations.items()},
+            'avg_speed': summarize(speeds)
+        }
+    
+    def get_user_completed_downloads(self, session_id: str) -> List[Download]:
+        """Получает завершенные загрузки пользователя с файлами в порядке создания"""
+        return self.db.query(Download).filter(
+            Download.session_id == session_id,
+            Download.status == DownloadStatus.COMPLETED,
+            Download.file_path.isnot(None)
+        ).order_by(Download.created_at, Download.id).all()
+
     def cleanup_user_downloads(self, session_id: str) -> int:
         """Удаляет все загрузки конкретного пользователя по session_id"""
         user_downloads = self.db.query(Download).filter(
@@ -231,6 +335,8 @@ class DownloadService:
             count += 1
         
         self.db.commit()
+        if count > 0:
+            self.versions.bump([session_id])
         
         if count > 0:
             logger.info("Очищены пользовательские загрузки", 
@@ -269,6 +375,7 @@ class DownloadService:
             count += 1
         
         self.db.commit()
+        self.versions.bump(download.session_id for download in expired_downloads)
         
         if count > 0:
             logger.info("Очищены загрузки по времени", 
@@ -298,6 +405,7 @@ class DownloadService:
             count += 1
         
         self.db.commit()
+        self.versions.bump(download.session_id for download in expired_downloads)
         
         if count > 0:
             logger.info("Очищены истекшие загрузки", count=count)
@@ -315,6 +423,7 @@ class DownloadService:
             Download.updated_at < threshold_time
         ).all()
         
+        session_ids = {download.session_id for download in expired_records}
         count = 0
         for download in expired_records:
             # Окончательно удаляем файл если ещё существует
@@ -330,6 +439,7 @@ class DownloadService:
             count += 1
         
         self.db.commit()
+        self.versions.bump(session_ids)
         
         if count > 0:
             logger.info("Удалены записи со статусом EXPIRED", count=count, minutes_threshold=minutes_threshold)
@@ -0,0 +1,68 @@
+import hashlib
+from typing import Optional
+
+import redis
+import structlog
+
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+class IdempotencyService:
+    """Дедупликация повторных запросов на создание загрузки через ключи Redis с TTL"""
+
+    KEY_PREFIX = "ytubik:idempotency"
+    # Значение ключа, пока запрос-владелец еще не создал запись загрузки
+    IN_PROGRESS = ""
+    # Время жизни захвата до создания записи (покрывает валидацию видео)
+    CLAIM_TTL_SECONDS = 120
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    def request_key(self, session_id: str, idempotency_key: str) -> str:
+        """Ключ для явного заголовка Idempotency-Key в рамках сессии"""
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        return f"{self.KEY_PREFIX}:key:{session_id}:{digest}"
+
+    def fingerprint_key(self,
+                        session_id: str,
+                        video_id: str,
+                        format_type: str,
+                        quality: str,
+                        audio_only: bool) -> str:
+        """Ключ для автоматической дедупликации одинаковых запросов сессии"""
+        fingerprint = f"{video_id}:{format_type}:{quality}:{int(audio_only)}"
+        return f"{self.KEY_PREFIX}:inflight:{session_id}:{fingerprint}"
+
+    def claim(self, key: str) -> Optional[str]:
+        """Атомарно захватывает ключ.
+
+        Возвращает None, если ключ захвачен текущим запросом (или Redis недоступен),
+        иначе - сохраненное значение: ID загрузки или IN_PROGRESS.
+        """
+        try:
+            if self.redis.set(key, self.IN_PROGRESS, nx=True, ex=self.CLAIM_TTL_SECONDS):
+                return None
+            existing = self.redis.get(key)
+            if existing is None:
+                # Ключ истек между SET и GET - пробуем захватить еще раз
+                return None if self.redis.set(key, self.IN_PROGRESS, nx=True, ex=self.CLAIM_TTL_SECONDS) else self.IN_PROGRESS
+            return existing
+        except redis.RedisError as e:
+            logger.warning("Дедупликация запросов недоступна", error=str(e))
+            return None
+
+    def bind(self, key: str, value: str, ttl_seconds: int = CLAIM_TTL_SECONDS) -> None:
+        """Привязывает ключ к ID загрузки (или снова помечает как IN_PROGRESS)"""
+        try:
+            self.redis.set(key, value, ex=ttl_seconds)
+        except redis.RedisError as e:
+            logger.warning("Не удалось сохранить ключ идемпотентности", key=key, error=str(e))
+
+    def release(self, key: str) -> None:
+        """Освобождает ключ, если создание загрузки не удалось"""
+        try:
+            self.redis.delete(key)
+        except redis.RedisError as e:
+            logger.warning("Не удалось удалить ключ идемпотентности", key=key, error=str(e))
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import redis
+import structlog
+
+from app.utils.redis_client import get_redis, get_async_redis
+
+logger = structlog.get_logger()
+
+class LiveStatusService:
+    """Оперативное состояние выполняющейся загрузки в Redis: статус, прогресс, скорость, ETA.
+
+    Пока задача идет, статус читается отсюда; в БД пишутся только итоги этапов.
+    """
+
+    KEY_PREFIX = "ytubik:live"
+    # Канал уведомлений об изменении состояния (ожидающие запросы статуса)
+    CHANNEL_PREFIX = "ytubik:live_changed"
+    STATE_TTL_SECONDS = 60 * 60
+    # Прогресс публикуется не чаще этого интервала
+    PUBLISH_INTERVAL_SECONDS = 0.5
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    def _key(self, download_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{download_id}"
+
+    @classmethod
+    def channel(cls, download_id: str) -> str:
+        return f"{cls.CHANNEL_PREFIX}:{download_id}"
+
+    def publish(self, download_id: str, **fields) -> None:
+        """Обновляет состояние загрузки (вызывается из воркера)"""
+        fields['updated_at'] = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self._key(download_id), mapping={k: str(v) for k, v in fields.items() if v is not None})
+            pipe.expire(self._key(download_id), self.STATE_TTL_SECONDS)
+            pipe.publish(self.channel(download_id), fields.get('status', ''))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Не удалось обновить оперативный статус", download_id=download_id, error=str(e))
+
+    def clear(self, download_id: str) -> None:
+        """Удаляет состояние после записи итогового статуса в БД"""
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(self._key(download_id))
+            pipe.publish(self.channel(download_id), "cleared")
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Не удалось удалить оперативный статус", download_id=download_id, error=str(e))
+
+    @classmethod
+    async def get(cls, download_id: str) -> Optional[dict]:
+        """Читает состояние загрузки (вызывается из API)"""
+        try:
+            state = await get_async_redis().hgetall(f"{cls.KEY_PREFIX}:{download_id}")
+        except redis.RedisError as e:
+            logger.warning("Оперативный статус недоступен", download_id=download_id, error=str(e))
+            return None
+        return state or None
+
+    @classmethod
+    async def get_many(cls, download_ids: List[str]) -> List[Optional[dict]]:
+        """Состояния нескольких загрузок за один запрос к Redis (в порядке download_ids)"""
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for download_id in download_ids:
+                pipe.hgetall(f"{cls.KEY_PREFIX}:{download_id}")
+            states = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Оперативные статусы недоступны", count=len(download_ids), error=str(e))
+            return [None] * len(download_ids)
+        return [state or None for state in states]
+
+class LiveStatusWatcher:
+    """Ожидание изменения статуса загрузки для долгих запросов (long polling).
+
+    Процесс API держит одну pattern-подписку на каналы изменений, ожидающие запросы -
+    только asyncio.Event без потоков и соединений с БД или Redis.
+    """
+
+    # Интервал чтения подписки: между чтениями проверяется остановка
+    READ_TIMEOUT_SECONDS = 1.0
+    RECONNECT_DELAY_SECONDS = 1.0
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def watch(self, download_id: str) -> AsyncIterator[asyncio.Event]:
+        """Событие, которое выставляется при каждом изменении состояния загрузки.
+
+        Подписываться нужно до чтения текущего статуса, чтобы не пропустить изменение.
+        """
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        event = asyncio.Event()
+        self._waiters.setdefault(download_id, set()).add(event)
+        try:
+            yield event
+        finally:
+            waiters = self._waiters.get(download_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[download_id]
+
+    def _notify(self, download_id: Optional[str] = None) -> None:
+        if download_id is None:
+            events = [event for waiters in self._waiters.values() for event in waiters]
+        else:
+            events = self._waiters.get(download_id, ())
+        for event in events:
+            event.set()
+
+    async def _read(self) -> None:
+        prefix = f"{LiveStatusService.CHANNEL_PREFIX}:"
+        while True:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{prefix}*")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                       timeout=self.READ_TIMEOUT_SECONDS)
+                    if message and message['type'] == 'pmessage':
+                        self._notify(message['channel'][len(prefix):])
+            except redis.RedisError as e:
+                logger.warning("Подписка на изменения статусов прервана", error=str(e))
+                # Изменения могли быть пропущены: ожидающие перечитают статус
+                self._notify()
+                await asyncio.sleep(self.RECONNECT_DELAY_SECONDS)
+            finally:
+                await pubsub.aclose()
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+
+_watcher = None
+
+def get_live_status_watcher() -> LiveStatusWatcher:
+    """Общий наблюдатель изменений статусов процесса API"""
+    global _watcher
+    if _watcher is None:
+        _watcher = LiveStatusWatcher()
+    return _watcher
@@ -0,0 +1,94 @@
+import json
+from typing import Optional
+
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+UNAVAILABLE = "unavailable"
+PRIVATE = "private"
+AGE_RESTRICTED = "age_restricted"
+TOO_LONG = "too_long"
+
+# Фрагменты сообщений yt-dlp и класс отказа; временные ошибки (403, сеть) не кешируются
+ERROR_PATTERNS = [
+    ("private video", PRIVATE),
+    ("sign in to confirm your age", AGE_RESTRICTED),
+    ("age-restricted", AGE_RESTRICTED),
+    ("inappropriate for some users", AGE_RESTRICTED),
+    ("video unavailable", UNAVAILABLE),
+    ("this video has been removed", UNAVAILABLE),
+    ("this video is no longer available", UNAVAILABLE),
+    ("account associated with this video has been terminated", UNAVAILABLE),
+]
+
+# Признаки временного отказа: YouTube ограничивает хост и отвечает тем же
+# "Video unavailable", но видео доступно после паузы
+TRANSIENT_PATTERNS = [
+    "try again later",
+    "not a bot",  # "Sign in to confirm you're not a bot" (апостроф бывает типографским)
+]
+
+def classify_error(message: str) -> Optional[str]:
+    """Определяет постоянную причину отказа по сообщению об ошибке yt-dlp"""
+    message = message.lower()
+    if any(pattern in message for pattern in TRANSIENT_PATTERNS):
+        return None
+    for pattern, reason in ERROR_PATTERNS:
+        if pattern in message:
+            return reason
+    return None
+
+class NegativeCacheService:
+    """Кеш известных отказов по video_id, чтобы не вызывать yt-dlp повторно"""
+
+    KEY_PREFIX = "ytubik:negative"
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    def _key(self, video_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{video_id}"
+
+    def _ttl(self, reason: str) -> int:
+        return {
+            UNAVAILABLE: settings.NEGATIVE_CACHE_UNAVAILABLE_TTL_SECONDS,
+            PRIVATE: settings.NEGATIVE_CACHE_PRIVATE_TTL_SECONDS,
+            AGE_RESTRICTED: settings.NEGATIVE_CACHE_AGE_RESTRICTED_TTL_SECONDS,
+            TOO_LONG: settings.NEGATIVE_CACHE_TOO_LONG_TTL_SECONDS,
+        }[reason]
+
+    def get(self, video_id: str) -> Optional[dict]:
+        """Возвращает сохраненный отказ: reason, error и duration для TOO_LONG"""
+        if not settings.NEGATIVE_CACHE_ENABLED:
+            return None
+        try:
+            value = self.redis.get(self._key(video_id))
+        except redis.RedisError as e:
+            logger.warning("Негативный кеш недоступен", error=str(e))
+            return None
+        if not value:
+            return None
+        entry = json.loads(value)
+        if entry['reason'] == TOO_LONG and entry.get('duration', 0) <= settings.MAX_VIDEO_DURATION_MINUTES * 60:
+            # Лимит длительности увеличили после сохранения
+            return None
+        return entry
+
+    def remember(self, video_id: str, reason: str, error: str, duration: Optional[int] = None) -> None:
+        """Сохраняет отказ с TTL его класса"""
+        if not settings.NEGATIVE_CACHE_ENABLED:
+            return
+        entry = {'reason': reason, 'error': error}
+        if duration is not None:
+            entry['duration'] = duration
+        try:
+            self.redis.set(self._key(video_id), json.dumps(entry, ensure_ascii=False), ex=self._ttl(reason))
+        except redis.RedisError as e:
+            logger.warning("Не удалось сохранить отказ в негативный кеш", video_id=video_id, error=str(e))
+            return
+        logger.info("Отказ сохранен в негативный кеш", video_id=video_id, reason=reason)
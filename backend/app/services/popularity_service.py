@@ -0,0 +1,100 @@
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.services.prefetch_service import strategy_tag
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+class PopularityService:
+    """Популярность video_id и формата: счетчики запросов с экспоненциальным затуханием"""
+
+    KEY = "ytubik:popularity"
+    DECAYED_AT_KEY = "ytubik:popularity:decayed_at"
+    # Закрепленные файлы staging: "стратегия/video_id"
+    PINNED_KEY = "ytubik:popularity:pinned"
+    # Счетчики ниже удаляются при затухании
+    MIN_SCORE = 0.05
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    @staticmethod
+    def member(video_id: str, strategy: Tuple[str, str, bool]) -> str:
+        format_type, quality, audio_only = strategy
+        format_type = getattr(format_type, 'value', format_type)
+        return f"{video_id}:{format_type}:{quality or 'best'}:{int(bool(audio_only))}"
+
+    @staticmethod
+    def parse_member(member: str) -> Tuple[str, Tuple[str, str, bool]]:
+        video_id, format_type, rest = member.split(':', 2)
+        quality, audio_only = rest.rsplit(':', 1)
+        return video_id, (format_type, quality, audio_only == "1")
+
+    def record(self, video_id: str, strategy: Tuple[str, str, bool]) -> None:
+        """Учитывает запрос загрузки (вызывается из create_download)"""
+        if not settings.POPULARITY_ENABLED:
+            return
+        try:
+            self.redis.zincrby(self.KEY, 1, self.member(video_id, strategy))
+        except redis.RedisError as e:
+            logger.warning("Не удалось учесть популярность видео", video_id=video_id, error=str(e))
+
+    def record_many(self, video_ids: List[str], strategy: Tuple[str, str, bool]) -> None:
+        """Учитывает пакет загрузок одним обращением к Redis (вызывается из пакетной загрузки)"""
+        if not settings.POPULARITY_ENABLED or not video_ids:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for video_id in video_ids:
+                pipe.zincrby(self.KEY, 1, self.member(video_id, strategy))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Не удалось учесть популярность видео", count=len(video_ids), error=str(e))
+
+    def decay(self) -> float:
+        """Уменьшает все счетчики с периодом полураспада POPULARITY_HALF_LIFE_HOURS.
+
+        Возвращает примененный множитель.
+        """
+        now = time.time()
+        decayed_at = self.redis.getset(self.DECAYED_AT_KEY, now)
+        if decayed_at is None:
+            return 1.0
+        factor = 0.5 ** ((now - float(decayed_at)) / (settings.POPULARITY_HALF_LIFE_HOURS * 3600))
+        pipe = self.redis.pipeline()
+        pipe.zunionstore(self.KEY, {self.KEY: factor})
+        pipe.zremrangebyscore(self.KEY, 0, self.MIN_SCORE)
+        pipe.execute()
+        return factor
+
+    def top(self, limit: int, min_score: float = 0) -> List[Tuple[str, Tuple[str, str, bool], float]]:
+        """Самые популярные пары видео и формата по убыванию счетчика"""
+        result = []
+        for member, score in self.redis.zrevrangebyscore(self.KEY, "+inf", min_score, start=0, num=limit,
+                                                         withscores=True):
+            video_id, strategy = self.parse_member(member)
+            result.append((video_id, strategy, score))
+        return result
+
+    def pin(self, entries: Iterable[Tuple[str, Tuple[str, str, bool]]]) -> None:
+        """Заменяет набор закрепленных файлов staging, очистка их не удаляет"""
+        members = [f"{strategy_tag(strategy)}/{video_id}" for video_id, strategy in entries]
+        pipe = self.redis.pipeline()
+        pipe.delete(self.PINNED_KEY)
+        if members:
+            pipe.sadd(self.PINNED_KEY, *members)
+            pipe.expire(self.PINNED_KEY, settings.POPULARITY_PIN_TTL_SECONDS)
+        pipe.execute()
+
+    def pinned(self) -> Dict[str, Set[str]]:
+        """Закрепленные video_id по имени стратегии (каталогу staging)"""
+        result: Dict[str, Set[str]] = {}
+        for member in self.redis.smembers(self.PINNED_KEY):
+            tag, video_id = member.split('/', 1)
+            result.setdefault(tag, set()).add(video_id)
+        return result
@@ -0,0 +1,181 @@
+import os
+import re
+import shutil
+import time
+from typing import Optional, Tuple
+
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.models.download import DownloadFormat
+from app.tasks.celery_app import celery_app, PREFETCH_VIDEO_TASK
+from app.utils.metrics import PREFETCH_EVENTS
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+STATE_PENDING = "pending"
+STATE_DOWNLOADING = "downloading"
+STATE_FINISHED = "finished"
+STATE_FAILED = "failed"
+
+# После /video/info спекулятивно загружается формат по умолчанию из DownloadRequest
+PREFETCH_STRATEGY = (DownloadFormat.VIDEO_MP4.value, "best", False)
+
+def strategy_tag(strategy: Tuple[str, str, bool]) -> str:
+    """Имя стратегии (формат, качество, только аудио) для ключей Redis и каталогов staging"""
+    format_type, quality, audio_only = strategy
+    format_type = getattr(format_type, 'value', format_type)
+    tag = f"{format_type}-{quality or 'best'}-{'audio' if audio_only else 'video'}"
+    return re.sub(r'[^\w.-]', '_', tag)
+
+def staging_dir(strategy: Tuple[str, str, bool]) -> str:
+    """Каталог staging стратегии: имена файлов yt-dlp разных форматов не пересекаются"""
+    return os.path.join(settings.PREFETCH_STAGING_DIR, strategy_tag(strategy))
+
+class PrefetchService:
+    """Загрузка видео заранее в staging (после /video/info и прогрев популярных) для create_download"""
+
+    KEY_PREFIX = "ytubik:prefetch"
+    # Занятые слоты: "video_id:стратегия" -> время постановки (запланированные и выполняющиеся)
+    SLOTS_KEY = f"{KEY_PREFIX}:slots"
+    ADOPT_POLL_SECONDS = 0.5
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    @staticmethod
+    def _entry(video_id: str, strategy: tuple) -> str:
+        return f"{video_id}:{strategy_tag(strategy)}"
+
+    def _key(self, video_id: str, strategy: tuple = PREFETCH_STRATEGY) -> str:
+        return f"{self.KEY_PREFIX}:{self._entry(video_id, strategy)}"
+
+    @staticmethod
+    def rate_limit() -> Optional[float]:
+        """Ограничение скорости одной спекулятивной загрузки в байтах/с.
+
+        Слотов не больше PREFETCH_MAX_CONCURRENT, поэтому в сумме спекуляция не
+        превышает PREFETCH_BANDWIDTH_SHARE входящего канала.
+        """
+        if not settings.WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS:
+            return None
+        budget = settings.WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS * 1_000_000 / 8 * settings.PREFETCH_BANDWIDTH_SHARE
+        return budget / max(settings.PREFETCH_MAX_CONCURRENT, 1)
+
+    def free_slots(self) -> int:
+        """Число свободных слотов спекулятивной загрузки"""
+        self.redis.zremrangebyscore(self.SLOTS_KEY, 0, time.time() - settings.PREFETCH_TTL_SECONDS)
+        return max(settings.PREFETCH_MAX_CONCURRENT - self.redis.zcard(self.SLOTS_KEY), 0)
+
+    def schedule(self,
+                 video_id: str,
+                 url: str,
+                 strategy: tuple = PREFETCH_STRATEGY,
+                 ttl: Optional[int] = None) -> bool:
+        """Ставит загрузку в staging в очередь, если есть свободный слот.
+
+        ttl - сколько хранится состояние и результат (по умолчанию PREFETCH_TTL_SECONDS).
+        """
+        if self.rate_limit() is None:
+            # Без известной пропускной способности бюджет не посчитать
+            logger.warning("Спекулятивная загрузка требует WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS")
+            return False
+
+        strategy = tuple(strategy)
+        key = self._key(video_id, strategy)
+        try:
+            if not self.free_slots():
+                PREFETCH_EVENTS.labels(event="skipped_budget").inc()
+                return False
+            if not self.redis.hsetnx(key, 'state', STATE_PENDING):
+                # Уже запланировано или загружено; неудачную попытку можно повторить
+                if self.redis.hget(key, 'state') != STATE_FAILED:
+                    return False
+                self.redis.hset(key, 'state', STATE_PENDING)
+            now = time.time()
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping={'url': url, 'scheduled_at': now})
+            pipe.expire(key, ttl or settings.PREFETCH_TTL_SECONDS)
+            pipe.zadd(self.SLOTS_KEY, {self._entry(video_id, strategy): now})
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Спекулятивная загрузка недоступна", error=str(e))
+            return False
+
+        try:
+            celery_app.send_task(
+                PREFETCH_VIDEO_TASK,
+                args=[video_id, url, list(strategy)],
+                expires=settings.PREFETCH_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning("Не удалось поставить спекулятивную загрузку", video_id=video_id, error=str(e))
+            self.release_slot(video_id, strategy)
+            return False
+        PREFETCH_EVENTS.labels(event="scheduled").inc()
+        logger.info("Запланирована спекулятивная загрузка", video_id=video_id, strategy=strategy_tag(strategy))
+        return True
+
+    def get_state(self, video_id: str, strategy: tuple = PREFETCH_STRATEGY) -> dict:
+        return self.redis.hgetall(self._key(video_id, strategy))
+
+    def update(self, video_id: str, strategy: tuple = PREFETCH_STRATEGY, **fields) -> None:
+        """Обновляет состояние спекулятивной загрузки (вызывается из воркера)"""
+        self.redis.hset(self._key(video_id, strategy), mapping={k: str(v) for k, v in fields.items()})
+
+    def extend(self, video_id: str, strategy: tuple, ttl: int) -> None:
+        """Продлевает хранение состояния (закрепленные популярные видео)"""
+        self.redis.expire(self._key(video_id, strategy), ttl)
+
+    def release_slot(self, video_id: str, strategy: tuple = PREFETCH_STRATEGY) -> None:
+        try:
+            self.redis.zrem(self.SLOTS_KEY, self._entry(video_id, strategy))
+        except redis.RedisError as e:
+            logger.warning("Не удалось освободить слот спекулятивной загрузки", video_id=video_id, error=str(e))
+
+    def is_promoted(self, video_id: str, strategy: tuple = PREFETCH_STRATEGY) -> bool:
+        """Пользователь уже ждет этот файл - ограничение скорости можно снять"""
+        return self.redis.hget(self._key(video_id, strategy), 'promoted') == "1"
+
+    def adopt(self, video_id: str, strategy: tuple, target_dir: str) -> Optional[str]:
+        """Забирает готовую или загружающуюся копию из staging для загрузки пользователя.
+
+        Возвращает путь к файлу в target_dir или None, если загружать нужно самостоятельно.
+        """
+        if not (settings.PREFETCH_ENABLED or settings.POPULARITY_WARM_ENABLED):
+            return None
+        key = self._key(video_id, tuple(strategy))
+        try:
+            state = self.redis.hgetall(key)
+            if state.get('state') == STATE_PENDING:
+                # Загрузка еще в очереди - отменяем ее, пользователь загрузит сам
+                self.redis.hset(key, 'state', STATE_FAILED)
+                PREFETCH_EVENTS.labels(event="cancelled").inc()
+                return None
+            if state.get('state') == STATE_DOWNLOADING:
+                self.redis.hset(key, 'promoted', "1")
+                deadline = time.monotonic() + settings.PREFETCH_ADOPT_WAIT_SECONDS
+                while state.get('state') == STATE_DOWNLOADING and time.monotonic() < deadline:
+                    time.sleep(self.ADOPT_POLL_SECONDS)
+                    state = self.redis.hgetall(key)
+        except redis.RedisError as e:
+            logger.warning("Состояние спекулятивной загрузки недоступно", video_id=video_id, error=str(e))
+            return None
+
+        staged_path = state.get('file_path')
+        if state.get('state') != STATE_FINISHED or not staged_path or not os.path.exists(staged_path):
+            return None
+
+        target_path = os.path.join(target_dir, os.path.basename(staged_path))
+        try:
+            # Жесткая ссылка оставляет копию в staging для других сессий
+            os.link(staged_path, target_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(staged_path, target_path)
+        PREFETCH_EVENTS.labels(event="adopted").inc()
+        logger.info("Использован заранее загруженный файл", video_id=video_id, file_path=target_path)
+        return target_path
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Optional
+
+import aiofiles
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.models.download import DownloadFormat
+from app.utils.redis_client import get_redis, get_async_redis
+
+logger = structlog.get_logger()
+
+STATE_DOWNLOADING = "downloading"
+STATE_FINISHED = "finished"
+STATE_FAILED = "failed"
+
+def supports_progressive(format_type: str, audio_only: bool) -> bool:
+    """Файл можно отдавать во время загрузки, только если нет постобработки"""
+    return (settings.PROGRESSIVE_DELIVERY_ENABLED and not audio_only and
+            format_type in (DownloadFormat.VIDEO_MP4, DownloadFormat.VIDEO_WEBM))
+
+class ProgressiveDeliveryService:
+    """Состояние загружаемого файла в Redis для отдачи пользователю во время загрузки"""
+
+    KEY_PREFIX = "ytubik:progressive"
+    STATE_TTL_SECONDS = 60 * 60
+    # Как часто воркер обновляет число скачанных байт
+    PUBLISH_EVERY_BYTES = 1024 * 1024
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    def _key(self, download_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{download_id}"
+
+    def publish(self, download_id: str, **fields) -> None:
+        """Обновляет состояние загрузки (вызывается из воркера)"""
+        fields['updated_at'] = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self._key(download_id), mapping={k: str(v) for k, v in fields.items() if v is not None})
+            pipe.expire(self._key(download_id), self.STATE_TTL_SECONDS)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Не удалось обновить состояние потоковой отдачи",
+                          download_id=download_id, error=str(e))
+
+    @classmethod
+    async def get_state(cls, download_id: str) -> Optional[dict]:
+        """Читает состояние загрузки (вызывается из API)"""
+        try:
+            state = await get_async_redis().hgetall(f"{cls.KEY_PREFIX}:{download_id}")
+        except redis.RedisError as e:
+            logger.warning("Состояние потоковой отдачи недоступно", download_id=download_id, error=str(e))
+            return None
+        return state or None
+
+    @staticmethod
+    def file_path(state: dict) -> Optional[str]:
+        """Существующий файл загрузки: .part, пока он пишется, иначе итоговый.
+
+        Первое событие yt-dlp может не содержать tmpfilename - тогда только filename.
+        """
+        for path in (state.get('tmpfilename'), state.get('filename')):
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    @classmethod
+    async def tail_file(cls, download_id: str, state: dict) -> AsyncIterator[bytes]:
+        """Отдает файл по мере его записи воркером, пока загрузка не завершится"""
+        attempt = state.get('attempt')
+        # Открытый дескриптор переживает переименование .part в итоговый файл
+        path = cls.file_path(state)
+        if not path:
+            raise IOError("Файл загрузки не найден")
+        max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        sent = 0
+
+        async with aiofiles.open(path, 'rb') as f:
+            while True:
+                chunk = await f.read(settings.PROGRESSIVE_CHUNK_SIZE_KB * 1024)
+                if chunk:
+                    sent += len(chunk)
+                    if sent > max_bytes:
+                        raise IOError("Файл превышает допустимый размер")
+                    yield chunk
+                    continue
+
+                state = await cls.get_state(download_id) or {}
+                if state.get('attempt') != attempt or state.get('state') == STATE_FAILED:
+                    # Повторная попытка пишет файл заново - продолжить поток нельзя
+                    raise IOError("Загрузка перезапущена или завершилась ошибкой")
+                if state.get('state') == STATE_FINISHED:
+                    # Дочитываем остаток после финального обновления
+                    chunk = await f.read()
+                    if chunk:
+                        yield chunk
+                    break
+                if time.time() - float(state.get('updated_at', 0)) > settings.PROGRESSIVE_STALL_TIMEOUT_SECONDS:
+                    raise IOError("Загрузка не продвигается")
+                await asyncio.sleep(settings.PROGRESSIVE_POLL_INTERVAL_SECONDS)
+
+        logger.info("Потоковая отдача завершена", download_id=download_id, bytes_sent=sent)
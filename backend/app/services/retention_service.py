@@ -0,0 +1,140 @@
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from typing import Iterable, Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.download import Download
+from app.models.partitioning import (
+    TABLE, ensure_partitions, is_partitioned, list_partitions, partition_day, partitioning_enabled
+)
+from app.services.session_version_service import SessionVersionService
+
+logger = structlog.get_logger()
+
+def remove_files(file_paths: Iterable[str]) -> None:
+    for file_path in file_paths:
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except Exception as e:
+                logger.error("Ошибка удаления файла старой записи", file_path=file_path, error=str(e))
+
+@contextmanager
+def archive_file(file_name: str):
+    """Gzip файл в DOWNLOADS_ARCHIVE_DIR: появляется под своим именем только целиком записанным"""
+    os.makedirs(settings.DOWNLOADS_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(settings.DOWNLOADS_ARCHIVE_DIR, file_name)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as raw:
+            with gzip.GzipFile(filename=file_name, fileobj=raw, mode="wb") as archive:
+                yield archive
+            raw.flush()
+            os.fsync(raw.fileno())
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+class RetentionService:
+    """Удаление записей downloads старше DOWNLOADS_RETENTION_DAYS с архивированием.
+
+    На секционированной таблице Postgres старые дни удаляются целыми секциями,
+    остальные записи (SQLite, несекционированная таблица, секция по умолчанию)
+    удаляются пачками по DOWNLOADS_PURGE_BATCH_SIZE.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.versions = SessionVersionService()
+
+    @staticmethod
+    def cutoff(now: Optional[datetime] = None) -> datetime:
+        """Граница хранения, выровненная на начало суток UTC, как и секции"""
+        today = (now or datetime.utcnow()).date()
+        return datetime.combine(today - timedelta(days=settings.DOWNLOADS_RETENTION_DAYS), time.min)
+
+    def apply(self, now: Optional[datetime] = None) -> dict:
+        """Создает секции наперед, удаляет старые секции и дочищает оставшиеся старые записи"""
+        cutoff = self.cutoff(now)
+        result = {'cutoff': cutoff.isoformat(), 'partitions_created': 0, 'partitions_dropped': 0}
+
+        if partitioning_enabled(self.db.get_bind()) and is_partitioned(self.db.connection()):
+            today = (now or datetime.utcnow()).date()
+            result['partitions_created'] = len(ensure_partitions(self.db.connection(), today))
+            self.db.commit()
+            for name in list_partitions(self.db.connection()):
+                day = partition_day(name)
+                if day is not None and day < cutoff.date():
+                    self.drop_partition(name)
+                    result['partitions_dropped'] += 1
+
+        result['rows_deleted'] = self.purge_rows(cutoff)
+        if result['partitions_dropped'] or result['rows_deleted']:
+            logger.info("Удалены старые записи downloads", **result)
+        return result
+
+    def drop_partition(self, name: str) -> None:
+        """Архивирует секцию (COPY в csv.gz), затем отсоединяет и удаляет ее"""
+        connection = self.db.connection()
+        session_ids = set(connection.execute(text(f"SELECT DISTINCT session_id FROM {name}")).scalars())
+        file_paths = list(connection.execute(
+            text(f"SELECT file_path FROM {name} WHERE file_path IS NOT NULL")
+        ).scalars())
+
+        if settings.DOWNLOADS_ARCHIVE_DIR:
+            cursor = connection.connection.cursor()
+            with archive_file(f"{name}.csv.gz") as archive:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+            cursor.close()
+
+        connection.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        connection.execute(text(f"DROP TABLE {name}"))
+        self.db.commit()
+
+        remove_files(file_paths)
+        self.versions.bump(session_ids)
+        logger.info("Удалена секция downloads", partition=name, archived=bool(settings.DOWNLOADS_ARCHIVE_DIR))
+
+    def purge_rows(self, cutoff: datetime) -> int:
+        """Построчное удаление записей старше границы пачками, каждая пачка - отдельный архив и транзакция"""
+        run = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        columns = Download.__table__.columns
+        deleted = 0
+        batch_index = 0
+
+        while True:
+            batch = self.db.query(Download).filter(
+                Download.created_at < cutoff
+            ).order_by(Download.created_at).limit(settings.DOWNLOADS_PURGE_BATCH_SIZE).all()
+            if not batch:
+                break
+
+            if settings.DOWNLOADS_ARCHIVE_DIR:
+                with archive_file(f"{TABLE}_{run}_{batch_index:05d}.jsonl.gz") as archive:
+                    for download in batch:
+                        row = {column.name: getattr(download, column.key) for column in columns}
+                        archive.write(json.dumps(row, ensure_ascii=False, default=str).encode() + b"\n")
+
+            session_ids = {download.session_id for download in batch}
+            file_paths = [download.file_path for download in batch]
+            self.db.query(Download).filter(
+                Download.id.in_([download.id for download in batch])
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            self.db.expunge_all()
+
+            remove_files(file_paths)
+            self.versions.bump(session_ids)
+            deleted += len(batch)
+            batch_index += 1
+
+        return deleted
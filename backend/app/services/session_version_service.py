@@ -0,0 +1,75 @@
+import time
+from typing import Iterable, Optional
+
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.utils.redis_client import get_redis, get_async_redis
+
+logger = structlog.get_logger()
+
+class SessionVersionService:
+    """Версия загрузок сессии для ETag: меняется при любом изменении загрузок сессии"""
+
+    KEY_PREFIX = "ytubik:session_version"
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    @classmethod
+    def _key(cls, session_id: str) -> str:
+        return f"{cls.KEY_PREFIX}:{session_id}"
+
+    @classmethod
+    def _changed_key(cls, session_id: str) -> str:
+        return f"{cls.KEY_PREFIX}:{session_id}:changed"
+
+    @staticmethod
+    def _initial_version() -> int:
+        # Отсчет от текущего времени: после истечения ключа версии не повторяются
+        return int(time.time() * 1000)
+
+    def bump(self, session_ids: Iterable[Optional[str]]) -> None:
+        """Меняет версию сессий (вызывается после commit изменений загрузок)"""
+        session_ids = {session_id for session_id in session_ids if session_id}
+        if not session_ids:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for session_id in session_ids:
+                key = self._key(session_id)
+                pipe.set(key, self._initial_version(), nx=True)
+                pipe.incr(key)
+                pipe.expire(key, settings.SESSION_VERSION_TTL_SECONDS)
+                if settings.DATABASE_REPLICA_URL:
+                    # Пока ключ жив, реплика может отдавать данные старше новой версии
+                    pipe.set(self._changed_key(session_id), 1, ex=settings.DB_REPLICA_MAX_LAG_SECONDS)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Не удалось обновить версию сессии", error=str(e))
+
+    @classmethod
+    async def get(cls, session_id: str) -> Optional[str]:
+        """Текущая версия сессии или None, если Redis недоступен (вызывается из API)"""
+        key = cls._key(session_id)
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            pipe.set(key, cls._initial_version(), nx=True, ex=settings.SESSION_VERSION_TTL_SECONDS)
+            pipe.get(key)
+            _, version = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Версия сессии недоступна", session_id=session_id, error=str(e))
+            return None
+        return version
+
+    @classmethod
+    async def changed_recently(cls, session_id: str) -> bool:
+        """Версия менялась за DB_REPLICA_MAX_LAG_SECONDS: реплика могла еще не получить изменение"""
+        if not settings.DATABASE_REPLICA_URL:
+            return False
+        try:
+            return bool(await get_async_redis().exists(cls._changed_key(session_id)))
+        except redis.RedisError as e:
+            logger.warning("Время изменения версии сессии недоступно", session_id=session_id, error=str(e))
+            return True
@@ -0,0 +1,211 @@
+import functools
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import random
+import socket
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from typing import List, Optional, Tuple
+
+import redis
+import structlog
+
+from app.config.settings import settings
+from app.tasks.celery_app import celery_app, DELIVER_WEBHOOK_TASK
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+EVENT_COMPLETED = "download.completed"
+EVENT_FAILED = "download.failed"
+
+SIGNATURE_HEADER = "X-Ytubik-Signature"
+
+# Ответы, после которых доставку стоит повторить
+RETRYABLE_STATUSES = {408, 425, 429}
+
+def signing_key() -> bytes:
+    return (settings.WEBHOOK_SECRET or settings.SECRET_KEY).encode()
+
+def sign(body: bytes, timestamp: int, key: Optional[bytes] = None) -> str:
+    """Значение заголовка подписи: t=<unix time>,v1=<HMAC-SHA256 от "t." + тело>"""
+    digest = hmac.new(key or signing_key(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def verify_signature(body: bytes, header: str, key: Optional[bytes] = None, tolerance_seconds: int = 300) -> bool:
+    """Проверка подписи на стороне получателя (и в тестах)"""
+    try:
+        parts = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance_seconds:
+        return False
+    return hmac.compare_digest(sign(body, timestamp, key), f"t={timestamp},v1={parts.get('v1', '')}")
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Редирект не выполняется: POST не должен уходить на другой адрес"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Соединение с уже проверенным адресом: повторного DNS-запроса нет, Host остается исходным"""
+
+    def __init__(self, host, *, address: str, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """То же для https: сертификат и SNI проверяются по исходному имени хоста"""
+
+    def __init__(self, host, *, address: str, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+    def __init__(self, address: str):
+        super().__init__()
+        self.address = address
+
+    def http_open(self, req):
+        return self.do_open(functools.partial(_PinnedHTTPConnection, address=self.address), req)
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+    def __init__(self, address: str):
+        super().__init__()
+        self.address = address
+
+    def https_open(self, req):
+        return self.do_open(functools.partial(_PinnedHTTPSConnection, address=self.address), req,
+                            context=self._context)
+
+def pinned_opener(address: str) -> urllib.request.OpenerDirector:
+    """Opener без редиректов и прокси, соединяющийся только с address"""
+    return urllib.request.build_opener(
+        urllib.request.ProxyHandler({}), _NoRedirect, _PinnedHTTPHandler(address), _PinnedHTTPSHandler(address)
+    )
+
+class WebhookService:
+    """Доставка подписанных уведомлений о завершении загрузок на callback_url клиента"""
+
+    DEAD_LETTER_KEY = "ytubik:webhooks:dead"
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
+
+    @staticmethod
+    def build_delivery(callback_url: str, event: str, data: dict) -> dict:
+        """Уведомление для очереди доставки: тело фиксируется один раз, подпись - на каждую попытку"""
+        delivery_id = str(uuid.uuid4())
+        body = {'id': delivery_id, 'event': event, 'created_at': int(time.time()), 'data': data}
+        return {
+            'id': delivery_id,
+            'url': callback_url,
+            'event': event,
+            'body': json.dumps(body, ensure_ascii=False, default=str),
+        }
+
+    def enqueue(self, callback_url: str, event: str, data: dict) -> Optional[str]:
+        """Ставит уведомление в очередь доставки (вызывается из воркера загрузок)"""
+        delivery = self.build_delivery(callback_url, event, data)
+        try:
+            celery_app.send_task(DELIVER_WEBHOOK_TASK, args=[delivery])
+        except Exception as e:
+            logger.warning("Не удалось поставить уведомление в очередь", url=callback_url, error=str(e))
+            self.dead_letter(delivery, f"enqueue: {e}", attempts=0)
+            return None
+        return delivery['id']
+
+    @staticmethod
+    def resolve_host(url: str) -> Tuple[str, Optional[str]]:
+        """Адрес для соединения и причина отказа для адресов локальной сети, если они не разрешены настройкой.
+
+        Соединение идет на этот же адрес: иначе DNS rebinding подменит его между проверкой и запросом.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        addresses = socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80),
+                                       type=socket.SOCK_STREAM)
+        if not settings.WEBHOOK_ALLOW_PRIVATE_HOSTS:
+            for *_, sockaddr in addresses:
+                address = ipaddress.ip_address(sockaddr[0])
+                if (address.is_private or address.is_loopback or address.is_link_local or
+                        address.is_reserved or address.is_multicast or address.is_unspecified):
+                    return sockaddr[0], f"адрес {address} запрещен для callback_url"
+        return addresses[0][4][0], None
+
+    def send(self, delivery: dict, attempt: int = 1) -> Tuple[bool, bool, str]:
+        """Одна попытка доставки: (доставлено, стоит повторить, описание результата)"""
+        try:
+            address, blocked = self.resolve_host(delivery['url'])
+        except (socket.gaierror, UnicodeError) as e:
+            return False, True, f"dns: {e}"
+        if blocked:
+            return False, False, blocked
+
+        body = delivery['body'].encode()
+        request = urllib.request.Request(delivery['url'], data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "User-Agent": "ytubik-webhooks/1.0",
+            "X-Ytubik-Event": delivery['event'],
+            "X-Ytubik-Delivery": delivery['id'],
+            "X-Ytubik-Attempt": str(attempt),
+            SIGNATURE_HEADER: sign(body, int(time.time())),
+        })
+        try:
+            with pinned_opener(address).open(request, timeout=settings.WEBHOOK_TIMEOUT_SECONDS) as response:
+                return True, False, f"http {response.status}"
+        except urllib.error.HTTPError as e:
+            return False, e.code in RETRYABLE_STATUSES or e.code >= 500, f"http {e.code}"
+        except (urllib.error.URLError, OSError) as e:
+            return False, True, f"network: {getattr(e, 'reason', e)}"
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Пауза перед следующей попыткой: экспонента с ограничением и случайным разбросом"""
+        delay = min(settings.WEBHOOK_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), settings.WEBHOOK_BACKOFF_MAX_SECONDS)
+        return delay * random.uniform(0.8, 1.0)
+
+    def dead_letter(self, delivery: dict, error: str, attempts: int) -> None:
+        """Сохраняет недоставленное уведомление для просмотра и повторной отправки"""
+        entry = dict(delivery, error=error, attempts=attempts, failed_at=int(time.time()))
+        try:
+            pipe = self.redis.pipeline()
+            pipe.lpush(self.DEAD_LETTER_KEY, json.dumps(entry, ensure_ascii=False))
+            pipe.ltrim(self.DEAD_LETTER_KEY, 0, settings.WEBHOOK_DEAD_LETTER_MAX - 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error("Не удалось сохранить недоставленное уведомление", delivery_id=delivery['id'], error=str(e))
+            return
+        logger.warning("Уведомление не доставлено", delivery_id=delivery['id'], url=delivery['url'],
+                       attempts=attempts, error=error)
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        """Последние недоставленные уведомления (новые первыми)"""
+        return [json.loads(entry) for entry in self.redis.lrange(self.DEAD_LETTER_KEY, 0, limit - 1)]
+
+    def redeliver_dead(self, limit: int = 100) -> int:
+        """Возвращает старые недоставленные уведомления в очередь доставки"""
+        count = 0
+        for _ in range(limit):
+            entry = self.redis.rpop(self.DEAD_LETTER_KEY)
+            if entry is None:
+                break
+            entry = json.loads(entry)
+            delivery = {key: entry[key] for key in ('id', 'url', 'event', 'body')}
+            celery_app.send_task(DELIVER_WEBHOOK_TASK, args=[delivery])
+            count += 1
+        return count
@@ -1,4 +1,4 @@
-import yt_dlp
+import asyncio
 import os
 import structlog
 from typing import Dict, Optional, List
@@ -6,47 +6,54 @@ from urllib.parse import urlparse, parse_qs
 
 from app.config.settings import settings
 from app.schemas.download_schemas import VideoInfo
+from app.services.negative_cache_service import NegativeCacheService, classify_error, TOO_LONG
+from app.utils.metrics import EXTRACT_INFO_SECONDS, NEGATIVE_CACHE_HITS
+from app.utils.ytdlp_pool import ytdlp_pool
+from app.tasks.celery_app import celery_app, EXTRACT_VIDEO_INFO_TASK, EXPAND_PLAYLIST_TASK
 
 logger = structlog.get_logger()
 
+class ExtractionTimeoutError(Exception):
+    """Очередь извлечения не вернула результат за EXTRACT_TIMEOUT_SECONDS"""
+
 class YouTubeService:
     """Сервис для работы с YouTube через yt-dlp"""
     
-    def __init__(self):
-        self.ydl_opts_info = {
-            'quiet': True,
-            'no_warnings': True,
-            'extractaudio': False,
-            'skip_download': True,
-            # Улучшенные настройки для обхода блокировок YouTube 2025
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-            'referer': 'https://www.youtube.com/',
-            'headers': {
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Upgrade-Insecure-Requests': '1',
-            },
-            # Используем cookies для лучшей совместимости
-            'cookiefile': None,
-            # Новые настройки экстрактора для 2025
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['web', 'android', 'ios'],
-                    'skip': ['dash'],
-                    'player_skip': ['configs'],
-                }
-            },
-            # Дополнительные настройки
-            'http_chunk_size': 10485760,  # 10MB chunks
-            'retries': 3,
-            'fragment_retries': 3,
-            'socket_timeout': 30,
-        }
+    # Опции извлечения общие для всех экземпляров сервиса
+    ydl_opts_info = {
+        'quiet': True,
+        'no_warnings': True,
+        'extractaudio': False,
+        'skip_download': True,
+        # Улучшенные настройки для обхода блокировок YouTube 2025
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+        'referer': 'https://www.youtube.com/',
+        'headers': {
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-User': '?1',
+            'Upgrade-Insecure-Requests': '1',
+        },
+        # Используем cookies для лучшей совместимости
+        'cookiefile': None,
+        # Новые настройки экстрактора для 2025
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['web', 'android', 'ios'],
+                'skip': ['dash'],
+                'player_skip': ['configs'],
+            }
+        },
+        # Дополнительные настройки
+        'http_chunk_size': 10485760,  # 10MB chunks
+        'retries': 3,
+        'fragment_retries': 3,
+        'socket_timeout': 30,
+    }
     
     def extract_video_id(self, url: str) -> str:
         """Извлекает video_id из YouTube URL"""
@@ -59,27 +66,136 @@ class YouTubeService:
             elif 'youtube.com/shorts/' in url:
                 # Поддержка YouTube Shorts
                 return url.split('youtube.com/shorts/')[-1].split('?')[0]
+            elif self.extract_playlist_id(url):
+                raise ValueError("Ссылка на плейлист, используйте пакетную загрузку")
             else:
                 raise ValueError("Неверный формат YouTube URL")
         except Exception as e:
             logger.error("Ошибка извлечения video_id", url=url, error=str(e))
             raise ValueError(f"Не удалось извлечь video_id: {str(e)}")
     
+    def extract_playlist_id(self, url: str) -> Optional[str]:
+        """Возвращает ID плейлиста, если URL указывает на страницу плейлиста"""
+        parsed = urlparse(url)
+        if 'youtube.com' not in parsed.netloc or parsed.path != '/playlist':
+            return None
+        playlist_ids = parse_qs(parsed.query).get('list')
+        return playlist_ids[0] if playlist_ids else None
+    
+    def _run_extract_task(self, task_name: str, *args):
+        """Выполняет извлечение на воркерах очереди extract и ждет результат"""
+        from celery.exceptions import TimeoutError as CeleryTimeoutError
+        
+        timeout = settings.EXTRACT_TIMEOUT_SECONDS
+        # Задача, которую не успели взять за время ожидания, уже никому не нужна
+        result = celery_app.send_task(task_name, args=list(args), expires=timeout)
+        try:
+            return result.get(timeout=timeout)
+        except CeleryTimeoutError:
+            logger.warning("Очередь извлечения не ответила вовремя", task=task_name, timeout=timeout)
+            raise ExtractionTimeoutError("Сервис получения информации о видео перегружен, попробуйте позже")
+        finally:
+            result.forget()
+    
+    def expand_playlist(self, url: str, limit: int) -> List[str]:
+        """Разворачивает плейлист в список URL видео без извлечения каждого видео.
+        
+        Негативный кеш ведется по video_id, у плейлиста записи нет; каждое видео
+        проверяется по кешу позже, в validate_video_sync.
+        """
+        if settings.EXTRACT_QUEUE_ENABLED:
+            return self._run_extract_task(EXPAND_PLAYLIST_TASK, url, limit)
+        return self._expand_playlist(url, limit)
+    
+    def _expand_playlist(self, url: str, limit: int) -> List[str]:
+        """Разворачивает плейлист в этом процессе"""
+        ydl_opts = dict(self.ydl_opts_info, extract_flat='in_playlist', playlistend=limit)
+        try:
+            with ytdlp_pool.acquire(('playlist', limit), ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except Exception as e:
+            logger.error("Ошибка получения плейлиста", url=url, error=str(e))
+            raise ValueError(f"Не удалось получить плейлист: {str(e)}")
+        
+        video_urls = []
+        for entry in info.get('entries') or []:
+            if entry and entry.get('id'):
+                video_urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+        
+        logger.info("Плейлист развернут", url=url, entries=len(video_urls))
+        return video_urls
+    
     async def get_video_info(self, url: str) -> VideoInfo:
         """Получает информацию о видео"""
-        return self._extract_video_info(url)
+        return await asyncio.to_thread(self.fetch_video_info, url)
+    
+    def fetch_video_info(self, url: str) -> VideoInfo:
+        """Получает информацию о видео; известные отказы возвращаются из негативного кеша без yt-dlp"""
+        rejection = self._cached_rejection(url, reject_too_long=False)
+        if rejection:
+            raise ValueError(rejection['error'])
+        return self._fetch_video_info(url)
+    
+    def _fetch_video_info(self, url: str) -> VideoInfo:
+        """Получает информацию через очередь extract, если она включена, иначе в этом процессе"""
+        try:
+            if settings.EXTRACT_QUEUE_ENABLED:
+                return VideoInfo(**self._run_extract_task(EXTRACT_VIDEO_INFO_TASK, url))
+            return self._extract_video_info(url)
+        except ValueError as e:
+            self._remember_rejection(url, e)
+            raise
+    
+    def _remember_rejection(self, url: str, error: ValueError) -> None:
+        """Сохраняет постоянный отказ в негативный кеш"""
+        reason = classify_error(str(error))
+        video_id = self._video_id_or_none(url)
+        if reason and video_id:
+            NegativeCacheService().remember(video_id, reason, str(error))
+    
+    def _video_id_or_none(self, url: str) -> Optional[str]:
+        try:
+            return self.extract_video_id(url)
+        except ValueError:
+            return None
+    
+    def _cached_rejection(self, url: str, reject_too_long: bool) -> Optional[dict]:
+        """Сохраненный отказ для видео; TOO_LONG учитывается только при проверке перед загрузкой"""
+        video_id = self._video_id_or_none(url)
+        if not video_id:
+            return None
+        entry = NegativeCacheService().get(video_id)
+        if not entry or (entry['reason'] == TOO_LONG and not reject_too_long):
+            return None
+        NEGATIVE_CACHE_HITS.labels(reason=entry['reason']).inc()
+        logger.info("Отказ из негативного кеша", video_id=video_id, reason=entry['reason'])
+        return entry
     
     def get_video_info_sync(self, url: str) -> dict:
-        """Синхронная версия получения информации о видео для Celery"""
-        video_info = self._extract_video_info(url)
+        """Синхронная версия получения информации о видео для воркера загрузок.
+        
+        Извлечение всегда в этом процессе: ждать очередь extract из задачи нельзя.
+        Негативный кеш учитывается так же, как в fetch_video_info.
+        """
+        rejection = self._cached_rejection(url, reject_too_long=False)
+        if rejection:
+            raise ValueError(rejection['error'])
+        try:
+            video_info = self._extract_video_info(url)
+        except ValueError as e:
+            self._remember_rejection(url, e)
+            raise
         return video_info.dict()
     
     def _extract_video_info(self, url: str) -> VideoInfo:
         """Получает информацию о видео"""
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts_info) as ydl:
+            with ytdlp_pool.acquire(('info',), self.ydl_opts_info) as ydl, EXTRACT_INFO_SECONDS.time():
                 info = ydl.extract_info(url, download=False)
                 
+                if info.get('_type') == 'playlist':
+                    raise ValueError("Ссылка на плейлист, используйте пакетную загрузку")
+                
                 # Получаем доступные форматы
                 available_formats = []
                 if 'formats' in info:
@@ -239,22 +355,43 @@ class YouTubeService:
     
     async def validate_video(self, url: str) -> Dict:
         """Проверяет доступность видео и его параметры"""
+        return await asyncio.to_thread(self.validate_video_sync, url)
+    
+    def validate_video_sync(self, url: str) -> Dict:
+        """Синхронная проверка видео (для выполнения в пуле потоков).
+        
+        retry=True означает, что видео не проверено из-за перегрузки, а не отклонено.
+        """
         try:
-            info = await self.get_video_info(url)
+            rejection = self._cached_rejection(url, reject_too_long=True)
+            if rejection:
+                raise ValueError(rejection['error'])
+            info = self._fetch_video_info(url)
             
             # Проверка длительности
             if info.duration and info.duration > settings.MAX_VIDEO_DURATION_MINUTES * 60:
-                raise ValueError(f"Видео слишком длинное. Максимум {settings.MAX_VIDEO_DURATION_MINUTES} минут")
+                error = f"Видео слишком длинное. Максимум {settings.MAX_VIDEO_DURATION_MINUTES} минут"
+                NegativeCacheService().remember(info.video_id, TOO_LONG, error, duration=info.duration)
+                raise ValueError(error)
             
             return {
                 'valid': True,
                 'info': info,
-                'error': None
+                'error': None,
+                'retry': False
             }
             
+        except ExtractionTimeoutError as e:
+            return {
+                'valid': False,
+                'info': None,
+                'error': str(e),
+                'retry': True
+            }
         except Exception as e:
             return {
                 'valid': False,
                 'info': None,
-                'error': str(e)
+                'error': str(e),
+                'retry': False
             }
@@ -0,0 +1,126 @@
+import os
+import time
+from typing import Optional
+
+import structlog
+from celery.worker.autoscale import Autoscaler
+
+from app.config.settings import settings
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+def compute_target_concurrency(processes: int,
+                               busy: int,
+                               queue_depth: int,
+                               cpu_load: Optional[float],
+                               bandwidth_mbps: Optional[float],
+                               min_concurrency: int,
+                               max_concurrency: int) -> tuple[int, str]:
+    """Вычисляет желаемое число процессов пула и причину решения"""
+    target = busy + queue_depth
+    reason = "queue"
+
+    if target > processes:
+        # Не добавляем процессы, если упираемся в CPU или в канал
+        if cpu_load is not None and cpu_load >= settings.WORKER_AUTOSCALE_MAX_CPU_LOAD:
+            target, reason = processes, "cpu_saturated"
+        elif (settings.WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS and bandwidth_mbps is not None
+              and bandwidth_mbps >= settings.WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS):
+            target, reason = processes, "bandwidth_saturated"
+
+    return max(min_concurrency, min(target, max_concurrency)), reason
+
+def read_cpu_load() -> Optional[float]:
+    """Возвращает среднюю загрузку за минуту в расчете на одно ядро"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+def read_network_rx_bytes() -> Optional[int]:
+    """Возвращает суммарное число принятых байт по всем интерфейсам (Linux)"""
+    try:
+        with open("/proc/net/dev") as f:
+            lines = f.readlines()[2:]
+    except OSError:
+        return None
+
+    total = 0
+    for line in lines:
+        interface, data = line.split(":", 1)
+        if interface.strip() == "lo":
+            continue
+        total += int(data.split()[0])
+    return total
+
+class QueueDepthAutoscaler(Autoscaler):
+    """Автомасштабирование пула Celery по глубине очереди, CPU и пропускной способности"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if (self.min_concurrency, self.max_concurrency) != (settings.WORKER_AUTOSCALE_MIN,
+                                                             settings.WORKER_AUTOSCALE_MAX):
+            # Явный --autoscale в команде запуска имеет приоритет над настройками
+            logger.warning("Границы автомасштабирования отличаются от настроек",
+                           min_concurrency=self.min_concurrency,
+                           max_concurrency=self.max_concurrency,
+                           settings_min=settings.WORKER_AUTOSCALE_MIN,
+                           settings_max=settings.WORKER_AUTOSCALE_MAX)
+        self._last_rx_bytes = read_network_rx_bytes()
+        self._last_rx_time = time.monotonic()
+
+    def _read_bandwidth_mbps(self) -> Optional[float]:
+        """Возвращает входящую скорость сети в Мбит/с с прошлого замера"""
+        rx_bytes = read_network_rx_bytes()
+        now = time.monotonic()
+        bandwidth = None
+        if rx_bytes is not None and self._last_rx_bytes is not None and now > self._last_rx_time:
+            bandwidth = (rx_bytes - self._last_rx_bytes) * 8 / (now - self._last_rx_time) / 1_000_000
+        self._last_rx_bytes, self._last_rx_time = rx_bytes, now
+        return bandwidth
+
+    def _read_queue_depth(self) -> int:
+        try:
+            return int(get_redis().llen(settings.ADMISSION_QUEUE_NAME))
+        except Exception as e:
+            logger.warning("Не удалось получить глубину очереди", error=str(e))
+            return 0
+
+    def _maybe_scale(self, req=None):
+        procs = self.processes
+        queue_depth = self._read_queue_depth()
+        cpu_load = read_cpu_load()
+        bandwidth_mbps = self._read_bandwidth_mbps()
+
+        target, reason = compute_target_concurrency(
+            processes=procs,
+            busy=self.qty,
+            queue_depth=queue_depth,
+            cpu_load=cpu_load,
+            bandwidth_mbps=bandwidth_mbps,
+            min_concurrency=self.min_concurrency,
+            max_concurrency=self.max_concurrency
+        )
+
+        if target == procs:
+            return None
+        if target < procs and not (self._last_scale_up and
+                                   time.monotonic() - self._last_scale_up > self.keepalive):
+            # Celery не уменьшает пул раньше keepalive после последнего роста
+            return None
+
+        logger.info("Решение автомасштабирования",
+                   current=procs,
+                   target=target,
+                   reason=reason,
+                   busy=self.qty,
+                   queue_depth=queue_depth,
+                   cpu_load=round(cpu_load, 2) if cpu_load is not None else None,
+                   bandwidth_mbps=round(bandwidth_mbps, 1) if bandwidth_mbps is not None else None)
+
+        if target > procs:
+            self.scale_up(target - procs)
+            return True
+        self.scale_down(procs - target)
+        return True
@@ -1,13 +1,23 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_shutdown
 from app.config.settings import settings
+from app.utils.metrics import start_worker_exporter, mark_worker_process_dead
+from app.utils.ytdlp_pool import preload_yt_dlp
+
+# Имена задач для отправки из API без импорта модулей воркера (yt-dlp и др.)
+DOWNLOAD_VIDEO_TASK = "app.tasks.download_tasks.download_video_task"
+EXTRACT_VIDEO_INFO_TASK = "app.tasks.extract_tasks.extract_video_info_task"
+EXPAND_PLAYLIST_TASK = "app.tasks.extract_tasks.expand_playlist_task"
+PREFETCH_VIDEO_TASK = "app.tasks.prefetch_tasks.prefetch_video_task"
+DELIVER_WEBHOOK_TASK = "app.tasks.webhook_tasks.deliver_webhook_task"
 
 # Создание экземпляра Celery
 celery_app = Celery(
     "youtube_downloader",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.download_tasks"]
+    include=["app.tasks.download_tasks", "app.tasks.extract_tasks", "app.tasks.prefetch_tasks", "app.tasks.webhook_tasks"]
 )
 
 # Конфигурация Celery
@@ -20,7 +30,19 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 минут максимум на задачу
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=50,
+    # Извлечение информации обслуживают отдельные воркеры: -Q extract --pool threads
+    task_routes={
+        EXTRACT_VIDEO_INFO_TASK: {"queue": settings.EXTRACT_QUEUE_NAME},
+        EXPAND_PLAYLIST_TASK: {"queue": settings.EXTRACT_QUEUE_NAME},
+        # Спекулятивные загрузки не занимают место в основной очереди
+        PREFETCH_VIDEO_TASK: {"queue": settings.PREFETCH_QUEUE_NAME},
+        # Медленные получатели уведомлений не задерживают загрузки
+        DELIVER_WEBHOOK_TASK: {"queue": settings.WEBHOOK_QUEUE_NAME},
+    },
+    worker_max_tasks_per_child=settings.WORKER_MAX_TASKS_PER_CHILD,
+    worker_max_memory_per_child=settings.WORKER_MAX_MEMORY_PER_CHILD_MB * 1024,  # в KB
+    # Автомасштабирование по очереди (включается флагом --autoscale)
+    worker_autoscaler="app.tasks.autoscaler:QueueDepthAutoscaler",
     # Настройка периодических задач
     beat_schedule={
         'cleanup-expired-files-by-time': {
@@ -35,5 +57,32 @@ celery_app.conf.update(
             'task': 'app.tasks.download_tasks.delete_expired_records',
             'schedule': crontab(minute='*/1'),  # Каждую минуту
         },
+        'apply-downloads-retention': {
+            'task': 'app.tasks.download_tasks.apply_downloads_retention',
+            'schedule': crontab(hour=3, minute=30),  # Секции наперед и удаление записей старше срока хранения
+        },
+        'cleanup-prefetch-staging': {
+            'task': 'app.tasks.prefetch_tasks.cleanup_prefetch_staging',
+            'schedule': crontab(minute='*/5'),
+        },
+        'decay-popularity': {
+            'task': 'app.tasks.prefetch_tasks.decay_popularity',
+            'schedule': crontab(minute='*/10'),
+        },
+        'warm-popular-videos': {
+            'task': 'app.tasks.prefetch_tasks.warm_popular_videos',
+            'schedule': crontab(minute='*/10', hour=settings.POPULARITY_WARM_HOURS),  # Непиковые часы
+        },
     },
 )
+
+@worker_init.connect
+def on_worker_init(**kwargs):
+    # Экспортер метрик в главном процессе воркера
+    start_worker_exporter()
+    # Дочерние процессы получают yt_dlp от родителя через fork (copy-on-write)
+    preload_yt_dlp()
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(pid=None, **kwargs):
+    mark_worker_process_dead(pid)
@@ -1,75 +1,226 @@
 import os
-import yt_dlp
+import time
 import structlog
-from celery import current_task
-from typing import Dict, Any
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
 
 from app.tasks.celery_app import celery_app
-from app.models.database import SessionLocal
+from app.models.database import SessionLocal, session_scope
 from app.models.download import DownloadStatus
 from app.services.download_service import DownloadService
 from app.services.youtube_service import YouTubeService
+from app.services.admission_service import AdmissionService
+from app.services.prefetch_service import PrefetchService
+from app.services.live_status_service import LiveStatusService
+from app.services.webhook_service import WebhookService, EVENT_COMPLETED, EVENT_FAILED
+from app.services.retention_service import RetentionService
+from app.services.progressive_service import (
+    ProgressiveDeliveryService,
+    supports_progressive,
+    STATE_DOWNLOADING,
+    STATE_FINISHED,
+    STATE_FAILED
+)
 from app.config.settings import settings
+from app.utils.ytdlp_pool import ytdlp_pool
+from app.utils.helpers import public_url
+from app.utils.metrics import (
+    DOWNLOAD_THROUGHPUT,
+    POSTPROCESS_SECONDS,
+    DB_FINALIZE_SECONDS,
+    STRATEGY_TOTAL,
+    FAILURES_TOTAL,
+    JOBS_IN_FLIGHT,
+    observe_job_latency
+)
 
 logger = structlog.get_logger()
 
+class JobTimings:
+    """Временные метки этапов задачи в компактном виде для Download.stage_timings.
+    
+    Метки хранятся как смещения в секундах от создания записи (enqueued = 0).
+    """
+    
+    def __init__(self, enqueued_at: Optional[datetime] = None):
+        if enqueued_at is not None and enqueued_at.tzinfo is None:
+            enqueued_at = enqueued_at.replace(tzinfo=timezone.utc)
+        self.origin = enqueued_at.timestamp() if enqueued_at else time.time()
+        self.stages = {}
+        self.fallback = False
+        self.prefetched = False
+        self.bytes = 0
+    
+    def mark(self, stage: str):
+        self.stages[stage] = round(time.time() - self.origin, 3)
+    
+    def start_fallback(self):
+        self.fallback = True
+        self.bytes = 0
+        self.mark('fallback_started')
+    
+    def to_dict(self) -> dict:
+        data = dict(self.stages)
+        if self.fallback:
+            data['fallback'] = True
+        if self.prefetched:
+            data['prefetched'] = True
+        if self.bytes:
+            data['bytes'] = self.bytes
+            fetch_started = data.get('fallback_started', data.get('fetch_started'))
+            fetch_finished = data.get('fetch_finished')
+            if fetch_started is not None and fetch_finished and fetch_finished > fetch_started:
+                data['avg_speed'] = round(self.bytes / (fetch_finished - fetch_started))
+        return data
+
 class DownloadProgress:
     """Класс для отслеживания прогресса загрузки"""
     
-    def __init__(self, download_id: str):
+    def __init__(self,
+                 download_id: str,
+                 progressive: bool = False,
+                 timings: Optional[JobTimings] = None,
+                 live: Optional[LiveStatusService] = None):
         self.download_id = download_id
-        self.last_progress = 0
+        self.timings = timings
+        # Прогресс, скорость и ETA для API пишутся в Redis, а не в БД
+        self.live = live
+        self.last_live_publish = 0.0
+        # Потоковая отдача файла пользователю во время загрузки
+        self.progressive = ProgressiveDeliveryService() if progressive else None
+        self.attempt = 1
+        self.last_published_bytes = None
+        self.postprocess_started = {}
+    
+    def start_attempt(self, attempt: int):
+        """Отмечает новую попытку загрузки (файл пишется заново)"""
+        self.attempt = attempt
+        self.last_published_bytes = None
+    
+    def publish_failed(self):
+        if self.progressive:
+            self.progressive.publish(self.download_id, state=STATE_FAILED, attempt=self.attempt)
+    
+    def _publish_progressive(self, d):
+        downloaded = d.get('downloaded_bytes', 0)
+        if d['status'] == 'finished':
+            self.progressive.publish(
+                self.download_id,
+                state=STATE_FINISHED,
+                attempt=self.attempt,
+                filename=d.get('filename'),
+                downloaded_bytes=downloaded
+            )
+        elif (self.last_published_bytes is None or
+              downloaded - self.last_published_bytes >= ProgressiveDeliveryService.PUBLISH_EVERY_BYTES):
+            self.progressive.publish(
+                self.download_id,
+                state=STATE_DOWNLOADING,
+                attempt=self.attempt,
+                tmpfilename=d.get('tmpfilename'),
+                filename=d.get('filename'),
+                downloaded_bytes=downloaded,
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate')
+            )
+            self.last_published_bytes = downloaded
+    
+    def postprocessor_hook(self, d):
+        """Замеряет время каждого постпроцессора yt-dlp"""
+        name = d.get('postprocessor', 'unknown')
+        if d['status'] == 'started':
+            self.postprocess_started[name] = time.monotonic()
+        elif d['status'] == 'finished' and name in self.postprocess_started:
+            POSTPROCESS_SECONDS.labels(postprocessor=name).observe(
+                time.monotonic() - self.postprocess_started.pop(name)
+            )
     
     def __call__(self, d):
-        if d['status'] == 'downloading':
+        if d['status'] == 'finished':
+            if d.get('elapsed'):
+                DOWNLOAD_THROUGHPUT.observe(d.get('downloaded_bytes', 0) / d['elapsed'])
+            if self.timings:
+                self.timings.bytes += d.get('downloaded_bytes') or d.get('total_bytes') or 0
+                self.timings.mark('fetch_finished')
+        
+        if self.progressive and d['status'] in ('downloading', 'finished'):
             try:
-                # Вычисляем прогресс
-                if 'total_bytes' in d:
-                    progress = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                elif 'total_bytes_estimate' in d:
-                    progress = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
-                else:
-                    progress = 0
-                
-                # Обновляем прогресс только если изменился на 5%
-                if abs(progress - self.last_progress) >= 5:
-                    current_task.update_state(
-                        state='PROGRESS',
-                        meta={
-                            'progress': round(progress, 1),
-                            'downloaded': d.get('downloaded_bytes', 0),
-                            'total': d.get('total_bytes', d.get('total_bytes_estimate', 0)),
-                            'speed': d.get('speed', 0),
-                            'eta': d.get('eta', 0)
-                        }
-                    )
-                    self.last_progress = progress
-                    
+                self._publish_progressive(d)
             except Exception as e:
-                logger.error("Ошибка обновления прогресса", error=str(e))
+                logger.error("Ошибка публикации потоковой отдачи", error=str(e))
+        
+        if self.live and d['status'] == 'downloading':
+            now = time.monotonic()
+            if now - self.last_live_publish >= LiveStatusService.PUBLISH_INTERVAL_SECONDS:
+                self.last_live_publish = now
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                downloaded = d.get('downloaded_bytes', 0)
+                self.live.publish(
+                    self.download_id,
+                    progress=round(downloaded / total * 100, 1) if total else None,
+                    downloaded=downloaded,
+                    total=total,
+                    speed=round(d['speed']) if d.get('speed') else None,
+                    eta=d.get('eta')
+                )
+        elif self.live and d['status'] == 'finished':
+            self.live.publish(self.download_id, progress=100, eta=0)
+
+def notify_callback(callback_url: Optional[str], event: str, download_id: str, **data) -> None:
+    """Уведомляет клиента API, если при создании загрузки был указан callback_url"""
+    if callback_url:
+        WebhookService().enqueue(callback_url, event, dict(download_id=download_id, **data))
+
+def update_download(download_id: str, *args, **kwargs) -> bool:
+    """Записывает итог этапа в короткой сессии: соединение не занято, пока идет загрузка"""
+    with session_scope() as db:
+        return DownloadService(db).update_download(download_id, *args, **kwargs)
 
 @celery_app.task(bind=True)
 def download_video_task(self, download_id: str) -> Dict[str, Any]:
     """Асинхронная задача загрузки видео"""
     
-    db = SessionLocal()
-    download_service = DownloadService(db)
     youtube_service = YouTubeService()
+    live = LiveStatusService()
+    task_started = time.monotonic()
+    stage = 'extract'
+    error_class = None
+    created_at = None
+    timings = None
+    callback_url = None
+    JOBS_IN_FLIGHT.inc()
     
     try:
-        # Получаем запись загрузки
-        download = download_service.get_download(download_id)
+        # Получаем запись загрузки; дальше задача работает с отсоединенной копией
+        with session_scope() as db:
+            download = DownloadService(db).get_download(download_id)
         if not download:
             raise ValueError(f"Загрузка {download_id} не найдена")
+        created_at = download.created_at
+        callback_url = download.callback_url
+        timings = JobTimings(created_at)
         
-        # Обновляем статус на "обработка"
-        download_service.update_download_status(download_id, DownloadStatus.PROCESSING)
+        # Статус "обработка" сразу виден через Redis, в БД он попадет с итогом извлечения
+        live.publish(
+            download_id,
+            status=DownloadStatus.PROCESSING.value,
+            progressive=int(supports_progressive(download.format, download.audio_only))
+        )
+        timings.mark('started')
+        
+        # Файл мог быть загружен заранее: после /video/info или прогревом популярных видео
+        strategy_key = (download.format, download.quality, download.audio_only)
+        adopted_path = PrefetchService().adopt(download.video_id, strategy_key, settings.DOWNLOAD_DIR)
         
-        # Получаем информацию о видео
-        video_info_dict = youtube_service.get_video_info_sync(download.youtube_url)
-        download_service.update_video_info(download_id, video_info_dict)
+        # Получаем информацию о видео; для готового файла достаточно сохраненной API
+        if adopted_path and download.video_title:
+            video_info_dict = {'title': download.video_title}
+            update_download(download_id, DownloadStatus.PROCESSING)
+        else:
+            video_info_dict = youtube_service.get_video_info_sync(download.youtube_url)
+            update_download(download_id, DownloadStatus.PROCESSING, video_info=video_info_dict)
+        timings.mark('info_extracted')
         
-        # Настройки для загрузки
+        # Настройки для загрузки; экземпляры yt-dlp переиспользуются по стратегии и формату
         ydl_opts = youtube_service.get_download_options(
             download.format, 
             download.quality, 
@@ -77,8 +228,13 @@ def download_video_task(self, download_id: str) -> Dict[str, Any]:
         )
         
         # Добавляем hook для отслеживания прогресса
-        progress_tracker = DownloadProgress(download_id)
-        ydl_opts['progress_hooks'] = [progress_tracker]
+        progress_tracker = DownloadProgress(
+            download_id,
+            progressive=supports_progressive(download.format, download.audio_only),
+            timings=timings,
+            live=live
+        )
+        stage = 'download'
         
         logger.info("Начинаем загрузку видео", 
                    download_id=download_id,
@@ -87,38 +243,57 @@ def download_video_task(self, download_id: str) -> Dict[str, Any]:
         # Пробуем загрузить видео с основными настройками
         download_success = False
         error_message = None
+        timings.mark('fetch_started')
         
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([download.youtube_url])
+        if adopted_path:
             download_success = True
-            logger.info("Загрузка успешна с основными настройками", download_id=download_id)
-        except Exception as e:
-            error_message = str(e)
-            logger.warning("Основной метод загрузки не удался, пробуем альтернативный", 
-                         download_id=download_id, error=error_message)
-            
-            # Пробуем альтернативный метод с Android клиентом
+            timings.prefetched = True
+            timings.mark('fetch_finished')
+        
+        if not download_success:
             try:
-                alternative_opts = youtube_service.get_alternative_download_options(
-                    download.format, 
-                    download.quality, 
-                    download.audio_only
-                )
-                alternative_opts['progress_hooks'] = [progress_tracker]
-                
-                with yt_dlp.YoutubeDL(alternative_opts) as ydl:
+                with ytdlp_pool.acquire(('primary',) + strategy_key, ydl_opts,
+                                        progress_tracker, progress_tracker.postprocessor_hook) as ydl:
                     ydl.download([download.youtube_url])
                 download_success = True
-                logger.info("Загрузка успешна с альтернативными настройками", download_id=download_id)
-            except Exception as e2:
-                error_message = f"Основной метод: {error_message}. Альтернативный метод: {str(e2)}"
-                logger.error("Оба метода загрузки не удались", download_id=download_id, error=error_message)
+                STRATEGY_TOTAL.labels(strategy='primary', result='success').inc()
+                logger.info("Загрузка успешна с основными настройками", download_id=download_id)
+            except Exception as e:
+                error_message = str(e)
+                STRATEGY_TOTAL.labels(strategy='primary', result='failure').inc()
+                logger.warning("Основной метод загрузки не удался, пробуем альтернативный", 
+                             download_id=download_id, error=error_message)
+            
+                # Пробуем альтернативный метод с Android клиентом
+                progress_tracker.start_attempt(2)
+                timings.start_fallback()
+                try:
+                    alternative_opts = youtube_service.get_alternative_download_options(
+                        download.format, 
+                        download.quality, 
+                        download.audio_only
+                    )
+                    with ytdlp_pool.acquire(('alternative',) + strategy_key, alternative_opts,
+                                            progress_tracker, progress_tracker.postprocessor_hook) as ydl:
+                        ydl.download([download.youtube_url])
+                    download_success = True
+                    STRATEGY_TOTAL.labels(strategy='alternative', result='success').inc()
+                    logger.info("Загрузка успешна с альтернативными настройками", download_id=download_id)
+                except Exception as e2:
+                    STRATEGY_TOTAL.labels(strategy='alternative', result='failure').inc()
+                    error_class = type(e2).__name__
+                    error_message = f"Основной метод: {error_message}. Альтернативный метод: {str(e2)}"
+                    logger.error("Оба метода загрузки не удались", download_id=download_id, error=error_message)
         
         if not download_success:
+            progress_tracker.publish_failed()
             raise ValueError(error_message)
         
+        # yt-dlp возвращает управление после постобработки
+        timings.mark('postprocess_finished')
+        
         # Находим загруженный файл
+        stage = 'finalize'
         downloaded_files = []
         for file in os.listdir(settings.DOWNLOAD_DIR):
             if download.video_id in file:
@@ -137,13 +312,29 @@ def download_video_task(self, download_id: str) -> Dict[str, Any]:
             os.remove(file_path)
             raise ValueError(f"Файл слишком большой: {file_size:.1f}MB")
         
-        # Обновляем информацию о файле
-        download_service.update_download_file_info(
-            download_id, file_path, file_name, file_size
-        )
-        
-        # Обновляем статус на "завершено"
-        download_service.update_download_status(download_id, DownloadStatus.COMPLETED)
+        with DB_FINALIZE_SECONDS.time():
+            # Файл, статус "завершено" и тайминги одной записью
+            timings.mark('finalized')
+            update_download(
+                download_id,
+                DownloadStatus.COMPLETED,
+                stage_timings=timings.to_dict(),
+                file_path=file_path,
+                file_name=file_name,
+                file_size=file_size
+            )
+        live.clear(download_id)
+        observe_job_latency(created_at, 'completed')
+        if callback_url:
+            notify_callback(
+                callback_url, EVENT_COMPLETED, download_id,
+                status=DownloadStatus.COMPLETED.value,
+                video_id=download.video_id,
+                video_title=video_info_dict.get('title'),
+                file_name=file_name,
+                file_size=file_size,
+                download_url=public_url(f"/api/download/{download_id}/file")
+            )
         
         logger.info("Загрузка завершена успешно",
                    download_id=download_id,
@@ -163,12 +354,23 @@ def download_video_task(self, download_id: str) -> Dict[str, Any]:
         logger.error("Ошибка загрузки видео",
                     download_id=download_id,
                     error=error_msg)
+        FAILURES_TOTAL.labels(stage=stage, error_class=error_class or type(e).__name__).inc()
+        observe_job_latency(created_at, 'failed')
         
         # Обновляем статус на "ошибка"
-        download_service.update_download_status(
-            download_id, 
-            DownloadStatus.FAILED, 
-            error_msg
+        if timings:
+            timings.mark('failed')
+        update_download(
+            download_id,
+            DownloadStatus.FAILED,
+            error_message=error_msg,
+            stage_timings=timings.to_dict() if timings else None
+        )
+        live.clear(download_id)
+        notify_callback(
+            callback_url, EVENT_FAILED, download_id,
+            status=DownloadStatus.FAILED.value,
+            error_message=error_msg
         )
         
         # Обновляем состояние задачи
@@ -184,7 +386,12 @@ def download_video_task(self, download_id: str) -> Dict[str, Any]:
         }
     
     finally:
-        db.close()
+        JOBS_IN_FLIGHT.dec()
+        # Сохраняем длительность задачи для оценки времени ожидания в очереди
+        try:
+            AdmissionService().record_service_time(time.monotonic() - task_started)
+        except Exception as e:
+            logger.warning("Не удалось сохранить длительность задачи", error=str(e))
 
 @celery_app.task
 def cleanup_expired_files():
@@ -245,3 +452,18 @@ def delete_expired_records():
     
     finally:
         db.close()
+
+@celery_app.task
+def apply_downloads_retention():
+    """Периодическая задача хранения: секции downloads наперед и удаление записей старше DOWNLOADS_RETENTION_DAYS"""
+    db = SessionLocal()
+    
+    try:
+        return RetentionService(db).apply()
+    
+    except Exception as e:
+        logger.error("Ошибка удаления старых записей downloads", error=str(e))
+        return {'error': str(e)}
+    
+    finally:
+        db.close()
@@ -0,0 +1,18 @@
+from typing import Any, Dict, List
+
+from app.tasks.celery_app import celery_app
+from app.services.youtube_service import YouTubeService
+
+# Задачи очереди extract: API ждет их результат, поэтому ошибки валидации
+# (ValueError) передаются вызывающему, а не повторяются. Негативный кеш
+# проверяет и пополняет API (fetch_video_info), здесь только извлечение
+
+@celery_app.task(throws=(ValueError,))
+def extract_video_info_task(url: str) -> Dict[str, Any]:
+    """Извлекает информацию о видео для API"""
+    return YouTubeService()._extract_video_info(url).model_dump()
+
+@celery_app.task(throws=(ValueError,))
+def expand_playlist_task(url: str, limit: int) -> List[str]:
+    """Разворачивает плейлист в список URL видео для API"""
+    return YouTubeService()._expand_playlist(url, limit)
@@ -0,0 +1,192 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.tasks.celery_app import celery_app
+from app.config.settings import settings
+from app.services.admission_service import AdmissionService
+from app.services.popularity_service import PopularityService
+from app.services.prefetch_service import (
+    PrefetchService,
+    PREFETCH_STRATEGY,
+    staging_dir,
+    STATE_PENDING,
+    STATE_DOWNLOADING,
+    STATE_FINISHED,
+    STATE_FAILED
+)
+from app.services.youtube_service import YouTubeService
+from app.utils.metrics import PREFETCH_EVENTS
+from app.utils.ytdlp_pool import ytdlp_pool
+
+logger = structlog.get_logger()
+
+class PrefetchProgress:
+    """Снимает ограничение скорости, когда пользователь запросил загружаемое видео"""
+
+    CHECK_INTERVAL_SECONDS = 1.0
+
+    def __init__(self, prefetch: PrefetchService, video_id: str, strategy: tuple):
+        self.prefetch = prefetch
+        self.video_id = video_id
+        self.strategy = strategy
+        self.ydl = None
+        self.last_check = 0.0
+
+    def __call__(self, d):
+        if d['status'] != 'downloading' or self.ydl is None or not self.ydl.params.get('ratelimit'):
+            return
+        now = time.monotonic()
+        if now - self.last_check < self.CHECK_INTERVAL_SECONDS:
+            return
+        self.last_check = now
+        try:
+            promoted = self.prefetch.is_promoted(self.video_id, self.strategy)
+        except Exception as e:
+            logger.warning("Не удалось проверить спекулятивную загрузку", video_id=self.video_id, error=str(e))
+            return
+        if promoted:
+            # Загрузчик yt-dlp читает ratelimit из params на каждом блоке
+            self.ydl.params['ratelimit'] = None
+            logger.info("Спекулятивная загрузка востребована, ограничение скорости снято", video_id=self.video_id)
+
+def find_staged_file(directory: str, video_id: str) -> Optional[str]:
+    """Находит загруженный файл видео в staging (без незавершенных .part)"""
+    for file in os.listdir(directory):
+        if file.startswith(f"{video_id}_") and not file.endswith('.part'):
+            return os.path.join(directory, file)
+    return None
+
+def youtube_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+@celery_app.task
+def prefetch_video_task(video_id: str, url: str, strategy: Optional[List] = None) -> Dict[str, Any]:
+    """Загрузка в staging заранее: после /video/info (формат по умолчанию) или прогрев популярных"""
+    strategy = tuple(strategy) if strategy else PREFETCH_STRATEGY
+    prefetch = PrefetchService()
+
+    try:
+        if prefetch.get_state(video_id, strategy).get('state') != STATE_PENDING:
+            # Истек TTL или пользователь уже запустил загрузку сам
+            PREFETCH_EVENTS.labels(event="cancelled").inc()
+            return {'status': 'skipped'}
+        # Загрузки пользователей в приоритете: при непустой основной очереди не спекулируем
+        if AdmissionService(prefetch.redis).get_queue_depth() > 0:
+            prefetch.update(video_id, strategy, state=STATE_FAILED)
+            PREFETCH_EVENTS.labels(event="skipped_busy").inc()
+            return {'status': 'skipped'}
+        prefetch.update(video_id, strategy, state=STATE_DOWNLOADING)
+
+        directory = staging_dir(strategy)
+        os.makedirs(directory, exist_ok=True)
+        ydl_opts = YouTubeService().get_download_options(*strategy)
+        ydl_opts['outtmpl'] = os.path.join(directory, os.path.basename(ydl_opts['outtmpl']))
+        progress = PrefetchProgress(prefetch, video_id, strategy)
+
+        with ytdlp_pool.acquire(('prefetch',) + strategy, ydl_opts, progress) as ydl:
+            progress.ydl = ydl
+            ydl.params['ratelimit'] = prefetch.rate_limit()
+            ydl.download([url])
+
+        file_path = find_staged_file(directory, video_id)
+        if not file_path:
+            raise ValueError("Загруженный файл не найден")
+        prefetch.update(video_id, strategy, state=STATE_FINISHED, file_path=file_path)
+        PREFETCH_EVENTS.labels(event="finished").inc()
+        logger.info("Спекулятивная загрузка завершена", video_id=video_id, file_path=file_path)
+        return {'status': 'finished', 'file_path': file_path}
+
+    except Exception as e:
+        logger.warning("Спекулятивная загрузка не удалась", video_id=video_id, error=str(e))
+        PREFETCH_EVENTS.labels(event="failed").inc()
+        try:
+            prefetch.update(video_id, strategy, state=STATE_FAILED)
+        except Exception:
+            pass
+        return {'status': 'failed', 'error': str(e)}
+
+    finally:
+        prefetch.release_slot(video_id, strategy)
+
+@celery_app.task
+def cleanup_prefetch_staging():
+    """Периодическая задача удаления невостребованных файлов staging (закрепленные сохраняются)"""
+    if not os.path.isdir(settings.PREFETCH_STAGING_DIR):
+        return {'removed_files': 0}
+
+    try:
+        pinned = PopularityService().pinned()
+    except Exception as e:
+        # Без списка закреплений не удаляем ничего: прогрев дороже места на диске
+        logger.warning("Не удалось получить закрепленные файлы, очистка staging пропущена", error=str(e))
+        return {'error': str(e)}
+
+    # yt-dlp выставляет mtime по Last-Modified, поэтому возраст считаем по ctime
+    threshold = time.time() - settings.PREFETCH_TTL_SECONDS
+    removed = 0
+    for tag_entry in os.scandir(settings.PREFETCH_STAGING_DIR):
+        if not tag_entry.is_dir(follow_symlinks=False):
+            continue
+        pinned_ids = pinned.get(tag_entry.name, set())
+        with os.scandir(tag_entry.path) as entries:
+            for entry in entries:
+                if any(entry.name.startswith(f"{video_id}_") for video_id in pinned_ids):
+                    continue
+                try:
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_ctime < threshold:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning("Не удалось удалить файл staging", path=entry.path, error=str(e))
+
+    if removed:
+        PREFETCH_EVENTS.labels(event="expired").inc(removed)
+    logger.info("Выполнена очистка staging", removed_files=removed)
+    return {'removed_files': removed}
+
+@celery_app.task
+def decay_popularity():
+    """Периодическая задача затухания счетчиков популярности"""
+    try:
+        factor = PopularityService().decay()
+        return {'factor': factor}
+    except Exception as e:
+        logger.error("Ошибка затухания счетчиков популярности", error=str(e))
+        return {'error': str(e)}
+
+@celery_app.task
+def warm_popular_videos():
+    """Периодическая задача (непиковые часы): закрепляет и загружает в staging популярные видео"""
+    if not settings.POPULARITY_WARM_ENABLED:
+        return {'status': 'disabled'}
+
+    popularity = PopularityService()
+    prefetch = PrefetchService(popularity.redis)
+    try:
+        top = popularity.top(settings.POPULARITY_WARM_TOP_N, settings.POPULARITY_WARM_MIN_SCORE)
+        popularity.pin((video_id, strategy) for video_id, strategy, score in top)
+
+        cached = 0
+        scheduled = 0
+        for video_id, strategy, score in top:
+            state = prefetch.get_state(video_id, strategy)
+            if state.get('state') == STATE_FINISHED and os.path.exists(state.get('file_path', '')):
+                prefetch.extend(video_id, strategy, settings.POPULARITY_PIN_TTL_SECONDS)
+                cached += 1
+                continue
+            if state.get('state') in (STATE_PENDING, STATE_DOWNLOADING):
+                continue
+            # Остальные видео загрузятся при следующих запусках, когда освободятся слоты
+            if not prefetch.free_slots():
+                break
+            if prefetch.schedule(video_id, youtube_url(video_id), strategy, ttl=settings.POPULARITY_PIN_TTL_SECONDS):
+                scheduled += 1
+    except Exception as e:
+        logger.error("Ошибка прогрева популярных видео", error=str(e))
+        return {'error': str(e)}
+
+    logger.info("Выполнен прогрев популярных видео", pinned=len(top), cached=cached, scheduled=scheduled)
+    return {'pinned': len(top), 'cached': cached, 'scheduled': scheduled}
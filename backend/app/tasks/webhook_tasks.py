@@ -0,0 +1,33 @@
+from typing import Any, Dict
+
+import structlog
+
+from app.tasks.celery_app import celery_app
+from app.config.settings import settings
+from app.services.webhook_service import WebhookService
+from app.utils.metrics import WEBHOOK_DELIVERIES
+
+logger = structlog.get_logger()
+
+@celery_app.task(bind=True, acks_late=True, max_retries=None)
+def deliver_webhook_task(self, delivery: Dict[str, Any]) -> Dict[str, Any]:
+    """Доставка уведомления на callback_url с повторами и dead letter"""
+    service = WebhookService()
+    attempt = self.request.retries + 1
+    delivered, retryable, detail = service.send(delivery, attempt)
+
+    if delivered:
+        WEBHOOK_DELIVERIES.labels(result="delivered").inc()
+        logger.info("Уведомление доставлено", delivery_id=delivery['id'], attempt=attempt, result=detail)
+        return {'status': 'delivered', 'attempts': attempt}
+
+    if retryable and attempt < settings.WEBHOOK_MAX_ATTEMPTS:
+        WEBHOOK_DELIVERIES.labels(result="retried").inc()
+        countdown = service.backoff(attempt)
+        logger.info("Повтор доставки уведомления", delivery_id=delivery['id'], attempt=attempt,
+                    result=detail, countdown=round(countdown, 1))
+        raise self.retry(countdown=countdown)
+
+    WEBHOOK_DELIVERIES.labels(result="dead").inc()
+    service.dead_letter(delivery, detail, attempts=attempt)
+    return {'status': 'dead', 'attempts': attempt, 'error': detail}
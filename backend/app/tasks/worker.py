@@ -0,0 +1,19 @@
+"""Запуск воркера загрузок с границами автомасштабирования из настроек.
+
+python -m app.tasks.worker -Q celery,prefetch,webhooks --loglevel=info
+"""
+import sys
+from typing import List, Optional
+
+from app.config.settings import settings
+from app.tasks.celery_app import celery_app
+
+def autoscale_option() -> str:
+    """Флаг --autoscale=max,min из WORKER_AUTOSCALE_MAX/WORKER_AUTOSCALE_MIN"""
+    return f"--autoscale={settings.WORKER_AUTOSCALE_MAX},{settings.WORKER_AUTOSCALE_MIN}"
+
+def main(argv: Optional[List[str]] = None) -> None:
+    celery_app.worker_main(["worker", autoscale_option(), *(sys.argv[1:] if argv is None else argv)])
+
+if __name__ == "__main__":
+    main()
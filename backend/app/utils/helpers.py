@@ -1,6 +1,9 @@
+import math
 import os
 import re
-from typing import Optional
+from typing import Optional, List
+
+from app.config.settings import settings
 
 def sanitize_filename(filename: str) -> str:
     """Очищает имя файла от недопустимых символов"""
@@ -43,3 +46,16 @@ def format_file_size(size_mb: float) -> str:
         return f"{size_mb:.1f} MB"
     else:
         return f"{size_mb / 1024:.1f} GB"
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Возвращает p-й перцентиль (nearest-rank) или None для пустого списка"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def public_url(path: str) -> str:
+    """Абсолютная ссылка для внешних клиентов: машинный клиент не знает, относительно чего разрешать путь"""
+    base = settings.PUBLIC_BASE_URL or f"https://{settings.DOMAIN}"
+    return base.rstrip("/") + path
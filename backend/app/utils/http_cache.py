@@ -0,0 +1,33 @@
+# Условные GET запросы (ETag / If-None-Match) и заголовки микрокеша nginx
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+from app.config.settings import settings
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из частей версии представления"""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (слабое сравнение, список через запятую)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def cache_headers(etag: str) -> dict:
+    """Браузер всегда перепроверяет ответ по ETag, nginx может держать его HTTP_MICROCACHE_SECONDS"""
+    return {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Cookie",
+        "X-Accel-Expires": str(settings.HTTP_MICROCACHE_SECONDS),
+    }
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -0,0 +1,27 @@
+# Быстрая сериализация списков: строки БД сразу в JSON через orjson
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+class PydanticCompatibleJSONResponse(ORJSONResponse):
+    """ORJSONResponse с датами в формате pydantic: UTC как "Z", а не "+00:00" """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+        )
+
+def fast_json_response(content, response: Optional[Response] = None) -> ORJSONResponse:
+    """ORJSONResponse без повторной валидации по response_model.
+
+    Заголовки, выставленные на внедренном Response (cookie сессии, ETag), переносятся:
+    FastAPI применяет их только к ответам, которые собирает сам.
+    """
+    result = PydanticCompatibleJSONResponse(content)
+    if response is not None:
+        result.raw_headers.extend(
+            (name, value) for name, value in response.raw_headers if name != b"content-length"
+        )
+    return result
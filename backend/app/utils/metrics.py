@@ -0,0 +1,153 @@
+# Метрики Prometheus для API и Celery воркеров
+import os
+from datetime import datetime, timezone
+
+import structlog
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from app.config.settings import settings
+from app.utils.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+# В режиме нескольких процессов (prefork Celery, gunicorn) метрики пишутся в файлы
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+EXTRACT_INFO_SECONDS = Histogram(
+    "ytubik_extract_info_seconds",
+    "Время извлечения информации о видео через yt-dlp",
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60)
+)
+DOWNLOAD_THROUGHPUT = Histogram(
+    "ytubik_download_throughput_bytes_per_second",
+    "Средняя скорость загрузки файла с YouTube",
+    buckets=(64e3, 256e3, 1e6, 2e6, 5e6, 10e6, 20e6, 50e6, 100e6)
+)
+POSTPROCESS_SECONDS = Histogram(
+    "ytubik_postprocess_seconds",
+    "Время постобработки (FFmpeg)",
+    ["postprocessor"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 40, 80, 160)
+)
+DB_FINALIZE_SECONDS = Histogram(
+    "ytubik_db_finalize_seconds",
+    "Время финальной записи результата загрузки в БД",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+JOB_SECONDS = Histogram(
+    "ytubik_job_seconds",
+    "Время от создания загрузки до завершения задачи",
+    ["status"],
+    buckets=(5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+STRATEGY_TOTAL = Counter(
+    "ytubik_download_strategy_total",
+    "Попытки загрузки по стратегиям yt-dlp",
+    ["strategy", "result"]
+)
+FAILURES_TOTAL = Counter(
+    "ytubik_job_failures_total",
+    "Ошибки задач загрузки по этапу и классу исключения",
+    ["stage", "error_class"]
+)
+NEGATIVE_CACHE_HITS = Counter(
+    "ytubik_negative_cache_hits_total",
+    "Запросы, отклоненные по негативному кешу без вызова yt-dlp",
+    ["reason"]
+)
+PREFETCH_EVENTS = Counter(
+    "ytubik_prefetch_events_total",
+    "Спекулятивные загрузки: запланированные, пропущенные, использованные, невостребованные",
+    ["event"]
+)
+WEBHOOK_DELIVERIES = Counter(
+    "ytubik_webhook_deliveries_total",
+    "Попытки доставки уведомлений на callback_url: доставлено, повтор, в dead letter",
+    ["result"]
+)
+JOBS_IN_FLIGHT = Gauge(
+    "ytubik_jobs_in_flight",
+    "Задачи загрузки, выполняющиеся сейчас",
+    multiprocess_mode="livesum"
+)
+
+def observe_job_latency(created_at: datetime, status: str) -> None:
+    """Записывает время от создания записи загрузки до завершения"""
+    if not created_at:
+        return
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    JOB_SECONDS.labels(status=status).observe(
+        (datetime.now(timezone.utc) - created_at).total_seconds()
+    )
+
+def get_directory_size(path: str) -> int:
+    """Возвращает суммарный размер файлов в директории (без вложенных)"""
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
+
+class QueueStateCollector:
+    """Метрики состояния, вычисляемые в момент опроса: очередь и место на диске"""
+
+    def collect(self):
+        queue_depth = GaugeMetricFamily(
+            "ytubik_queue_depth", "Задачи, ожидающие в очереди Celery"
+        )
+        try:
+            queue_depth.add_metric([], get_redis().llen(settings.ADMISSION_QUEUE_NAME))
+        except Exception as e:
+            logger.warning("Не удалось получить глубину очереди для метрик", error=str(e))
+        yield queue_depth
+
+        yield GaugeMetricFamily(
+            "ytubik_download_dir_bytes",
+            "Размер файлов в DOWNLOAD_DIR",
+            value=get_directory_size(settings.DOWNLOAD_DIR)
+        )
+
+_state_registry = CollectorRegistry()
+_state_registry.register(QueueStateCollector())
+
+def _process_registry() -> CollectorRegistry:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def render_metrics() -> bytes:
+    """Возвращает метрики API в текстовом формате Prometheus"""
+    return generate_latest(_process_registry()) + generate_latest(_state_registry)
+
+def start_worker_exporter() -> None:
+    """Запускает HTTP экспортер метрик в главном процессе Celery воркера"""
+    if not settings.WORKER_METRICS_PORT:
+        return
+    # Каталог PROMETHEUS_MULTIPROC_DIR создает и очищает docker-entrypoint.sh до старта Python:
+    # к этому моменту файлы метрик уже открыты при импорте модуля
+    if not MULTIPROC_DIR:
+        logger.warning("PROMETHEUS_MULTIPROC_DIR не задан, метрики дочерних процессов недоступны")
+    start_http_server(settings.WORKER_METRICS_PORT, registry=_process_registry())
+    logger.info("Экспортер метрик воркера запущен", port=settings.WORKER_METRICS_PORT)
+
+def mark_worker_process_dead(pid: int) -> None:
+    """Удаляет live-метрики завершившегося дочернего процесса"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,32 @@
+import redis
+import redis.asyncio
+
+from app.config.settings import settings
+
+_redis_client = None
+
+def get_redis() -> redis.Redis:
+    """Возвращает общий клиент Redis (создается при первом обращении)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2
+        )
+    return _redis_client
+
+_async_redis_client = None
+
+def get_async_redis() -> "redis.asyncio.Redis":
+    """Возвращает общий асинхронный клиент Redis для эндпоинтов FastAPI"""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = redis.asyncio.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2
+        )
+    return _async_redis_client
@@ -0,0 +1,130 @@
+# Пул экземпляров yt_dlp.YoutubeDL внутри процесса: между задачами сохраняются
+# HTTP соединения (keep-alive), cookies и разобранные данные плеера YouTube.
+# yt_dlp импортируется при первом использовании: API процессам он нужен не всегда
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import structlog
+
+from app.config.settings import settings
+
+logger = structlog.get_logger()
+
+class _HookRelay:
+    """Хуки экземпляра, перенаправляемые в обработчики задачи, которая его сейчас использует"""
+
+    def __init__(self):
+        self.progress: Optional[Callable] = None
+        self.postprocessor: Optional[Callable] = None
+
+    def on_progress(self, d):
+        if self.progress:
+            self.progress(d)
+
+    def on_postprocessor(self, d):
+        if self.postprocessor:
+            self.postprocessor(d)
+
+class _PooledInstance:
+    def __init__(self, ydl, relay: _HookRelay):
+        self.ydl = ydl
+        self.relay = relay
+        self.uses = 0
+
+class YoutubeDLPool:
+    """Экземпляры YoutubeDL по ключу стратегии загрузки.
+
+    Селектор формата, постпроцессоры и хуки фиксируются в YoutubeDL при создании,
+    поэтому ключ должен однозначно определять опции (стратегия, формат, качество).
+    Экземпляр выдается одной задаче за раз; хуки задачи подключаются на время выдачи.
+    """
+
+    def __init__(self):
+        self._idle: Dict[tuple, List[_PooledInstance]] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.created = 0
+
+    def _take_idle(self, key: tuple) -> Optional[_PooledInstance]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # После fork не используем экземпляры родителя: сокеты у них общие
+                self._idle = {}
+                self._pid = os.getpid()
+            instances = self._idle.get(key)
+            return instances.pop() if instances else None
+
+    def _create(self, key: tuple, params: dict) -> _PooledInstance:
+        import yt_dlp
+
+        relay = _HookRelay()
+        params = dict(
+            params,
+            progress_hooks=[relay.on_progress],
+            postprocessor_hooks=[relay.on_postprocessor]
+        )
+        if settings.YTDLP_CACHE_DIR:
+            params.setdefault('cachedir', settings.YTDLP_CACHE_DIR)
+        instance = _PooledInstance(yt_dlp.YoutubeDL(params), relay)
+        self.created += 1
+        logger.debug("Создан экземпляр yt-dlp", strategy=key[0], pid=os.getpid())
+        return instance
+
+    def _release(self, key: tuple, instance: _PooledInstance, reusable: bool):
+        instance.relay.progress = None
+        instance.relay.postprocessor = None
+        instance.uses += 1
+        if reusable and settings.YTDLP_POOL_ENABLED and instance.uses < settings.YTDLP_POOL_MAX_USES:
+            with self._lock:
+                self._idle.setdefault(key, []).append(instance)
+            return
+        try:
+            instance.ydl.close()
+        except Exception as e:
+            logger.warning("Ошибка закрытия экземпляра yt-dlp", error=str(e))
+
+    @contextmanager
+    def acquire(self,
+                key: tuple,
+                params: dict,
+                progress_hook: Optional[Callable] = None,
+                postprocessor_hook: Optional[Callable] = None) -> Iterator[Any]:
+        """Выдает экземпляр для ключа, создавая его из params при необходимости"""
+        from yt_dlp.utils import YoutubeDLError
+
+        instance = None
+        if settings.YTDLP_POOL_ENABLED:
+            instance = self._take_idle(key)
+        if instance is None:
+            instance = self._create(key, params)
+        instance.relay.progress = progress_hook
+        instance.relay.postprocessor = postprocessor_hook
+
+        reusable = False
+        try:
+            yield instance.ydl
+            reusable = True
+        except YoutubeDLError:
+            # Ошибки yt-dlp (видео недоступно и т.п.) не портят состояние экземпляра
+            reusable = True
+            raise
+        finally:
+            # Прочие исключения (в том числе из наших хуков) могли прервать загрузку
+            # на середине - такой экземпляр закрываем
+            self._release(key, instance, reusable)
+
+    def clear(self):
+        """Закрывает все простаивающие экземпляры"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for instance in instances:
+                instance.ydl.close()
+
+def preload_yt_dlp():
+    """Импортирует yt_dlp заранее (в главном процессе воркера до fork дочерних)"""
+    import yt_dlp  # noqa: F401
+
+ytdlp_pool = YoutubeDLPool()
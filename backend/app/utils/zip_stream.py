@@ -0,0 +1,164 @@
+import hashlib
+import os
+import struct
+import time
+import zlib
+from typing import Iterator, List, NamedTuple, Optional
+
+CHUNK_SIZE = 1024 * 1024  # 1MB чтения за раз
+# Без ZIP64 смещения и размеры ограничены 4GB
+MAX_ARCHIVE_SIZE = 0xFFFFFFFF
+
+# Бит 3 - CRC и размеры в data descriptor после данных, бит 11 - имена в UTF-8
+ZIP_FLAGS = 0x0808
+ZIP_VERSION = 20
+
+class ZipEntry(NamedTuple):
+    arcname: str
+    path: str
+    size: int
+    mtime: float
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    """Переводит unix время в формат даты/времени DOS"""
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+class ZipStream:
+    """Потоковая сборка ZIP архива без сжатия (store) с постоянным расходом памяти.
+
+    Размер и содержимое архива детерминированы набором файлов, поэтому можно
+    отдавать произвольный диапазон байт и поддерживать докачку.
+    """
+
+    def __init__(self, entries: List[ZipEntry]):
+        self.entries = entries
+        self._headers = []
+        self._offsets = []
+
+        offset = 0
+        for entry in entries:
+            header = self._local_header(entry)
+            self._headers.append(header)
+            self._offsets.append(offset)
+            offset += len(header) + entry.size + 16
+
+        self._central_offset = offset
+        self._central_size = sum(46 + len(entry.arcname.encode()) for entry in entries)
+        self.size = self._central_offset + self._central_size + 22
+
+        if self.size > MAX_ARCHIVE_SIZE:
+            raise ValueError("Архив превышает 4GB")
+
+    @property
+    def etag(self) -> str:
+        """ETag архива, меняется при изменении набора файлов"""
+        manifest = "|".join(f"{e.arcname}:{e.size}:{int(e.mtime)}" for e in self.entries)
+        return hashlib.sha256(manifest.encode()).hexdigest()[:32]
+
+    def _local_header(self, entry: ZipEntry) -> bytes:
+        name = entry.arcname.encode()
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, ZIP_VERSION, ZIP_FLAGS, 0,
+            dos_time, dos_date, 0, 0, 0, len(name), 0
+        ) + name
+
+    def _central_record(self, entry: ZipEntry, crc: int, offset: int) -> bytes:
+        name = entry.arcname.encode()
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014b50, ZIP_VERSION, ZIP_VERSION, ZIP_FLAGS, 0,
+            dos_time, dos_date, crc, entry.size, entry.size, len(name), 0, 0, 0, 0,
+            0o100644 << 16, offset
+        ) + name
+
+    def _end_record(self) -> bytes:
+        count = len(self.entries)
+        return struct.pack(
+            "<IHHHHIIH", 0x06054b50, 0, 0, count, count,
+            self._central_size, self._central_offset, 0
+        )
+
+    def _read_file(self, entry: ZipEntry) -> Iterator[bytes]:
+        read = 0
+        with open(entry.path, "rb") as f:
+            while read < entry.size:
+                chunk = f.read(min(CHUNK_SIZE, entry.size - read))
+                if not chunk:
+                    break
+                read += len(chunk)
+                yield chunk
+        if read != entry.size:
+            raise IOError(f"Файл {entry.path} изменился во время отправки архива")
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Отдает байты архива с start по end включительно"""
+        end = self.size - 1 if end is None else end
+        position = 0
+        crcs = []
+
+        def emit(data: bytes):
+            # Возвращает часть блока, попадающую в запрошенный диапазон
+            block_start = position
+            block_end = position + len(data)
+            if block_end <= start or block_start > end:
+                return b""
+            return data[max(start - block_start, 0):end + 1 - block_start]
+
+        for entry, header in zip(self.entries, self._headers):
+            if position > end:
+                return
+            piece = emit(header)
+            if piece:
+                yield piece
+            position += len(header)
+
+            # CRC нужен для data descriptor и центрального каталога, поэтому файл
+            # читается даже если его данные лежат до начала диапазона
+            crc = 0
+            for chunk in self._read_file(entry):
+                crc = zlib.crc32(chunk, crc)
+                piece = emit(chunk)
+                if piece:
+                    yield piece
+                position += len(chunk)
+                if position > end:
+                    return
+            crcs.append(crc)
+
+            descriptor = struct.pack("<IIII", 0x08074b50, crc, entry.size, entry.size)
+            piece = emit(descriptor)
+            if piece:
+                yield piece
+            position += len(descriptor)
+
+        for entry, crc, offset in zip(self.entries, crcs, self._offsets):
+            record = self._central_record(entry, crc, offset)
+            piece = emit(record)
+            if piece:
+                yield piece
+            position += len(record)
+
+        piece = emit(self._end_record())
+        if piece:
+            yield piece
+
+def build_zip_entries(files: List[tuple[str, str]]) -> List[ZipEntry]:
+    """Создает записи архива из пар (имя в архиве, путь), делая имена уникальными"""
+    entries = []
+    used_names = set()
+    for arcname, path in files:
+        stat = os.stat(path)
+        name = arcname
+        base, ext = os.path.splitext(arcname)
+        counter = 1
+        while name in used_names:
+            name = f"{base} ({counter}){ext}"
+            counter += 1
+        used_names.add(name)
+        entries.append(ZipEntry(name, path, stat.st_size, stat.st_mtime))
+    return entries
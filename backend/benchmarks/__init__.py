@@ -0,0 +1 @@
+# Офлайн бенчмарки производительности
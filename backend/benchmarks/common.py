@@ -0,0 +1,29 @@
+# Общие утилиты бенчмарков
+import os
+
+def configure_environment(database_url: str, download_dir: str) -> None:
+    """Настраивает окружение до импорта приложения (settings читаются при импорте)"""
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "DOWNLOAD_DIR": download_dir,
+        "YTDLP_CACHE_DIR": os.path.join(os.path.dirname(download_dir), "yt-dlp-cache"),
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "ADMISSION_CONTROL_ENABLED": "false",
+        "WORKER_METRICS_PORT": "0",
+        "RATE_LIMIT_DOWNLOADS_PER_HOUR": "1000000",
+        "RATE_LIMIT_DOWNLOADS_PER_DAY": "1000000",
+    })
+
+def latency_summary(values: list) -> dict:
+    """Перцентили задержек в миллисекундах"""
+    from app.utils.helpers import percentile
+
+    ms = [value * 1000 for value in values]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+    }
@@ -0,0 +1,220 @@
+# Локальная замена YouTube для офлайн бенчмарков: HTTP сервер с синтетическими
+# медиафайлами и совместимая с yt_dlp.YoutubeDL заглушка экстрактора
+import os
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+
+CHUNK_SIZE = 64 * 1024
+_PATTERN = bytes(range(256)) * (CHUNK_SIZE // 256)
+
+class FakeMediaServer:
+    """HTTP сервер, отдающий синтетические файлы /media/<video_id>.mp4"""
+
+    def __init__(self, media_size: int, bandwidth_bytes_per_second: float = 0):
+        self.media_size = media_size
+        self.bandwidth = bandwidth_bytes_per_second
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not re.match(r"^/media/[\w-]+\.mp4$", self.path):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(server.media_size))
+                self.end_headers()
+                sent = 0
+                started = time.monotonic()
+                while sent < server.media_size:
+                    chunk = _PATTERN[:min(CHUNK_SIZE, server.media_size - sent)]
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if server.bandwidth:
+                        # Ограничение скорости на соединение
+                        ahead = sent / server.bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def media_url(self, video_id: str) -> str:
+        return f"{self.base_url}/media/{video_id}.mp4"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def _video_id(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.netloc.endswith("youtu.be"):
+        return parsed.path.lstrip("/")
+    if parsed.path.startswith("/shorts/"):
+        return parsed.path.split("/")[2]
+    return parse_qs(parsed.query)["v"][0]
+
+class FakeYoutubeDL:
+    """Заглушка yt_dlp.YoutubeDL: извлечение с задержкой и загрузка с локального сервера.
+
+    Поддерживает то, что использует приложение: extract_info, download,
+    outtmpl, progress_hooks, postprocessor_hooks и постпроцессоры.
+    """
+
+    server: FakeMediaServer = None
+    extract_delay: float = 0.0
+    postprocess_delay: float = 0.0
+    # Создание экземпляра (загрузка экстракторов, HTTP клиент)
+    init_delay: float = 0.0
+    # Первое обращение экземпляра к плееру (JS плеера, функции подписи), если его нет в cachedir
+    player_delay: float = 0.0
+    # Счетчик созданных экземпляров, для сравнения стратегий переиспользования
+    instances = 0
+
+    def __init__(self, params=None, *args, **kwargs):
+        self.params = params or {}
+        self._player_loaded = False
+        type(self).instances += 1
+        time.sleep(self.init_delay)
+
+    def _load_player(self):
+        if self._player_loaded:
+            return
+        cachedir = self.params.get('cachedir')
+        cache_file = os.path.join(cachedir, "player.json") if cachedir else None
+        if not cache_file or not os.path.exists(cache_file):
+            time.sleep(self.player_delay)
+            if cache_file:
+                os.makedirs(cachedir, exist_ok=True)
+                with open(cache_file, "w") as f:
+                    f.write("{}")
+        self._player_loaded = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    def extract_info(self, url, download=True, **kwargs):
+        self._load_player()
+        time.sleep(self.extract_delay)
+        parsed = urlparse(url)
+        if parsed.path == "/playlist":
+            playlist_id = parse_qs(parsed.query)["list"][0]
+            end = self.params.get("playlistend") or 10
+            return {
+                "_type": "playlist",
+                "id": playlist_id,
+                "entries": [{"id": f"{playlist_id}{i:03d}"} for i in range(end)],
+            }
+
+        video_id = _video_id(url)
+        info = {
+            "id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "description": "synthetic",
+            "duration": 120,
+            "thumbnail": None,
+            "uploader": "benchmark",
+            "view_count": 1000,
+            "ext": "mp4",
+            "url": self.server.media_url(video_id),
+            "formats": [{
+                "format_id": "18", "ext": "mp4", "format_note": "360p",
+                "filesize": self.server.media_size, "vcodec": "avc1", "acodec": "mp4a",
+            }],
+        }
+        if download:
+            self._download(info)
+        return info
+
+    def download(self, urls):
+        for url in urls:
+            self.extract_info(url, download=True)
+        return 0
+
+    def _hook(self, name, status):
+        for hook in self.params.get(name) or []:
+            hook(status)
+
+    def _download(self, info):
+        outtmpl = self.params.get("outtmpl")
+        if isinstance(outtmpl, dict):
+            outtmpl = outtmpl.get("default")
+        filename = outtmpl % {"id": info["id"], "title": info["title"], "ext": info["ext"]}
+        tmpfilename = filename + ".part"
+
+        started = time.monotonic()
+        downloaded = 0
+        total = self.server.media_size
+        with urllib.request.urlopen(info["url"]) as response, open(tmpfilename, "wb") as f:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                downloaded += len(chunk)
+                elapsed = time.monotonic() - started
+                speed = downloaded / elapsed if elapsed else None
+                self._hook("progress_hooks", {
+                    "status": "downloading",
+                    "downloaded_bytes": downloaded,
+                    "total_bytes": total,
+                    "tmpfilename": tmpfilename,
+                    "filename": filename,
+                    "elapsed": elapsed,
+                    "speed": speed,
+                    "eta": (total - downloaded) / speed if speed else None,
+                })
+        os.rename(tmpfilename, filename)
+        self._hook("progress_hooks", {
+            "status": "finished",
+            "downloaded_bytes": downloaded,
+            "total_bytes": downloaded,
+            "filename": filename,
+            "elapsed": time.monotonic() - started,
+        })
+
+        for postprocessor in self.params.get("postprocessors") or []:
+            key = postprocessor.get("key", "unknown")
+            self._hook("postprocessor_hooks", {"status": "started", "postprocessor": key})
+            time.sleep(self.postprocess_delay)
+            codec = postprocessor.get("preferredcodec")
+            if codec:
+                new_filename = os.path.splitext(filename)[0] + f".{codec}"
+                os.rename(filename, new_filename)
+                filename = new_filename
+            self._hook("postprocessor_hooks", {"status": "finished", "postprocessor": key})
+
+def install(server: FakeMediaServer, extract_delay: float = 0.0, postprocess_delay: float = 0.0,
+            init_delay: float = 0.0, player_delay: float = 0.0):
+    """Подменяет yt_dlp.YoutubeDL заглушкой для всех модулей приложения"""
+    FakeYoutubeDL.server = server
+    FakeYoutubeDL.extract_delay = extract_delay
+    FakeYoutubeDL.postprocess_delay = postprocess_delay
+    FakeYoutubeDL.init_delay = init_delay
+    FakeYoutubeDL.player_delay = player_delay
+    yt_dlp.YoutubeDL = FakeYoutubeDL
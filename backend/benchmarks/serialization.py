@@ -0,0 +1,129 @@
+"""Стоимость сериализации страницы списков /downloads/my и /downloads/global.
+
+Сравнивает прежний путь (модель DownloadResponse на строку, повторная валидация
+по response_model, jsonable_encoder и JSONResponse) с быстрым путем
+(словари из строк и ORJSONResponse). База не используется: страница собирается
+из несохраненных записей Download, замеряется только сериализация.
+
+Запуск из каталога backend:
+
+    python -m benchmarks.serialization --per-page 100 --runs 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_environment, latency_summary
+
+def build_page(per_page: int) -> list:
+    """Страница записей: половина завершена, у всех есть информация о видео"""
+    from app.models.download import Download, DownloadStatus
+
+    now = datetime.utcnow()
+    return [
+        Download(
+            id=str(uuid.uuid4()),
+            youtube_url=f"https://www.youtube.com/watch?v=serial{i:05d}",
+            video_id=f"serial{i:05d}",
+            video_title=f"Benchmark video {i} " + "x" * 40,
+            video_description="Описание " * 20,
+            video_duration=60 + i,
+            video_thumbnail=f"https://i.ytimg.com/vi/serial{i:05d}/hqdefault.jpg",
+            channel_name="Benchmark channel",
+            view_count=1000 * i,
+            status=DownloadStatus.COMPLETED if i % 2 else DownloadStatus.PROCESSING,
+            file_name=f"video_{i}.mp4" if i % 2 else None,
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(per_page)
+    ]
+
+def cases(page: list) -> dict:
+    """Прежний и быстрый путь для обоих списков: функция возвращает тело ответа"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    from app.controllers.download_controller import build_download_response, download_response_fields
+    from app.schemas.download_schemas import DownloadHistory
+    from app.utils.json_response import fast_json_response
+
+    history_field = create_model_field(name="Response_history", type_=DownloadHistory, mode="serialization")
+    per_page = len(page)
+    loop = asyncio.new_event_loop()
+
+    def history_pydantic():
+        history = DownloadHistory(
+            downloads=[build_download_response(download) for download in page],
+            total=per_page, page=1, per_page=per_page
+        )
+        content = loop.run_until_complete(serialize_response(field=history_field, response_content=history))
+        return JSONResponse(content).body
+
+    def history_orjson():
+        return fast_json_response({
+            'downloads': [download_response_fields(download) for download in page],
+            'total': per_page, 'page': 1, 'per_page': per_page
+        }).body
+
+    def activity_items():
+        return [
+            {'video_title': download.video_title or 'Обработка...', 'created_at': download.created_at}
+            for download in page
+        ]
+
+    def global_pydantic():
+        content = {'activity': activity_items(), 'total': per_page, 'page': 1, 'per_page': per_page}
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def global_orjson():
+        return fast_json_response({'activity': activity_items(), 'total': per_page, 'page': 1, 'per_page': per_page}).body
+
+    return {
+        'history.pydantic': history_pydantic,
+        'history.orjson': history_orjson,
+        'global.pydantic': global_pydantic,
+        'global.orjson': global_orjson,
+    }
+
+def run_case(call, runs: int) -> dict:
+    """Время сериализации страницы (первые прогоны прогревают и не учитываются)"""
+    for _ in range(min(runs, 50)):
+        body = call()
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return dict(latency_summary(latencies), bytes=len(body))
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Компактный JSON в одну строку")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ytubik-bench-")
+    configure_environment(f"sqlite:///{os.path.join(workdir, 'bench.db')}", os.path.join(workdir, "downloads"))
+
+    page = build_page(args.per_page)
+    report = {'per_page': args.per_page, 'runs': args.runs}
+    report['cases'] = {name: run_case(call, args.runs) for name, call in cases(page).items()}
+    report['speedup'] = {
+        name: round(report['cases'][f'{name}.pydantic']['p50_ms'] / report['cases'][f'{name}.orjson']['p50_ms'], 2)
+        for name in ('history', 'global')
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=None if args.json else 2, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Параллельная запись в SQLite: режим по умолчанию против WAL и единого пути записи.
+
+Несколько процессов (как API, воркер и beat на одном узле), в каждом несколько
+потоков, создают загрузки и записывают итоги этапов через DownloadService,
+пока потоки чтения запрашивают историю и глобальную ленту.
+Для каждого режима база создается заново; отчет содержит записей в секунду,
+задержки и число ошибок "database is locked".
+
+Запуск из каталога backend:
+
+    python -m benchmarks.sqlite_writes --processes 3 --threads 4 --readers 2 --writes 200
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import configure_environment, latency_summary
+
+MODES = {
+    "default": {"SQLITE_WAL_MODE": "false", "SQLITE_SINGLE_WRITER": "false"},
+    "wal": {"SQLITE_WAL_MODE": "true", "SQLITE_SINGLE_WRITER": "false"},
+    "wal+single_writer": {"SQLITE_WAL_MODE": "true", "SQLITE_SINGLE_WRITER": "true"},
+}
+
+_WRITER = """
+import json, logging, sys, threading, time
+import structlog
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL))
+from sqlalchemy.exc import OperationalError
+from app.models.database import session_scope
+from app.models.download import DownloadStatus
+from app.services.download_service import DownloadService
+
+threads, readers, writes, process_index = {threads}, {readers}, {writes}, {process_index}
+latencies, errors = [], []
+reads = [0]
+done = threading.Event()
+
+def writer(thread_index):
+    for i in range(writes):
+        started = time.perf_counter()
+        try:
+            with session_scope() as db:
+                service = DownloadService(db)
+                download = service.create_download(
+                    "https://www.youtube.com/watch?v=sqlitebench", f"p{{process_index}}t{{thread_index}}w{{i}}",
+                    "video_mp4", "best", False, "127.0.0.1", f"session-{{process_index}}")
+                service.update_download(download.id, DownloadStatus.COMPLETED, file_name="bench.mp4", file_size=1.0)
+        except OperationalError as e:
+            errors.append(str(e.orig))
+            continue
+        latencies.append(time.perf_counter() - started)
+
+def reader():
+    while not done.is_set():
+        try:
+            with session_scope() as db:
+                service = DownloadService(db)
+                service.get_user_downloads(f"session-{{process_index}}")
+                service.get_global_activity()
+        except OperationalError as e:
+            errors.append(str(e.orig))
+            continue
+        reads[0] += 1
+
+writers = [threading.Thread(target=writer, args=(index,)) for index in range(threads)]
+reading = [threading.Thread(target=reader) for _ in range(readers)]
+for worker in writers + reading:
+    worker.start()
+for worker in writers:
+    worker.join()
+done.set()
+for worker in reading:
+    worker.join()
+print(json.dumps({{"latencies": latencies, "errors": errors, "reads": reads[0]}}))
+"""
+
+def run_mode(mode: str, processes: int, threads: int, readers: int, writes: int, workdir: str) -> dict:
+    """Запускает процессы записи на свежей базе и сводит их результаты"""
+    database = os.path.join(workdir, f"{mode}.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", **MODES[mode])
+    subprocess.run(
+        [sys.executable, "-c",
+         "import app.models.download; from app.models.database import Base, engine; Base.metadata.create_all(bind=engine)"],
+        check=True, env=env
+    )
+
+    started = time.perf_counter()
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-c", _WRITER.format(threads=threads, readers=readers, writes=writes, process_index=index)],
+            stdout=subprocess.PIPE, text=True, env=env
+        )
+        for index in range(processes)
+    ]
+    outputs = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for child in children]
+    wall = time.perf_counter() - started
+
+    latencies = [value for output in outputs for value in output["latencies"]]
+    errors = [error for output in outputs for error in output["errors"]]
+    # Каждая операция - две записи: создание загрузки и итог этапа
+    return dict(
+        latency_summary(latencies),
+        wall_seconds=round(wall, 2),
+        writes_per_second=round(2 * len(latencies) / wall, 1),
+        reads_per_second=round(sum(output["reads"] for output in outputs) / wall, 1),
+        errors=len(errors),
+        error_kinds=sorted(set(errors)),
+    )
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4, help="Потоков записи в каждом процессе")
+    parser.add_argument("--readers", type=int, default=2, help="Потоков чтения в каждом процессе")
+    parser.add_argument("--writes", type=int, default=200, help="Операций на поток записи")
+    parser.add_argument("--mode", action="append", choices=list(MODES), help="По умолчанию все режимы")
+    parser.add_argument("--json", action="store_true", help="Компактный JSON в одну строку")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ytubik-bench-")
+    configure_environment(f"sqlite:///{os.path.join(workdir, 'bench.db')}", os.path.join(workdir, "downloads"))
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+
+    report = {"processes": args.processes, "threads": args.threads, "readers": args.readers,
+              "writes_per_thread": args.writes}
+    report["modes"] = {
+        mode: run_mode(mode, args.processes, args.threads, args.readers, args.writes, workdir)
+        for mode in (args.mode or MODES)
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=None if args.json else 2, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Время старта и память процессов API и воркера.
+
+Каждый замер - отдельный процесс Python, импортирующий точку входа: время
+импорта, RSS после импорта, число загруженных модулей и загружен ли yt_dlp.
+
+Запуск из каталога backend:
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import configure_environment
+
+TARGETS = {
+    "api": "app.main",
+    "worker": "app.tasks.download_tasks",
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+rss_kb = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmRSS"))
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "modules": len(sys.modules),
+    "yt_dlp_loaded": "yt_dlp" in sys.modules,
+}}))
+"""
+
+def measure(module: str, runs: int) -> dict:
+    """Медианы по нескольким запускам процесса"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module)],
+            capture_output=True, text=True, check=True, env=os.environ
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    def median(key):
+        values = sorted(sample[key] for sample in samples)
+        return values[len(values) // 2]
+
+    return {
+        "module": module,
+        "import_seconds": round(median("import_seconds"), 3),
+        "rss_mb": round(median("rss_mb"), 1),
+        "modules": median("modules"),
+        "yt_dlp_loaded": samples[0]["yt_dlp_loaded"],
+    }
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Компактный JSON в одну строку")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ytubik-bench-")
+    configure_environment(f"sqlite:///{os.path.join(workdir, 'bench.db')}", os.path.join(workdir, "downloads"))
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+
+    report = {name: measure(module, args.runs) for name, module in TARGETS.items()}
+    print(json.dumps(report, indent=None if args.json else 2, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    main()
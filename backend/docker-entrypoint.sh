@@ -0,0 +1,13 @@
+#!/bin/sh
+# Подготовка контейнера до запуска Python.
+# Каталог метрик Prometheus создается и очищается здесь, а не в приложении: модуль
+# метрик открывает в нем файлы при импорте, а дочерние процессы Celery наследуют
+# эти файлы через fork, поэтому удалять их после старта нельзя.
+set -e
+
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
@@ -0,0 +1,32 @@
+"""Окружение Alembic: движок и метаданные приложения"""
+from alembic import context
+
+from app.models.database import Base, engine
+from app.models import download  # noqa: F401 - регистрация модели в метаданных
+
+def run_migrations() -> None:
+    # Соединение можно передать через config.attributes (тесты, вызов из кода)
+    connection = context.config.attributes.get('connection')
+    if connection is not None:
+        configure(connection)
+        return
+    with engine.connect() as connection:
+        configure(connection)
+        connection.commit()
+
+def configure(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=Base.metadata,
+        # SQLite не умеет большинство ALTER TABLE - batch операции пересоздают таблицу
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    context.configure(url=str(engine.url), target_metadata=Base.metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+else:
+    run_migrations()
@@ -0,0 +1,40 @@
+"""Колонки downloads.stage_timings и downloads.callback_url
+
+Таблицы создает create_all при старте API, поэтому на новой базе колонки
+уже есть, и миграция добавляет только отсутствующие (базы, созданные до них).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def columns() -> list:
+    return [
+        sa.Column('stage_timings', sa.JSON(), nullable=True),
+        sa.Column('callback_url', sa.String(), nullable=True),
+    ]
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('downloads'):
+        # Таблицу целиком создаст create_all
+        return
+    existing = {column['name'] for column in inspector.get_columns('downloads')}
+    missing = [column for column in columns() if column.name not in existing]
+    if not missing:
+        return
+    with op.batch_alter_table('downloads') as batch:
+        for column in missing:
+            batch.add_column(column)
+
+def downgrade() -> None:
+    with op.batch_alter_table('downloads') as batch:
+        for column in columns():
+            batch.drop_column(column.name)
@@ -0,0 +1,36 @@
+import pytest
+
+class FakeKeyValueRedis:
+    """Минимальная замена Redis: GET, SET с NX и TTL, DELETE"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttl = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttl[key] = ex
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+        self.ttl.pop(key, None)
+
+class FailingSession:
+    """Сессия БД, обращение к которой - ошибка теста"""
+
+    def query(self, *args, **kwargs):
+        raise AssertionError("Ответ не должен читаться из БД")
+
+@pytest.fixture
+def key_value_redis():
+    return FakeKeyValueRedis()
+
+@pytest.fixture
+def failing_session():
+    return FailingSession()
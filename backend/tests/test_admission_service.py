@@ -0,0 +1,37 @@
+from app.config.settings import settings
+from app.services.admission_service import AdmissionService
+
+class FakeQueueRedis:
+    """Минимальная замена Redis для проверки admission control"""
+
+    def __init__(self, queue_depth=0, samples=None):
+        self.queue_depth = queue_depth
+        self.samples = [str(value) for value in (samples or [])]
+
+    def llen(self, key):
+        return self.queue_depth
+
+    def lrange(self, key, start, end):
+        return list(self.samples)
+
+def test_admission_allows_short_queue(monkeypatch):
+    """Короткая очередь пропускается и возвращает оценку старта"""
+    monkeypatch.setattr(settings, "ADMISSION_WORKER_CONCURRENCY", 2)
+    service = AdmissionService(FakeQueueRedis(queue_depth=4, samples=[30, 30, 30]))
+
+    result = service.check_admission()
+
+    assert result['allowed'] is True
+    assert result['estimated_wait_seconds'] == 60.0
+    assert result['retry_after'] is None
+
+def test_admission_rejects_when_wait_exceeds_limit(monkeypatch):
+    """Очередь, которая не успеет разобраться вовремя, отклоняется с Retry-After"""
+    monkeypatch.setattr(settings, "ADMISSION_WORKER_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_SECONDS", 600)
+    service = AdmissionService(FakeQueueRedis(queue_depth=20, samples=[60]))
+
+    result = service.check_admission()
+
+    assert result['allowed'] is False
+    assert result['retry_after'] == 660
@@ -0,0 +1,35 @@
+from app.config.settings import settings
+from app.tasks.autoscaler import compute_target_concurrency
+from app.tasks.worker import autoscale_option
+
+def test_scales_up_with_queue_depth():
+    """Пул растет на число задач в очереди, но не выше максимума"""
+    target, reason = compute_target_concurrency(
+        processes=2, busy=2, queue_depth=10, cpu_load=0.1, bandwidth_mbps=None,
+        min_concurrency=1, max_concurrency=8
+    )
+    assert (target, reason) == (8, "queue")
+
+def test_holds_when_cpu_saturated():
+    """При перегрузке CPU новые процессы не добавляются"""
+    target, reason = compute_target_concurrency(
+        processes=3, busy=3, queue_depth=5,
+        cpu_load=settings.WORKER_AUTOSCALE_MAX_CPU_LOAD + 0.1, bandwidth_mbps=None,
+        min_concurrency=1, max_concurrency=8
+    )
+    assert (target, reason) == (3, "cpu_saturated")
+
+def test_scales_down_to_minimum_when_idle():
+    """Без задач пул сжимается до минимума"""
+    target, _ = compute_target_concurrency(
+        processes=6, busy=0, queue_depth=0, cpu_load=0.0, bandwidth_mbps=0.0,
+        min_concurrency=1, max_concurrency=8
+    )
+    assert target == 1
+
+def test_worker_autoscale_option_from_settings(monkeypatch):
+    """Границы --autoscale для make worker и Docker Compose берутся из настроек"""
+    monkeypatch.setattr(settings, "WORKER_AUTOSCALE_MIN", 2)
+    monkeypatch.setattr(settings, "WORKER_AUTOSCALE_MAX", 12)
+
+    assert autoscale_option() == "--autoscale=12,2"
@@ -0,0 +1,150 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config.settings import settings
+from app.controllers import download_controller
+from app.main import app
+from app.models.database import Base, get_db
+from app.models.download import Download
+from app.schemas.download_schemas import VideoInfo
+from app.services.youtube_service import YouTubeService
+
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PL123"
+PLAYLIST = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+PRIVATE = {"ppppppppppp"}
+
+def watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+class StubYouTubeService(YouTubeService):
+    """YouTubeService с заглушкой yt-dlp: плейлист и информация о видео без сети"""
+
+    extracted = []
+
+    def _expand_playlist(self, url, limit):
+        return [watch_url(video_id) for video_id in PLAYLIST][:limit]
+
+    def _extract_video_info(self, url):
+        video_id = self.extract_video_id(url)
+        self.extracted.append(video_id)
+        if video_id in PRIVATE:
+            raise ValueError("Не удалось получить информацию о видео: Private video")
+        return VideoInfo(
+            video_id=video_id, title=f"Video {video_id}", description=None, duration=60, thumbnail=None,
+            channel_name="Channel", view_count=1, available_formats=[]
+        )
+
+@pytest.fixture
+def batch(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    inserts = []
+    queued = []
+    popular = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO downloads"):
+            inserts.append(statement)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    class FakeGroup:
+        def __init__(self, signatures):
+            self.signatures = list(signatures)
+
+        def apply_async(self):
+            queued.extend(signature.args[0] for signature in self.signatures)
+
+    class FakePopularity:
+        def record_many(self, video_ids, strategy):
+            popular.append((video_ids, strategy))
+
+    StubYouTubeService.extracted = []
+    monkeypatch.setattr(download_controller, "YouTubeService", StubYouTubeService)
+    monkeypatch.setattr(download_controller, "SessionLocal", Session)
+    monkeypatch.setattr(download_controller, "group", FakeGroup)
+    monkeypatch.setattr(download_controller, "PopularityService", FakePopularity)
+    monkeypatch.setattr(settings, "ADMISSION_CONTROL_ENABLED", False)
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+    def post(urls):
+        response = TestClient(app).post("/api/downloads/batch", json={"urls": urls})
+        lines = [json.loads(line) for line in response.text.splitlines()] if response.status_code == 200 else None
+        return response, lines
+
+    post.session = Session
+    post.inserts = inserts
+    post.queued = queued
+    post.popular = popular
+    yield post
+
+def test_batch_streams_items_in_order(batch):
+    """Пропущенные строки идут первыми, затем ошибки, затем поставленные в очередь по порядку и итог"""
+    response, lines = batch([
+        watch_url("ddddddddddd"),
+        PLAYLIST_URL,
+        "https://youtu.be/ddddddddddd",
+        watch_url("ppppppppppp"),
+    ])
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [(line.get('index'), line.get('status')) for line in lines] == [
+        (4, "skipped"),
+        (5, "failed"),
+        (0, "queued"), (1, "queued"), (2, "queued"), (3, "queued"),
+        (None, None),
+    ]
+    assert lines[0]['error'] == "Видео уже есть в этом пакете"
+    assert "Private video" in lines[1]['error']
+    assert lines[-1] == {"type": "summary", "total": 6, "queued": 4, "failed": 1, "skipped": 1}
+
+    # Развернутый плейлист встает на место своего URL
+    queued = lines[2:6]
+    assert [line['url'] for line in queued] == [watch_url(video_id) for video_id in ["ddddddddddd"] + PLAYLIST]
+    assert [line['download']['video_info']['video_id'] for line in queued] == ["ddddddddddd"] + PLAYLIST
+
+    # Все записи - одним INSERT, задачи - одной группой
+    assert len(batch.inserts) == 1
+    assert batch.queued == [line['download']['id'] for line in queued]
+    # Поставленные видео учитываются в популярности, как одиночные загрузки
+    assert batch.popular == [(["ddddddddddd"] + PLAYLIST, ("video_mp4", "best", False))]
+    db = batch.session()
+    assert db.query(Download).count() == 4
+    db.close()
+
+def test_batch_cap_skips_items_after_expansion(batch, monkeypatch):
+    """Видео сверх BATCH_MAX_ITEMS после разворота плейлиста пропускаются без валидации"""
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 3)
+
+    response, lines = batch([PLAYLIST_URL, watch_url("ddddddddddd")])
+
+    assert [(line.get('index'), line.get('status')) for line in lines[:-1]] == [
+        (3, "skipped"), (0, "queued"), (1, "queued"), (2, "queued")
+    ]
+    assert lines[0]['error'] == "Превышен лимит пакета: 3"
+    assert "ddddddddddd" not in StubYouTubeService.extracted
+    assert lines[-1]['skipped'] == 1 and lines[-1]['queued'] == 3
+
+def test_batch_rejected_by_rate_limit_before_validation(batch, monkeypatch):
+    """Пакет, не помещающийся в лимит загрузок IP, отклоняется целиком до извлечения информации"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_DOWNLOADS_PER_HOUR", 2)
+
+    response, _ = batch([PLAYLIST_URL])
+
+    assert response.status_code == 429
+    assert response.json()['detail']['requested'] == 3
+    assert StubYouTubeService.extracted == []
+    assert batch.inserts == [] and batch.queued == [] and batch.popular == []
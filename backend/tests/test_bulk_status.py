@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config.settings import settings
+from app.controllers import download_controller
+from app.models.database import Base
+from app.models.download import DownloadStatus
+from app.schemas.download_schemas import BulkStatusRequest
+from app.services.download_service import DownloadService
+
+def test_bulk_status_returns_only_changed(monkeypatch):
+    """Выполняющиеся статусы берутся из Redis, остальные одним запросом к БД; неизменившиеся пропускаются"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    service = DownloadService(db)
+    stored, running = [
+        service.create_download(
+            f"https://www.youtube.com/watch?v={video_id}", video_id, "video_mp4", "best", False,
+            "127.0.0.1", "session-1"
+        )
+        for video_id in ("dQw4w9WgXcQ", "aaaaaaaaaaa")
+    ]
+    service.update_download(stored.id, DownloadStatus.COMPLETED, file_path="/tmp/v.mp4", file_name="v.mp4")
+
+    async def live_get_many(download_ids):
+        return [{'status': 'processing', 'progress': '10'} if download_id == running.id else None
+                for download_id in download_ids]
+
+    monkeypatch.setattr(download_controller.LiveStatusService, "get_many", live_get_many)
+
+    first = asyncio.run(download_controller.get_downloads_status(
+        BulkStatusRequest(ids=[stored.id, running.id, "missing"]), db
+    ))
+    by_id = {item.id: item for item in first.statuses}
+    assert by_id[stored.id].download_url == f"/api/download/{stored.id}/file"
+    assert (by_id[running.id].status, by_id[running.id].progress) == (DownloadStatus.PROCESSING, 10.0)
+    assert first.missing == ["missing"]
+
+    since = {item.id: item.version for item in first.statuses}
+    second = asyncio.run(download_controller.get_downloads_status(
+        BulkStatusRequest(ids=[stored.id, running.id], since=since), db
+    ))
+    assert (second.statuses, second.unchanged) == ([], 2)
+
+def test_bulk_status_ids_capped():
+    with pytest.raises(ValidationError):
+        BulkStatusRequest(ids=[str(i) for i in range(settings.STATUS_BULK_MAX_IDS + 1)])
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from contextlib import contextmanager
+
+from fastapi import Response
+from starlette.requests import Request
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.config.settings import settings
+from app.controllers import download_controller
+from app.models.database import Base, configure_sqlite, engine_options
+from app.models.download import Download, DownloadStatus
+from app.services.download_service import DownloadService
+
+def test_engine_options_pool_and_pgbouncer(monkeypatch):
+    """Пул Postgres настраивается из Settings, через PgBouncer пул приложения отключается"""
+    options = engine_options("postgresql://user@db/ytubik")
+    assert (options["pool_size"], options["pool_recycle"], options["pool_pre_ping"]) == (
+        settings.DB_POOL_SIZE, settings.DB_POOL_RECYCLE_SECONDS, True
+    )
+
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    assert engine_options("postgresql://user@pgbouncer/ytubik") == {"poolclass": NullPool}
+
+def test_replica_lag_falls_back_to_primary(monkeypatch):
+    """Загрузка, которой еще нет на реплике, читается с основной базы"""
+    primary_engine, replica_engine = create_engine("sqlite://"), create_engine("sqlite://")
+    for bind in (primary_engine, replica_engine):
+        Base.metadata.create_all(bind=bind)
+    primary, replica = sessionmaker(bind=primary_engine)(), sessionmaker(bind=replica_engine)()
+    download = DownloadService(primary).create_download(
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ", "video_mp4", "best", False,
+        "127.0.0.1", "session-1"
+    )
+
+    @contextmanager
+    def primary_scope():
+        yield primary
+
+    monkeypatch.setattr(download_controller, "reads_from_replica", lambda db: db is replica)
+    monkeypatch.setattr(download_controller, "session_scope", primary_scope)
+
+    found = download_controller.find_downloads(replica, [download.id, "missing"])
+
+    assert list(found) == [download.id]
+
+def test_sqlite_wal_and_single_writer(tmp_path):
+    """Файловая SQLite работает в WAL, а блокировка записи освобождается по завершении транзакции"""
+    sqlite_engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    configure_sqlite(sqlite_engine)
+    Base.metadata.create_all(bind=sqlite_engine)
+    Session = sessionmaker(bind=sqlite_engine)
+
+    with sqlite_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    first, second = Session(), Session()
+    download = DownloadService(first).create_download(
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ", "video_mp4", "best", False,
+        "127.0.0.1", "session-1"
+    )
+    # Вторая сессия пишет после commit первой, не дожидаясь busy_timeout
+    assert DownloadService(second).update_download(download.id, DownloadStatus.COMPLETED)
+    first.close()
+    second.close()
+
+def test_recent_change_reads_versioned_responses_from_primary(monkeypatch):
+    """Сразу после изменения ответы под новой версией ETag читаются с основной базы, а не с отстающей реплики"""
+    primary_engine, replica_engine = create_engine("sqlite://"), create_engine("sqlite://")
+    for bind in (primary_engine, replica_engine):
+        Base.metadata.create_all(bind=bind)
+    primary, replica = sessionmaker(bind=primary_engine)(), sessionmaker(bind=replica_engine)()
+    download = DownloadService(primary).create_download(
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ", "video_mp4", "best", False,
+        "127.0.0.1", "session-1"
+    )
+    replica.add(Download(**{column.key: getattr(download, column.key) for column in Download.__table__.columns}))
+    replica.commit()
+    # Реплика еще не получила завершение загрузки
+    DownloadService(primary).update_download(download.id, DownloadStatus.COMPLETED, file_name="v.mp4")
+
+    @contextmanager
+    def primary_scope():
+        yield primary
+
+    async def version_get(session_id):
+        return "43"
+
+    changed = {'recently': True}
+
+    async def changed_recently(session_id):
+        return changed['recently']
+
+    async def no_live(download_id):
+        return None
+
+    monkeypatch.setattr(download_controller, "reads_from_replica", lambda db: db is replica)
+    monkeypatch.setattr(download_controller, "session_scope", primary_scope)
+    monkeypatch.setattr(download_controller.SessionVersionService, "get", version_get)
+    monkeypatch.setattr(download_controller.SessionVersionService, "changed_recently", changed_recently)
+    monkeypatch.setattr(download_controller.LiveStatusService, "get", no_live)
+    request = Request({
+        "type": "http", "method": "GET", "path": "/api/downloads/my",
+        "headers": [(b"cookie", b"session_id=session-1")], "client": ("127.0.0.1", 12345),
+    })
+
+    def statuses():
+        history = asyncio.run(download_controller.get_my_downloads(
+            page=1, per_page=20, request=request, response=Response(), db=replica, if_none_match=None
+        ))
+        status = asyncio.run(download_controller.resolve_download_status(
+            download.id, replica, "session-1", None, Response()
+        ))
+        return [entry['status'] for entry in json.loads(history.body)['downloads']], status.status
+
+    assert statuses() == ([DownloadStatus.COMPLETED], DownloadStatus.COMPLETED)
+
+    # После окна отставания реплики чтение возвращается на нее
+    changed['recently'] = False
+    assert statuses() == ([DownloadStatus.PENDING], DownloadStatus.PENDING)
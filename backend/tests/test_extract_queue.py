@@ -0,0 +1,68 @@
+import pytest
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+
+from app.config.settings import settings
+from app.schemas.download_schemas import VideoInfo
+from app.services.youtube_service import YouTubeService
+from app.tasks.celery_app import celery_app, EXTRACT_VIDEO_INFO_TASK, DOWNLOAD_VIDEO_TASK
+
+class FakeAsyncResult:
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+        self.forgotten = False
+
+    def get(self, timeout=None):
+        if self.error:
+            raise self.error
+        return self.value
+
+    def forget(self):
+        self.forgotten = True
+
+class FakeSender:
+    """Запоминает отправленные задачи и возвращает заданный результат"""
+
+    def __init__(self):
+        self.calls = []
+        self.result = None
+
+    def send_task(self, name, args=None, expires=None):
+        self.calls.append((name, args, expires))
+        return self.result
+
+@pytest.fixture
+def sent(monkeypatch):
+    sender = FakeSender()
+    monkeypatch.setattr(settings, "EXTRACT_QUEUE_ENABLED", True)
+    monkeypatch.setattr(celery_app, "send_task", sender.send_task)
+    return sender
+
+def test_extract_task_routed_to_dedicated_queue():
+    """Извлечение уходит в очередь extract, загрузки остаются в основной"""
+    assert celery_app.amqp.router.route({}, EXTRACT_VIDEO_INFO_TASK)['queue'].name == settings.EXTRACT_QUEUE_NAME
+    assert celery_app.amqp.router.route({}, DOWNLOAD_VIDEO_TASK)['queue'].name == "celery"
+
+def test_video_info_fetched_from_extract_queue(sent):
+    """API получает информацию из результата задачи и не хранит его в backend"""
+    sent.result = FakeAsyncResult(VideoInfo(
+        video_id='dQw4w9WgXcQ', title='Video', description=None, duration=212, thumbnail=None,
+        channel_name=None, view_count=None, available_formats=[]
+    ).model_dump())
+
+    info = YouTubeService().fetch_video_info("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+    assert info.title == 'Video'
+    assert sent.calls == [(EXTRACT_VIDEO_INFO_TASK, ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"],
+                          settings.EXTRACT_TIMEOUT_SECONDS)]
+    assert sent.result.forgotten
+
+def test_extract_timeout_is_retryable_not_invalid(sent):
+    """Таймаут очереди не считается ошибкой видео"""
+    sent.result = FakeAsyncResult(error=CeleryTimeoutError())
+
+    validation = YouTubeService().validate_video_sync("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+    assert validation['valid'] is False
+    assert validation['retry'] is True
+    assert sent.result.forgotten
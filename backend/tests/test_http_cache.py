@@ -0,0 +1,42 @@
+import asyncio
+
+from fastapi import Response
+from starlette.requests import Request
+
+from app.controllers import download_controller
+from app.utils.http_cache import make_etag, etag_matches
+
+def make_request(session_id: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/downloads/my",
+        "headers": [(b"cookie", f"session_id={session_id}".encode())],
+        "client": ("127.0.0.1", 12345),
+    })
+
+def test_etag_matches_weak_and_list():
+    """If-None-Match сравнивается слабо и может содержать список ETag"""
+    etag = make_etag("session-1", "7")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("session-1", "8"), etag)
+
+def test_unchanged_history_answers_304_without_db(monkeypatch, failing_session):
+    """История без изменений с прошлого запроса отдается 304 по версии сессии, БД не читается"""
+    async def version_get(session_id):
+        return "42"
+
+    monkeypatch.setattr(download_controller.SessionVersionService, "get", version_get)
+    etag = make_etag("session-1", "42", "my", 1, 20)
+
+    result = asyncio.run(download_controller.get_my_downloads(
+        page=1, per_page=20, request=make_request("session-1"), response=Response(),
+        db=failing_session, if_none_match=etag
+    ))
+
+    assert result.status_code == 304
+    assert result.headers["ETag"] == etag
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config.settings import settings
+from app.controllers import download_controller
+from app.main import app
+from app.models.database import Base, get_db
+from app.models.download import Download, DownloadFormat
+from app.schemas.download_schemas import VideoInfo
+from app.services import idempotency_service
+from app.services.idempotency_service import IdempotencyService
+from app.services.youtube_service import YouTubeService
+
+def test_second_claim_sees_bound_download(key_value_redis):
+    """Повторный запрос с тем же ключом получает ID уже созданной загрузки"""
+    service = IdempotencyService(key_value_redis)
+    key = service.request_key("session", "abc")
+
+    assert service.claim(key) is None
+    assert service.claim(key) == IdempotencyService.IN_PROGRESS
+
+    service.bind(key, "download-1", 60)
+    assert service.claim(key) == "download-1"
+
+def test_released_key_can_be_claimed_again(key_value_redis):
+    """После неудачного создания ключ освобождается для повтора"""
+    service = IdempotencyService(key_value_redis)
+    key = service.fingerprint_key("session", "dQw4w9WgXcQ", "video_mp4", "best", False)
+
+    assert service.claim(key) is None
+    service.release(key)
+    assert service.claim(key) is None
+
+@pytest.fixture
+def api(monkeypatch, key_value_redis):
+    """API с поддельным Redis для ключей идемпотентности и медленной валидацией видео"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    validations = []
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def validate_video(self, url):
+        validations.append(url)
+        await asyncio.sleep(0.2)
+        info = VideoInfo(video_id="dQw4w9WgXcQ", title="Video", description=None, duration=60, thumbnail=None,
+                         channel_name="Channel", view_count=1, available_formats=[])
+        return {'valid': True, 'info': info, 'error': None, 'retry': False}
+
+    monkeypatch.setattr(idempotency_service, "get_redis", lambda: key_value_redis)
+    monkeypatch.setattr(YouTubeService, "validate_video", validate_video)
+    monkeypatch.setattr(download_controller.celery_app, "send_task",
+                        lambda name, args=None: SimpleNamespace(id="task-1"))
+    monkeypatch.setattr(settings, "ADMISSION_CONTROL_ENABLED", False)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    return SimpleNamespace(redis=key_value_redis, session=Session, validations=validations)
+
+REQUEST = {"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "format": "video_mp4"}
+
+def test_double_click_returns_same_download(api):
+    """Второй одинаковый запрос во время валидации первого дожидается его и получает ту же загрузку"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     cookies={"session_id": "session-1"}) as client:
+            return await asyncio.gather(client.post("/api/download", json=REQUEST),
+                                        client.post("/api/download", json=REQUEST))
+
+    first, second = asyncio.run(scenario())
+
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert first.json()['id'] == second.json()['id']
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(api.validations) == 1
+    db = api.session()
+    assert db.query(Download).count() == 1
+    db.close()
+
+def test_unbound_claim_asks_to_retry(api, monkeypatch):
+    """Если первый запрос не успел создать загрузку, повторный получает 202 с Retry-After, а не ошибку"""
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+    service = IdempotencyService(api.redis)
+    service.claim(service.fingerprint_key("session-1", "dQw4w9WgXcQ", DownloadFormat.VIDEO_MP4, "best", False))
+
+    response = TestClient(app, cookies={"session_id": "session-1"}).post("/api/download", json=REQUEST)
+
+    assert response.status_code == 202
+    assert response.headers["Retry-After"] == "1"
+    assert api.validations == []
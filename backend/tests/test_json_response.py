@@ -0,0 +1,70 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.controllers import download_controller
+from app.models.database import Base
+from app.models.download import DownloadStatus
+from app.schemas.download_schemas import DownloadHistory, DownloadResponse, VideoInfo
+from app.services.download_service import DownloadService
+from app.utils.json_response import fast_json_response
+
+def test_history_fast_path_matches_schema(monkeypatch):
+    """История сериализуется из строк БД в тот же JSON, что и через DownloadHistory, с ETag"""
+    async def version_get(session_id):
+        return "7"
+
+    monkeypatch.setattr(download_controller.SessionVersionService, "get", version_get)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    service = DownloadService(db)
+    completed = service.create_download(
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ", "video_mp4", "best", False,
+        "127.0.0.1", "session-1", video_info={'title': 'Video', 'duration': 212, 'view_count': 10}
+    )
+    service.update_download(completed.id, DownloadStatus.COMPLETED, file_path="/tmp/v.mp4", file_name="v.mp4")
+    service.create_download(
+        "https://www.youtube.com/watch?v=aaaaaaaaaaa", "aaaaaaaaaaa", "audio_mp3", "best", True,
+        "127.0.0.1", "session-1"
+    )
+    db.expire_all()
+    request = Request({
+        "type": "http", "method": "GET", "path": "/api/downloads/my",
+        "headers": [(b"cookie", b"session_id=session-1")], "client": ("127.0.0.1", 12345),
+    })
+
+    result = asyncio.run(download_controller.get_my_downloads(
+        page=1, per_page=100, request=request, response=Response(), db=db, if_none_match=None
+    ))
+
+    downloads, total = service.get_user_downloads("session-1", page=1, per_page=100)
+    expected = DownloadHistory(
+        downloads=[download_controller.build_download_response(download) for download in downloads],
+        total=total, page=1, per_page=100
+    ).model_dump(mode="json")
+    assert json.loads(result.body) == expected
+    urls = {item["id"]: item["download_url"] for item in expected["downloads"]}
+    assert urls[completed.id] == f"/api/download/{completed.id}/file"
+    assert result.headers["ETag"] == download_controller.make_etag("session-1", "7", "my", 1, 100)
+
+def test_datetimes_serialized_like_pydantic():
+    """Даты с часовым поясом (Postgres) и без него (SQLite) - байт в байт как у pydantic"""
+    for created_at in (
+        datetime(2026, 10, 19, 15, 30, 1, 250000, tzinfo=timezone.utc),
+        datetime(2026, 10, 19, 15, 30, 1, tzinfo=timezone(timedelta(hours=5))),
+        datetime(2026, 10, 19, 15, 30, 1, 250000),
+    ):
+        download = DownloadResponse(
+            id="download-1", status=DownloadStatus.COMPLETED, created_at=created_at,
+            video_info=VideoInfo(video_id="dQw4w9WgXcQ", title="Видео", description=None, duration=212,
+                                 thumbnail=None, channel_name=None, view_count=None, available_formats=[]),
+            download_url="/api/download/download-1/file", error_message=None
+        )
+
+        assert fast_json_response(download.model_dump()).body == download.model_dump_json().encode()
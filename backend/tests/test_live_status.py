@@ -0,0 +1,47 @@
+import asyncio
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.controllers import download_controller
+from app.models.database import Base
+from app.models.download import DownloadStatus
+from app.services.download_service import DownloadService
+
+def test_processing_status_served_from_redis(monkeypatch, failing_session):
+    """Статус, прогресс, скорость и ETA выполняющейся загрузки берутся из Redis без запроса в БД"""
+    async def live_get(download_id):
+        return {'status': 'processing', 'progress': '42.5', 'speed': '1048576', 'eta': '12', 'progressive': '0'}
+
+    monkeypatch.setattr(download_controller.LiveStatusService, "get", live_get)
+
+    status = asyncio.run(download_controller.get_download_status("download-1", failing_session, if_none_match=None))
+
+    assert status.status == DownloadStatus.PROCESSING
+    assert (status.progress, status.speed, status.eta) == (42.5, 1048576, 12)
+    assert status.download_url is None
+
+def test_stage_result_written_with_single_update():
+    """Итог этапа (файл, статус, тайминги) записывается одним UPDATE без чтения записи"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    service = DownloadService(db)
+    download = service.create_download(
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ", "video_mp4", "best", False,
+        "127.0.0.1", "session-1", video_info={'title': 'Video', 'duration': 212}
+    )
+    statements = []
+
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    assert service.update_download(
+        download.id, DownloadStatus.COMPLETED, stage_timings={'finalized': 1.0},
+        file_path="/tmp/file.mp4", file_name="file.mp4", file_size=1.5
+    )
+
+    assert [statement.split()[0] for statement in statements] == ["UPDATE"]
+    db.expire_all()
+    stored = service.get_download(download.id)
+    assert (stored.status, stored.file_name, stored.video_title) == ("completed", "file.mp4", "Video")
+    assert stored.completed_at is not None and stored.stage_timings == {'finalized': 1.0}
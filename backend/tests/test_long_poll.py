@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.controllers import download_controller
+from app.models.download import DownloadStatus
+from app.utils.http_cache import make_etag
+
+class IdleSession:
+    """Сессия БД: статус выполняющейся загрузки читается из Redis, соединение только закрывается"""
+
+    def query(self, *args, **kwargs):
+        raise AssertionError("Статус выполняющейся загрузки не должен читаться из БД")
+
+    def close(self):
+        pass
+
+class FakeWatcher:
+    def __init__(self):
+        self.events = []
+
+    @asynccontextmanager
+    async def watch(self, download_id):
+        event = asyncio.Event()
+        self.events.append(event)
+        yield event
+
+def setup_live(monkeypatch):
+    state = {'status': 'processing', 'progress': '10', 'updated_at': '1'}
+    watcher = FakeWatcher()
+
+    async def live_get(download_id):
+        return dict(state)
+
+    monkeypatch.setattr(download_controller.LiveStatusService, "get", live_get)
+    monkeypatch.setattr(download_controller, "get_live_status_watcher", lambda: watcher)
+    return state, watcher
+
+def test_wait_returns_on_change(monkeypatch):
+    """Запрос с wait ждет публикации нового состояния и возвращает его"""
+    state, watcher = setup_live(monkeypatch)
+
+    async def scenario():
+        async def publish():
+            await asyncio.sleep(0.05)
+            state.update(progress='20', updated_at='2')
+            watcher.events[0].set()
+
+        publisher = asyncio.create_task(publish())
+        result = await download_controller.get_download_status(
+            "download-1", IdleSession(), if_none_match=make_etag("live", "download-1", "1"), wait=5
+        )
+        await publisher
+        return result
+
+    status = asyncio.run(scenario())
+
+    assert (status.status, status.progress) == (DownloadStatus.PROCESSING, 20.0)
+
+def test_wait_times_out_with_304(monkeypatch):
+    """Без изменений запрос отвечает 304 по истечении wait"""
+    setup_live(monkeypatch)
+
+    result = asyncio.run(download_controller.get_download_status(
+        "download-1", IdleSession(), if_none_match=make_etag("live", "download-1", "1"), wait=0.05
+    ))
+
+    assert result.status_code == 304
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_OBSERVE = """
+import app.tasks.celery_app, app.tasks.download_tasks
+from app.utils.metrics import DB_FINALIZE_SECONDS, render_metrics
+DB_FINALIZE_SECONDS.observe(0.02)
+print(render_metrics().decode())
+"""
+
+def test_multiprocess_dir_prepared_by_entrypoint(tmp_path):
+    """Entrypoint создает каталог метрик до импорта модуля, метрики процесса пишутся в файлы и читаются"""
+    multiproc_dir = tmp_path / "prometheus" / "worker"
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir), PYTHONPATH=BACKEND_DIR)
+
+    result = subprocess.run(
+        ["sh", os.path.join(BACKEND_DIR, "docker-entrypoint.sh"), sys.executable, "-c", _OBSERVE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "ytubik_db_finalize_seconds_count 1.0" in result.stdout
+    assert any(name.startswith("histogram_") for name in os.listdir(multiproc_dir))
+
+    # Повторный старт начинает с пустого каталога: метрики прошлого запуска не суммируются
+    result = subprocess.run(
+        ["sh", os.path.join(BACKEND_DIR, "docker-entrypoint.sh"), sys.executable, "-c", _OBSERVE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert "ytubik_db_finalize_seconds_count 1.0" in result.stdout
@@ -0,0 +1,28 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.models.database import run_migrations
+
+def test_migrations_add_missing_columns_once(tmp_path):
+    """Миграции добавляют колонки в таблицу, созданную до них, и повторно ничего не меняют"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE downloads (id VARCHAR PRIMARY KEY, created_at TIMESTAMP)"))
+        connection.execute(text("INSERT INTO downloads (id) VALUES ('download-1')"))
+
+    for _ in range(2):
+        with engine.begin() as connection:
+            run_migrations(connection)
+
+    columns = {column['name'] for column in inspect(engine).get_columns('downloads')}
+    assert {'stage_timings', 'callback_url'} <= columns
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id FROM downloads")).scalars().all() == ['download-1']
+        assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == '0001'
+
+def test_migrations_skip_missing_table(tmp_path):
+    """На пустой базе таблицу создает create_all, миграция только отмечает версию"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    with engine.begin() as connection:
+        run_migrations(connection)
+
+    assert inspect(engine).get_table_names() == ['alembic_version']
@@ -0,0 +1,98 @@
+import pytest
+
+from app.config.settings import settings
+from app.services import youtube_service
+from app.services.negative_cache_service import (
+    NegativeCacheService,
+    classify_error,
+    AGE_RESTRICTED,
+    PRIVATE,
+    TOO_LONG,
+    UNAVAILABLE,
+)
+from app.services.youtube_service import YouTubeService
+
+def test_classify_permanent_and_transient_errors():
+    """Постоянные отказы классифицируются, временные ошибки - нет"""
+    assert classify_error("ERROR: [youtube] abc: Video unavailable. This video has been removed") == UNAVAILABLE
+    assert classify_error("ERROR: [youtube] abc: Private video. Sign in if you've been granted access") == PRIVATE
+    assert classify_error("ERROR: [youtube] abc: Sign in to confirm your age") == AGE_RESTRICTED
+    assert classify_error("ERROR: unable to download video data: HTTP Error 403: Forbidden") is None
+    # Ограничение частоты запросов с хоста выглядит как "Video unavailable", но временно
+    assert classify_error("ERROR: [youtube] abc: Video unavailable. "
+                          "This content isn't available, try again later.") is None
+    assert classify_error("ERROR: [youtube] abc: Sign in to confirm you're not a bot") is None
+
+def test_ttl_by_reason_and_too_long_respects_current_limit(monkeypatch, key_value_redis):
+    """TTL зависит от класса, отказ по длительности снимается при увеличении лимита"""
+    cache = NegativeCacheService(key_value_redis)
+    cache.remember("private01", PRIVATE, "Private video")
+    cache.remember("longvideo01", TOO_LONG, "Видео слишком длинное", duration=2 * 60 * 60)
+
+    assert key_value_redis.ttl[cache._key("private01")] == settings.NEGATIVE_CACHE_PRIVATE_TTL_SECONDS
+    assert cache.get("private01")['reason'] == PRIVATE
+    assert cache.get("longvideo01")['duration'] == 7200
+
+    monkeypatch.setattr(settings, "MAX_VIDEO_DURATION_MINUTES", 180)
+    assert cache.get("longvideo01") is None
+
+def test_known_bad_video_rejected_without_extraction(monkeypatch, key_value_redis):
+    """Повторная проверка недоступного видео не вызывает yt-dlp"""
+    monkeypatch.setattr(youtube_service, "NegativeCacheService", lambda: NegativeCacheService(key_value_redis))
+    monkeypatch.setattr(settings, "EXTRACT_QUEUE_ENABLED", False)
+    calls = []
+
+    def extract(self, url):
+        calls.append(url)
+        raise ValueError("Не удалось получить информацию о видео: ERROR: [youtube] dQw4w9WgXcQ: Video unavailable")
+
+    monkeypatch.setattr(YouTubeService, "_extract_video_info", extract)
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    first = YouTubeService().validate_video_sync(url)
+    second = YouTubeService().validate_video_sync(url)
+    with pytest.raises(ValueError, match="Video unavailable"):
+        YouTubeService().fetch_video_info(url)
+
+    assert calls == [url]
+    assert first['valid'] is False and second['valid'] is False
+    assert second['error'] == first['error']
+
+def test_worker_info_goes_through_negative_cache(monkeypatch, key_value_redis):
+    """Воркер загрузок тоже пополняет негативный кеш и не вызывает yt-dlp для известного отказа"""
+    monkeypatch.setattr(youtube_service, "NegativeCacheService", lambda: NegativeCacheService(key_value_redis))
+    calls = []
+
+    def extract(self, url):
+        calls.append(url)
+        raise ValueError("Не удалось получить информацию о видео: ERROR: [youtube] dQw4w9WgXcQ: Private video")
+
+    monkeypatch.setattr(YouTubeService, "_extract_video_info", extract)
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Private video"):
+            YouTubeService().get_video_info_sync(url)
+
+    assert calls == [url]
+    assert NegativeCacheService(key_value_redis).get("dQw4w9WgXcQ")['reason'] == PRIVATE
+
+def test_rate_limited_video_not_cached(monkeypatch, key_value_redis):
+    """Временный отказ при ограничении хоста не попадает в кеш: следующий запрос снова идет в yt-dlp"""
+    monkeypatch.setattr(youtube_service, "NegativeCacheService", lambda: NegativeCacheService(key_value_redis))
+    calls = []
+
+    def extract(self, url):
+        calls.append(url)
+        raise ValueError("Не удалось получить информацию о видео: ERROR: [youtube] dQw4w9WgXcQ: "
+                         "Video unavailable. This content isn't available, try again later.")
+
+    monkeypatch.setattr(YouTubeService, "_extract_video_info", extract)
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="try again later"):
+            YouTubeService().get_video_info_sync(url)
+
+    assert calls == [url, url]
+    assert key_value_redis.data == {}
@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from app.config.settings import settings
+from app.services.popularity_service import PopularityService
+from app.services.prefetch_service import PREFETCH_STRATEGY, STATE_FINISHED, staging_dir
+from app.tasks import prefetch_tasks
+
+AUDIO = ("audio_mp3", "best", True)
+
+class FakePopularityRedis:
+    """Минимальная замена Redis: сортированные множества, множества и строки"""
+
+    def __init__(self):
+        self.zsets = {}
+        self.sets = {}
+        self.strings = {}
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        return []
+
+    def zincrby(self, key, amount, member):
+        values = self.zsets.setdefault(key, {})
+        values[member] = values.get(member, 0) + amount
+
+    def zunionstore(self, dest, keys):
+        (key, weight), = keys.items()
+        self.zsets[dest] = {member: score * weight for member, score in self.zsets.get(key, {}).items()}
+
+    def zremrangebyscore(self, key, low, high):
+        values = self.zsets.get(key, {})
+        for member, score in list(values.items()):
+            if low <= score <= high:
+                del values[member]
+
+    def zrevrangebyscore(self, key, high, low, start=0, num=None, withscores=False):
+        items = sorted(((m, s) for m, s in self.zsets.get(key, {}).items() if s >= low),
+                       key=lambda item: -item[1])
+        return items[start:start + num]
+
+    def getset(self, key, value):
+        previous = self.strings.get(key)
+        self.strings[key] = str(value)
+        return previous
+
+    def delete(self, key):
+        self.sets.pop(key, None)
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def expire(self, key, seconds):
+        return True
+
+def test_counters_decay_with_half_life(monkeypatch):
+    """Счетчики затухают с периодом полураспада, редкие запросы выпадают из топа"""
+    monkeypatch.setattr(settings, "POPULARITY_HALF_LIFE_HOURS", 1.0)
+    fake = FakePopularityRedis()
+    popularity = PopularityService(fake)
+    for _ in range(8):
+        popularity.record("viral000001", PREFETCH_STRATEGY)
+    popularity.record("viral000001", AUDIO)
+    popularity.record("single00001", PREFETCH_STRATEGY)
+
+    assert popularity.decay() == 1.0
+    fake.strings[PopularityService.DECAYED_AT_KEY] = str(float(fake.strings[PopularityService.DECAYED_AT_KEY]) - 3600)
+    assert popularity.decay() == pytest.approx(0.5, rel=1e-3)
+
+    top = popularity.top(10, min_score=1.0)
+    assert [(video_id, strategy) for video_id, strategy, score in top] == [("viral000001", PREFETCH_STRATEGY)]
+    assert top[0][2] == pytest.approx(4.0, rel=1e-3)
+
+def test_cleanup_keeps_pinned_staging_files(monkeypatch, tmp_path):
+    """Очистка staging удаляет старые файлы, кроме закрепленных популярных"""
+    fake = FakePopularityRedis()
+    monkeypatch.setattr(settings, "PREFETCH_STAGING_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PREFETCH_TTL_SECONDS", -1)
+    monkeypatch.setattr(prefetch_tasks, "PopularityService", lambda: PopularityService(fake))
+    PopularityService(fake).pin([("viral000001", PREFETCH_STRATEGY)])
+
+    os.makedirs(staging_dir(PREFETCH_STRATEGY))
+    os.makedirs(staging_dir(AUDIO))
+    for directory, name in ((staging_dir(PREFETCH_STRATEGY), "viral000001_Title.mp4"),
+                            (staging_dir(PREFETCH_STRATEGY), "other000001_Title.mp4"),
+                            (staging_dir(AUDIO), "viral000001_Title.mp3")):
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(b"data")
+
+    assert prefetch_tasks.cleanup_prefetch_staging()['removed_files'] == 2
+    assert os.listdir(staging_dir(PREFETCH_STRATEGY)) == ["viral000001_Title.mp4"]
+
+def test_warm_pins_top_and_schedules_missing(monkeypatch, tmp_path):
+    """Прогрев закрепляет топ, продлевает готовые файлы и ставит в очередь отсутствующие"""
+    fake = FakePopularityRedis()
+    popularity = PopularityService(fake)
+    for _ in range(5):
+        popularity.record("cached00001", PREFETCH_STRATEGY)
+        popularity.record("missing0001", AUDIO)
+    staged = tmp_path / "cached00001_Title.mp4"
+    staged.write_bytes(b"video")
+
+    class FakePrefetch:
+        def __init__(self, redis_client):
+            self.scheduled = []
+            self.extended = []
+
+        def get_state(self, video_id, strategy):
+            if video_id == "cached00001":
+                return {'state': STATE_FINISHED, 'file_path': str(staged)}
+            return {}
+
+        def extend(self, video_id, strategy, ttl):
+            self.extended.append(video_id)
+
+        def free_slots(self):
+            return 2
+
+        def schedule(self, video_id, url, strategy, ttl=None):
+            self.scheduled.append((video_id, strategy, ttl))
+            return True
+
+    prefetch = FakePrefetch(fake)
+    monkeypatch.setattr(settings, "POPULARITY_WARM_ENABLED", True)
+    monkeypatch.setattr(prefetch_tasks, "PopularityService", lambda: popularity)
+    monkeypatch.setattr(prefetch_tasks, "PrefetchService", lambda redis_client: prefetch)
+
+    result = prefetch_tasks.warm_popular_videos()
+
+    assert result == {'pinned': 2, 'cached': 1, 'scheduled': 1}
+    assert prefetch.extended == ["cached00001"]
+    assert prefetch.scheduled == [("missing0001", AUDIO, settings.POPULARITY_PIN_TTL_SECONDS)]
+    assert set(popularity.pinned()) == {"video_mp4-best-video", "audio_mp3-best-audio"}
+
+def test_record_many_counts_each_video():
+    fake = FakePopularityRedis()
+    service = PopularityService(fake)
+
+    service.record_many(["aaaaaaaaaaa", "bbbbbbbbbbb", "aaaaaaaaaaa"], AUDIO)
+
+    assert fake.zsets[PopularityService.KEY] == {
+        service.member("aaaaaaaaaaa", AUDIO): 2, service.member("bbbbbbbbbbb", AUDIO): 1
+    }
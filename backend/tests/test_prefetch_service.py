@@ -0,0 +1,124 @@
+import pytest
+
+from app.config.settings import settings
+from app.services.prefetch_service import (
+    PrefetchService,
+    PREFETCH_STRATEGY,
+    STATE_PENDING,
+    STATE_DOWNLOADING,
+    STATE_FINISHED,
+    STATE_FAILED
+)
+from app.tasks.celery_app import celery_app, PREFETCH_VIDEO_TASK
+
+class FakeHashRedis:
+    """Минимальная замена Redis: хеши, сортированное множество слотов и pipeline"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        return []
+
+    def hsetnx(self, key, field, value):
+        values = self.hashes.setdefault(key, {})
+        if field in values:
+            return 0
+        values[field] = str(value)
+        return 1
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = self.hashes.setdefault(key, {})
+        if field is not None:
+            values[field] = str(value)
+        for k, v in (mapping or {}).items():
+            values[k] = str(v)
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def expire(self, key, seconds):
+        return True
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zremrangebyscore(self, key, low, high):
+        values = self.zsets.get(key, {})
+        for member, score in list(values.items()):
+            if low <= score <= high:
+                del values[member]
+
+@pytest.fixture
+def prefetch(monkeypatch):
+    monkeypatch.setattr(settings, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(settings, "PREFETCH_MAX_CONCURRENT", 2)
+    monkeypatch.setattr(settings, "WORKER_AUTOSCALE_MAX_BANDWIDTH_MBPS", 100)
+    monkeypatch.setattr(settings, "PREFETCH_BANDWIDTH_SHARE", 0.2)
+    sent = []
+    monkeypatch.setattr(celery_app, "send_task", lambda name, args=None, expires=None: sent.append((name, args)))
+    service = PrefetchService(FakeHashRedis())
+    service.sent = sent
+    return service
+
+def test_schedule_respects_slots_and_bandwidth_share(prefetch):
+    """Спекуляция ограничена числом слотов, повторный запрос того же видео не дублирует загрузку"""
+    assert prefetch.schedule("video000001", "https://youtu.be/video000001")
+    assert not prefetch.schedule("video000001", "https://youtu.be/video000001")
+    assert prefetch.schedule("video000002", "https://youtu.be/video000002")
+    assert not prefetch.schedule("video000003", "https://youtu.be/video000003")
+
+    assert [args[0] for name, args in prefetch.sent] == ["video000001", "video000002"]
+    assert prefetch.sent[0][0] == PREFETCH_VIDEO_TASK
+    # 20% от 100 Мбит/с на два слота
+    assert prefetch.rate_limit() == pytest.approx(100 * 1_000_000 / 8 * 0.2 / 2)
+
+    prefetch.release_slot("video000001")
+    assert prefetch.schedule("video000003", "https://youtu.be/video000003")
+
+def test_adopt_finished_file_only_for_default_format(prefetch, tmp_path):
+    """Готовый файл из staging забирается только для формата по умолчанию"""
+    staging = tmp_path / "staging"
+    downloads = tmp_path / "downloads"
+    staging.mkdir()
+    downloads.mkdir()
+    staged = staging / "video000001_Title.mp4"
+    staged.write_bytes(b"video")
+    prefetch.update("video000001", state=STATE_FINISHED, file_path=str(staged))
+
+    assert prefetch.adopt("video000001", ("mp3", "best", True), str(downloads)) is None
+    adopted = prefetch.adopt("video000001", PREFETCH_STRATEGY, str(downloads))
+
+    assert adopted == str(downloads / "video000001_Title.mp4")
+    assert (downloads / "video000001_Title.mp4").read_bytes() == b"video"
+    assert staged.exists()
+
+def test_adopt_cancels_queued_and_promotes_running(prefetch, monkeypatch):
+    """Запланированная спекуляция отменяется, выполняющаяся получает promoted и дожидается"""
+    prefetch.update("video000001", state=STATE_PENDING)
+    assert prefetch.adopt("video000001", PREFETCH_STRATEGY, "/nonexistent") is None
+    assert prefetch.get_state("video000001")['state'] == STATE_FAILED
+
+    monkeypatch.setattr(settings, "PREFETCH_ADOPT_WAIT_SECONDS", 5)
+    prefetch.update("video000002", state=STATE_DOWNLOADING)
+
+    def sleep(seconds):
+        # Воркер завершает загрузку с ошибкой, пока задача пользователя ждет
+        assert prefetch.is_promoted("video000002")
+        prefetch.update("video000002", state=STATE_FAILED)
+
+    monkeypatch.setattr("app.services.prefetch_service.time.sleep", sleep)
+    assert prefetch.adopt("video000002", PREFETCH_STRATEGY, "/nonexistent") is None
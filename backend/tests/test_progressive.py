@@ -0,0 +1,170 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import settings
+from app.controllers import download_controller
+from app.models.download import DownloadStatus
+from app.services import progressive_service
+from app.services.progressive_service import ProgressiveDeliveryService, STATE_DOWNLOADING
+from app.tasks.download_tasks import DownloadProgress
+
+class FakeStateRedis:
+    """Хеши состояния в памяти: запись из воркера через pipeline, чтение из API через await"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.writes = 0
+
+    def pipeline(self):
+        return self
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+        self.writes += 1
+
+    def expire(self, key, seconds):
+        pass
+
+    def execute(self):
+        pass
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """Воркер с DownloadProgress, пишущий файл .part, и состояние в поддельном Redis"""
+    fake_redis = FakeStateRedis()
+    monkeypatch.setattr(progressive_service, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(settings, "PROGRESSIVE_POLL_INTERVAL_SECONDS", 0.01)
+    progress = DownloadProgress("download-1")
+    progress.progressive = ProgressiveDeliveryService(fake_redis)
+    part = tmp_path / "video.mp4.part"
+    part.write_bytes(b"")
+
+    def write(data: bytes, status: str = "downloading"):
+        with open(part, "ab") as f:
+            f.write(data)
+        progress({
+            'status': status, 'tmpfilename': str(part), 'filename': str(tmp_path / "video.mp4"),
+            'downloaded_bytes': os.path.getsize(part), 'total_bytes': None,
+        })
+
+    return SimpleNamespace(redis=fake_redis, progress=progress, part=part, write=write)
+
+async def read_state():
+    return await ProgressiveDeliveryService.get_state("download-1")
+
+async def collect(state, received):
+    async for chunk in ProgressiveDeliveryService.tail_file("download-1", state):
+        received.append(chunk)
+
+def test_tail_follows_file_until_finished(worker):
+    """Поток отдает байты по мере записи, переживает переименование .part и дочитывает остаток"""
+    async def scenario():
+        worker.write(b"a" * 1000)
+        received = []
+        reader = asyncio.create_task(collect(await read_state(), received))
+        await asyncio.sleep(0.05)
+        worker.write(b"b" * 1000)
+        await asyncio.sleep(0.05)
+        os.rename(worker.part, str(worker.part).removesuffix(".part"))
+        worker.progress({'status': 'finished', 'filename': str(worker.part).removesuffix(".part"),
+                         'downloaded_bytes': 2000})
+        await asyncio.wait_for(reader, 2)
+        return b"".join(received)
+
+    assert asyncio.run(scenario()) == b"a" * 1000 + b"b" * 1000
+
+@pytest.mark.parametrize("event", ["restart", "failed"])
+def test_tail_aborts_on_restart_or_failure(worker, event):
+    """Новая попытка пишет файл заново, а ошибка загрузки обрывает поток"""
+    async def scenario():
+        worker.write(b"a" * 100)
+        reader = asyncio.create_task(collect(await read_state(), []))
+        await asyncio.sleep(0.05)
+        if event == "restart":
+            worker.progress.start_attempt(2)
+            worker.write(b"")
+        else:
+            worker.progress.publish_failed()
+        await asyncio.wait_for(reader, 2)
+
+    with pytest.raises(IOError, match="перезапущена или завершилась ошибкой"):
+        asyncio.run(scenario())
+
+def test_tail_aborts_when_worker_stalls(worker, monkeypatch):
+    """Если воркер долго не обновляет состояние, поток обрывается"""
+    monkeypatch.setattr(settings, "PROGRESSIVE_STALL_TIMEOUT_SECONDS", 0.1)
+    worker.write(b"a" * 100)
+
+    async def scenario():
+        await asyncio.wait_for(collect(await read_state(), []), 2)
+
+    with pytest.raises(IOError, match="не продвигается"):
+        asyncio.run(scenario())
+
+def test_progress_published_every_megabyte_and_on_finish(worker):
+    """Воркер публикует состояние на первом хуке, затем не чаще раза в PUBLISH_EVERY_BYTES и всегда при завершении"""
+    step = ProgressiveDeliveryService.PUBLISH_EVERY_BYTES // 4
+
+    for _ in range(5):
+        worker.write(b"x" * step)
+    state = asyncio.run(read_state())
+    assert worker.redis.writes == 2
+    assert state['state'] == STATE_DOWNLOADING and state['downloaded_bytes'] == str(5 * step)
+
+    worker.write(b"", status="finished")
+    assert worker.redis.writes == 3
+    assert asyncio.run(read_state())['state'] == "finished"
+
+def test_in_progress_stream_ignores_range(worker):
+    """Размер загружаемого файла неизвестен: поток всегда с начала, Range не объявляется"""
+    worker.write(b"a" * 100)
+    download = SimpleNamespace(id="download-1", video_id="dQw4w9WgXcQ")
+
+    response = asyncio.run(download_controller.stream_in_progress_file(download))
+
+    assert response.status_code == 200
+    assert response.headers["Accept-Ranges"] == "none"
+    assert "content-range" not in response.headers
+
+def test_tail_without_tmpfilename_uses_filename(worker, tmp_path):
+    """Первое событие yt-dlp может содержать только filename - поток читает его"""
+    target = tmp_path / "direct.mp4"
+    target.write_bytes(b"a" * 100)
+    worker.progress({'status': 'downloading', 'filename': str(target), 'downloaded_bytes': 100})
+
+    async def scenario():
+        received = []
+        reader = asyncio.create_task(collect(await read_state(), received))
+        await asyncio.sleep(0.05)
+        worker.progress({'status': 'finished', 'filename': str(target), 'downloaded_bytes': 100})
+        await asyncio.wait_for(reader, 2)
+        return b"".join(received)
+
+    assert asyncio.run(scenario()) == b"a" * 100
+
+def test_missing_file_falls_back_to_regular_response(worker, monkeypatch):
+    """Без файла в состоянии потоковой отдачи нет - обычный ответ для незавершенной загрузки"""
+    worker.progress({'status': 'downloading', 'downloaded_bytes': 0})
+    download = SimpleNamespace(id="download-1", video_id="dQw4w9WgXcQ", status=DownloadStatus.PROCESSING,
+                               format="video_mp4", audio_only=False)
+
+    class StubDownloadService:
+        def __init__(self, db):
+            pass
+
+        def get_download(self, download_id):
+            return download
+
+    monkeypatch.setattr(download_controller, "DownloadService", StubDownloadService)
+
+    assert asyncio.run(download_controller.stream_in_progress_file(download)) is None
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(download_controller.download_file("download-1", db=None))
+    assert error.value.status_code == 400
@@ -0,0 +1,64 @@
+import gzip
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from app.config.settings import settings
+from app.models.database import Base
+from app.models.download import Download, DownloadStatus
+from app.models.partitioning import partition_day, partition_ddl, partition_name, partitioned_table
+from app.services.retention_service import RetentionService
+
+def test_partitioned_table_ddl():
+    """Postgres DDL: секционирование по created_at, который входит в первичный ключ"""
+    ddl = str(CreateTable(partitioned_table()).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY RANGE (created_at)" in ddl
+    assert "PRIMARY KEY (id, created_at)" in ddl
+    assert "created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL" in ddl
+
+    day = date(2026, 10, 19)
+    assert partition_day(partition_name(day)) == day
+    assert partition_day("downloads_default") is None
+    assert "FROM ('2026-10-19 00:00:00+00') TO ('2026-10-20 00:00:00+00')" in partition_ddl(day)
+
+def test_purge_archives_and_deletes_old_rows(tmp_path, monkeypatch):
+    """Без секций старые записи любого статуса удаляются пачками, каждая пачка сохраняется в архив"""
+    monkeypatch.setattr(settings, "DOWNLOADS_ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "DOWNLOADS_PURGE_BATCH_SIZE", 2)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    now = datetime(2026, 10, 19, 12, 0)
+    leftover = tmp_path / "old.mp4"
+    leftover.write_bytes(b"data")
+    ages = {
+        'failed-old': (DownloadStatus.FAILED, settings.DOWNLOADS_RETENTION_DAYS + 5),
+        'pending-old': (DownloadStatus.PENDING, settings.DOWNLOADS_RETENTION_DAYS + 2),
+        'completed-old': (DownloadStatus.COMPLETED, settings.DOWNLOADS_RETENTION_DAYS + 1),
+        'failed-recent': (DownloadStatus.FAILED, 1),
+    }
+    for download_id, (status, days) in ages.items():
+        db.add(Download(
+            id=download_id, youtube_url="https://www.youtube.com/watch?v=dQw4w9WgXcQ", video_id="dQw4w9WgXcQ",
+            format="video_mp4", status=status, session_id="session-1", created_at=now - timedelta(days=days),
+            file_path=str(leftover) if download_id == 'completed-old' else None
+        ))
+    db.commit()
+
+    result = RetentionService(db).apply(now)
+
+    assert result['rows_deleted'] == 3 and result['partitions_dropped'] == 0
+    assert [download.id for download in db.query(Download).all()] == ['failed-recent']
+    assert not leftover.exists()
+
+    archives = sorted((tmp_path / "archive").iterdir())
+    assert [path.suffix for path in archives] == [".gz", ".gz"]
+    archived = [json.loads(line) for path in archives for line in gzip.open(path)]
+    assert [row['id'] for row in archived] == ['failed-old', 'pending-old', 'completed-old']
+    assert archived[0]['status'] == DownloadStatus.FAILED
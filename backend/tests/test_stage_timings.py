@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config.settings import settings
+from app.main import app
+from app.models.database import Base, get_db
+from app.models.download import Download, DownloadStatus
+from app.services.download_service import DownloadService, summarize
+from app.tasks.download_tasks import JobTimings
+from app.utils.helpers import percentile
+
+def test_percentile_nearest_rank():
+    values = [7, 1, 3, 10, 2, 9, 4, 8, 6, 5]
+
+    assert [percentile(values, p) for p in (0, 50, 90, 99, 100)] == [1, 5, 9, 10, 10]
+    assert percentile([], 50) is None
+    assert summarize([]) == {'count': 0, 'p50': None, 'p90': None, 'p95': None, 'p99': None, 'max': None}
+    assert summarize(values)['max'] == 10
+
+def test_job_timings_offsets_and_speed():
+    """Метки - смещения от создания записи; скорость считается по интервалу загрузки запасной стратегии"""
+    timings = JobTimings(datetime.utcnow() - timedelta(seconds=10))
+    timings.mark('started')
+    assert 9.5 < timings.stages['started'] < 11
+
+    timings.bytes = 500
+    timings.start_fallback()
+    assert timings.bytes == 0 and 'fallback_started' in timings.stages
+
+    timings.stages.update(fallback_started=12.0, fetch_finished=14.0)
+    timings.bytes = 4000
+    data = timings.to_dict()
+    assert data['fallback'] is True
+    assert (data['bytes'], data['avg_speed']) == (4000, 2000)
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    now = datetime.utcnow()
+    rows = [
+        (DownloadStatus.COMPLETED, now, {'started': 1.0, 'info_extracted': 3.0, 'finalized': 10.0, 'avg_speed': 100}),
+        (DownloadStatus.COMPLETED, now, {'started': 2.0, 'info_extracted': 6.0, 'finalized': 20.0,
+                                         'fallback': True}),
+        (DownloadStatus.FAILED, now, {'started': 1.0}),
+        # Вне окна статистики
+        (DownloadStatus.COMPLETED, now - timedelta(hours=30), {'started': 100.0}),
+    ]
+    for index, (status, created_at, timings) in enumerate(rows):
+        db.add(Download(
+            id=f"download-{index}", youtube_url="https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            video_id="dQw4w9WgXcQ", format="video_mp4", status=status, created_at=created_at,
+            stage_timings=timings
+        ))
+    db.commit()
+    yield Session
+    db.close()
+
+def test_stage_statistics_window(db_session):
+    stats = DownloadService(db_session()).get_stage_statistics(hours=24)
+
+    assert stats['jobs'] == 3
+    assert stats['statuses'] == {DownloadStatus.COMPLETED: 2, DownloadStatus.FAILED: 1}
+    assert stats['fallback_rate'] == round(1 / 3, 4)
+    assert stats['stages']['queue_wait'] == summarize([1.0, 2.0, 1.0])
+    assert stats['stages']['extraction'] == summarize([2.0, 4.0])
+    assert stats['stages']['total'] == summarize([10.0, 20.0])
+    assert stats['avg_speed']['count'] == 1
+
+def test_stage_statistics_requires_admin_token(db_session, monkeypatch):
+    """Без токена, с неверным токеном и при незаданном ADMIN_TOKEN - 403"""
+    def override_get_db():
+        db = db_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    client = TestClient(app)
+    url = "/api/admin/stats/stages"
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    assert client.get(url, headers={"X-Admin-Token": "secret"}).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get(url).status_code == 403
+    assert client.get(url, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get(url, params={"hours": 0}, headers={"X-Admin-Token": "secret"}).status_code == 400
+
+    response = client.get(url, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()['jobs'] == 3
@@ -0,0 +1,142 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.config.settings import settings
+from app.services import webhook_service
+from app.services.webhook_service import WebhookService, EVENT_COMPLETED, SIGNATURE_HEADER, verify_signature
+from app.tasks import webhook_tasks
+from app.utils.helpers import public_url
+
+class FakeListRedis:
+    """Минимальная замена Redis для dead letter списка"""
+
+    def __init__(self):
+        self.lists = {}
+
+    def pipeline(self):
+        return self
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:end + 1]
+
+    def execute(self):
+        pass
+
+class Receiver:
+    """Локальный HTTP получатель уведомлений с заданным кодом ответа"""
+
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.requests = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                receiver.requests.append((dict(self.headers), body))
+                self.send_response(receiver.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def receiver(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", True)
+    server = Receiver()
+    yield server
+    server.close()
+
+def test_signed_delivery_to_local_receiver(receiver):
+    """Получатель принимает POST с телом события и проверяемой подписью"""
+    delivery = WebhookService.build_delivery(receiver.url, EVENT_COMPLETED, {'download_id': 'download-1'})
+
+    assert WebhookService(FakeListRedis()).send(delivery) == (True, False, "http 200")
+
+    headers, body = receiver.requests[0]
+    assert verify_signature(body, headers[SIGNATURE_HEADER])
+    assert not verify_signature(body + b" ", headers[SIGNATURE_HEADER])
+    assert headers['X-Ytubik-Event'] == EVENT_COMPLETED
+    assert json.loads(body)['data'] == {'download_id': 'download-1'}
+
+def test_retries_then_dead_letter(receiver, monkeypatch):
+    """Ошибка сервера повторяется с паузой, после последней попытки уведомление попадает в dead letter"""
+    fake_redis = FakeListRedis()
+    receiver.status = 503
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(webhook_tasks, "WebhookService", lambda: WebhookService(fake_redis))
+    monkeypatch.setattr(WebhookService, "backoff", staticmethod(lambda attempt: 0))
+    delivery = WebhookService.build_delivery(receiver.url, EVENT_COMPLETED, {'download_id': 'download-1'})
+
+    webhook_tasks.deliver_webhook_task.apply(args=[delivery])
+
+    assert [headers['X-Ytubik-Attempt'] for headers, _ in receiver.requests] == ["1", "2", "3"]
+    dead = WebhookService(fake_redis).dead_letters()
+    assert [(entry['id'], entry['attempts'], entry['error']) for entry in dead] == [(delivery['id'], 3, "http 503")]
+
+def test_client_error_and_private_host_not_retried(receiver, monkeypatch):
+    """Ошибка клиента и адрес локальной сети без разрешения не повторяются"""
+    service = WebhookService(FakeListRedis())
+    delivery = WebhookService.build_delivery(receiver.url, EVENT_COMPLETED, {})
+    receiver.status = 410
+
+    assert service.send(delivery) == (False, False, "http 410")
+
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", False)
+    delivered, retryable, detail = service.send(delivery)
+    assert (delivered, retryable) == (False, False) and "127.0.0.1" in detail
+    assert len(receiver.requests) == 1
+
+def test_connection_pinned_to_checked_address(receiver, monkeypatch):
+    """DNS опрашивается один раз: повторное разрешение имени (rebinding) не меняет адрес соединения"""
+    calls = []
+    real_getaddrinfo = socket.getaddrinfo
+
+    def rebinding_getaddrinfo(host, port, *args, **kwargs):
+        if host != "hooks.example.test":
+            return real_getaddrinfo(host, port, *args, **kwargs)
+        calls.append(host)
+        address = "127.0.0.1" if len(calls) == 1 else "10.255.255.1"
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(webhook_service.socket, "getaddrinfo", rebinding_getaddrinfo)
+    url = receiver.url.replace("127.0.0.1", "hooks.example.test")
+    delivery = WebhookService.build_delivery(url, EVENT_COMPLETED, {})
+
+    assert WebhookService(FakeListRedis()).send(delivery) == (True, False, "http 200")
+    assert calls == ["hooks.example.test"]
+    headers, _ = receiver.requests[0]
+    assert headers['Host'] == f"hooks.example.test:{receiver.server.server_port}"
+
+def test_public_url_is_absolute(monkeypatch):
+    monkeypatch.setattr(settings, "DOMAIN", "ytubik.example.com")
+    monkeypatch.setattr(settings, "PUBLIC_BASE_URL", None)
+    assert public_url("/api/download/1/file") == "https://ytubik.example.com/api/download/1/file"
+
+    monkeypatch.setattr(settings, "PUBLIC_BASE_URL", "http://localhost:8000/")
+    assert public_url("/api/download/1/file") == "http://localhost:8000/api/download/1/file"
+
+def test_backoff_grows_and_is_capped():
+    delays = [WebhookService.backoff(attempt) for attempt in range(1, 20)]
+
+    assert delays[0] <= settings.WEBHOOK_BACKOFF_BASE_SECONDS < delays[2]
+    assert max(delays) <= settings.WEBHOOK_BACKOFF_MAX_SECONDS
@@ -0,0 +1,80 @@
+import pytest
+import yt_dlp
+from yt_dlp.utils import DownloadError
+
+from app.config.settings import settings
+from app.utils.ytdlp_pool import YoutubeDLPool
+
+class FakeYoutubeDL:
+    """Минимальная замена YoutubeDL: хуки фиксируются при создании, как в yt-dlp"""
+
+    def __init__(self, params):
+        self.params = params
+        self.closed = False
+
+    def download(self, urls):
+        for hook in self.params['progress_hooks']:
+            hook({'status': 'finished', 'urls': urls})
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture(autouse=True)
+def fake_youtubedl(monkeypatch):
+    monkeypatch.setattr(yt_dlp, "YoutubeDL", FakeYoutubeDL)
+    monkeypatch.setattr(settings, "YTDLP_POOL_ENABLED", True)
+    monkeypatch.setattr(settings, "YTDLP_POOL_MAX_USES", 3)
+
+def test_instance_reused_per_key_with_current_hooks():
+    """Экземпляр переиспользуется, а события получает хук текущей задачи"""
+    pool = YoutubeDLPool()
+    events = {'first': [], 'second': []}
+
+    with pool.acquire(('primary', 'video_mp4'), {}, events['first'].append) as first:
+        first.download(['a'])
+    with pool.acquire(('primary', 'video_mp4'), {}, events['second'].append) as second:
+        second.download(['b'])
+    with pool.acquire(('alternative', 'video_mp4'), {}) as other:
+        pass
+
+    assert first is second
+    assert other is not first
+    assert pool.created == 2
+    assert [e['urls'] for e in events['first']] == [['a']]
+    assert [e['urls'] for e in events['second']] == [['b']]
+
+def test_yt_dlp_error_keeps_instance_other_errors_discard_it():
+    """Ошибка yt-dlp не портит экземпляр, прочие исключения - закрывают его"""
+    pool = YoutubeDLPool()
+
+    with pytest.raises(DownloadError):
+        with pool.acquire(('info',), {}) as first:
+            raise DownloadError("Video unavailable")
+    with pytest.raises(IOError):
+        with pool.acquire(('info',), {}) as second:
+            raise IOError("Файл превышает допустимый размер")
+    with pool.acquire(('info',), {}) as third:
+        pass
+
+    assert second is first
+    assert first.closed
+    assert third is not first
+
+def test_instance_recycled_after_max_uses():
+    """После YTDLP_POOL_MAX_USES выдач экземпляр пересоздается"""
+    pool = YoutubeDLPool()
+    instances = []
+    for _ in range(4):
+        with pool.acquire(('info',), {}) as ydl:
+            instances.append(ydl)
+
+    assert instances[0] is instances[1] is instances[2]
+    assert instances[0].closed
+    assert instances[3] is not instances[0]
+
+def test_cache_dir_passed_to_new_instances(monkeypatch, tmp_path):
+    """Новые экземпляры используют общий каталог кеша"""
+    monkeypatch.setattr(settings, "YTDLP_CACHE_DIR", str(tmp_path))
+    with YoutubeDLPool().acquire(('info',), {'quiet': True}) as ydl:
+        assert ydl.params['cachedir'] == str(tmp_path)
+        assert ydl.params['quiet'] is True
@@ -0,0 +1,101 @@
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.models.database import Base, get_db
+from app.models.download import DownloadStatus
+from app.services.download_service import DownloadService
+from app.utils.zip_stream import ZipStream, build_zip_entries
+
+def _make_files(tmp_path):
+    first = tmp_path / "first.mp4"
+    first.write_bytes(b"a" * 3000)
+    second = tmp_path / "second.mp3"
+    second.write_bytes(bytes(range(256)) * 10)
+    return [("видео.mp4", str(first)), ("видео.mp4", str(second))]
+
+def test_archive_is_valid_zip(tmp_path):
+    """Потоковый архив читается zipfile и содержит исходные файлы"""
+    stream = ZipStream(build_zip_entries(_make_files(tmp_path)))
+    data = b"".join(stream.iter_range())
+
+    assert len(data) == stream.size
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["видео.mp4", "видео (1).mp4"]
+        assert archive.read("видео.mp4") == b"a" * 3000
+
+def test_range_matches_full_archive(tmp_path):
+    """Диапазон байт совпадает с соответствующим срезом полного архива"""
+    stream = ZipStream(build_zip_entries(_make_files(tmp_path)))
+    data = b"".join(stream.iter_range())
+
+    for start, end in [(0, 10), (100, 3100), (3050, stream.size - 1), (stream.size - 5, stream.size - 1)]:
+        assert b"".join(stream.iter_range(start, end)) == data[start:end + 1]
+
+@pytest.fixture
+def archive_client(tmp_path, monkeypatch):
+    """Клиент API с двумя готовыми файлами в сессии"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    service = DownloadService(db)
+    for index, (name, path) in enumerate(_make_files(tmp_path)):
+        download = service.create_download(
+            f"https://www.youtube.com/watch?v=video{index:06d}", f"video{index:06d}", "video_mp4", "best", False,
+            "127.0.0.1", "session-1"
+        )
+        service.update_download(download.id, DownloadStatus.COMPLETED, file_path=path, file_name=name)
+    db.close()
+
+    def override_get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    return TestClient(app, cookies={"session_id": "session-1"})
+
+URL = "/api/downloads/my/archive"
+
+def test_archive_endpoint_full_and_resumed(archive_client):
+    """Полный ответ - валидный ZIP с ETag; докачка с совпадающим If-Range - 206 с нужным срезом"""
+    full = archive_client.get(URL)
+    assert full.status_code == 200
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert int(full.headers["Content-Length"]) == len(full.content)
+    with zipfile.ZipFile(io.BytesIO(full.content)) as archive:
+        assert archive.testzip() is None
+
+    etag = full.headers["ETag"]
+    resumed = archive_client.get(URL, headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert resumed.status_code == 206
+    assert resumed.headers["Content-Range"] == f"bytes 1000-{len(full.content) - 1}/{len(full.content)}"
+    assert resumed.content == full.content[1000:]
+
+def test_archive_endpoint_stale_if_range_returns_full_body(archive_client):
+    """Архив изменился (другой ETag) - Range игнорируется, отдается весь архив"""
+    full = archive_client.get(URL)
+
+    response = archive_client.get(URL, headers={"Range": "bytes=1000-", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert "Content-Range" not in response.headers
+    assert response.content == full.content
+
+def test_archive_endpoint_unsatisfiable_range(archive_client):
+    size = len(archive_client.get(URL).content)
+
+    response = archive_client.get(URL, headers={"Range": f"bytes={size}-"})
+
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{size}"
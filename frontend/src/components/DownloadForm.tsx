@@ -15,7 +15,7 @@ import {
   CircularProgress
 } from '@mui/material';
 import { Download } from '@mui/icons-material';
-import { useMutation } from 'react-query';
+import { useMutation, useQueryClient } from 'react-query';
 import { createDownload } from '../services/api';
 
 const DownloadForm: React.FC = () => {
@@ -24,9 +24,13 @@ const DownloadForm: React.FC = () => {
   const [quality, setQuality] = useState('best');
   const [audioOnly, setAudioOnly] = useState(false);
 
+  const queryClient = useQueryClient();
+
   const mutation = useMutation(createDownload, {
     onSuccess: (data) => {
       setUrl('');
+      // Новая загрузка сразу появляется в "Моих загрузках"
+      queryClient.invalidateQueries('my-downloads');
       // Здесь можно добавить уведомление о успешном создании загрузки
     },
     onError: (error: any) => {
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Paper,
   Typography,
@@ -18,6 +18,7 @@ import {
 } from '@mui/material';
 import { GetApp } from '@mui/icons-material';
 import { useQuery } from 'react-query';
+import { getDownloadsStatus, DownloadStatusItem } from '../services/api';
 
 interface GlobalActivity {
   video_title: string;
@@ -90,7 +91,50 @@ const SeparatedDownloadHistory: React.FC = () => {
       return response.json();
     },
     {
-      refetchInterval: 5000, // Обновляем каждые 5 секунд
+      // Список меняется только при создании загрузки (форма обновляет его сама),
+      // статусы незавершенных загрузок опрашиваются ниже одним запросом
+      refetchInterval: 30000,
+    }
+  );
+
+  // Статусы незавершенных загрузок страницы: один POST /downloads/status вместо
+  // запроса на каждую загрузку; версии из прошлого ответа отправляются в since,
+  // и неизменившиеся статусы сервер не возвращает
+  const [liveStatuses, setLiveStatuses] = useState<Record<string, DownloadStatusItem>>({});
+  const statusVersions = useRef<Record<string, string>>({});
+
+  const myDownloads = (myData?.downloads || []).map((download) => {
+    const live = liveStatuses[download.id];
+    return live ? {
+      ...download,
+      status: live.status,
+      download_url: live.download_url ?? download.download_url,
+      error_message: live.error_message ?? download.error_message,
+    } : download;
+  });
+  const activeIds = myDownloads
+    .filter((download) => download.status === 'pending' || download.status === 'processing')
+    .map((download) => download.id);
+
+  useQuery(
+    ['my-downloads-status', activeIds],
+    () => getDownloadsStatus(activeIds, statusVersions.current),
+    {
+      enabled: activeIds.length > 0,
+      refetchInterval: 3000,
+      onSuccess: (data) => {
+        if (data.statuses.length === 0) return;
+        data.statuses.forEach((item) => {
+          statusVersions.current[item.id] = item.version;
+        });
+        setLiveStatuses((previous) => {
+          const next = { ...previous };
+          data.statuses.forEach((item) => {
+            next[item.id] = item;
+          });
+          return next;
+        });
+      },
     }
   );
 
@@ -268,7 +312,7 @@ const SeparatedDownloadHistory: React.FC = () => {
                       </TableRow>
                     </TableHead>
                     <TableBody>
-                      {myData?.downloads.map((download) => (
+                      {myDownloads.map((download) => (
                         <TableRow key={download.id}>
                           <TableCell>
                             <Typography variant="body2" noWrap>
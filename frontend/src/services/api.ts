@@ -45,9 +45,22 @@ export interface DownloadHistory {
 }
 
 // API функции
+// Повторный клик, пока первый запрос проверяет видео, получает 202 с Retry-After:
+// повторяем запрос и получаем ту же загрузку
+const CREATE_DOWNLOAD_MAX_RETRIES = 5;
+
 export const createDownload = async (request: DownloadRequest): Promise<DownloadResponse> => {
-  const response = await api.post('/download', request);
-  return response.data;
+  for (let attempt = 0; ; attempt++) {
+    const response = await api.post('/download', request);
+    if (response.status !== 202) {
+      return response.data;
+    }
+    if (attempt >= CREATE_DOWNLOAD_MAX_RETRIES) {
+      throw new Error(response.data.detail);
+    }
+    const retryAfter = Number(response.headers['retry-after']) || 1;
+    await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+  }
 };
 
 export const getDownloadStatus = async (downloadId: string) => {
@@ -55,6 +68,36 @@ export const getDownloadStatus = async (downloadId: string) => {
   return response.data;
 };
 
+export interface DownloadStatusItem {
+  id: string;
+  status: string;
+  progress?: number;
+  speed?: number;
+  eta?: number;
+  error_message?: string;
+  file_name?: string;
+  file_size?: number;
+  download_url?: string;
+  progressive: boolean;
+  version: string;
+}
+
+export interface BulkStatusResponse {
+  statuses: DownloadStatusItem[];
+  unchanged: number;
+  missing: string[];
+}
+
+// Статусы нескольких загрузок одним запросом; since - версии из прошлого ответа,
+// неизменившиеся статусы не возвращаются
+export const getDownloadsStatus = async (
+  ids: string[],
+  since: Record<string, string> = {}
+): Promise<BulkStatusResponse> => {
+  const response = await api.post('/downloads/status', { ids, since });
+  return response.data;
+};
+
 export const getDownloadsHistory = async (page: number = 1, perPage: number = 20): Promise<DownloadHistory> => {
   const response = await api.get(`/downloads?page=${page}&per_page=${perPage}`);
   return response.data;